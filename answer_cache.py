@@ -0,0 +1,250 @@
+"""
+Cache of whole chatbot answers, for frequently asked questions.
+
+Most support traffic is a few dozen questions, and each one otherwise replays
+search -> fetch -> generate. `AnswerCache` keeps the final answer to a
+standalone question together with the doc pages it was based on, and serves
+it again for the same question, reworded or not, without running the agent.
+
+Lookups work like `SearchCache`, on the same `QueryIndex` (search_cache.py):
+an exact match on the normalised question, else the most similar cached
+question in one NumPy matrix-vector product. Because similar-looking questions
+can ask opposite things ("add tenants" / "remove tenants"), a similar question
+only matches if every word that differs is a filler word ("please", "the",
+"does", ...).
+
+An answer is dropped when it is older than `ttl`, when the cache is full and
+it is the least recently used, or when a page it cites changes: each cited
+page's fingerprint (its version at the source, e.g. its last update time) is
+recorded with the answer and checked again on every hit. A page whose
+fingerprint is unknown (`fingerprint` returns None) can't be shown unchanged:
+an answer citing one isn't cached, and a cached answer is dropped (and the
+question answered again) once one turns unknown. `invalidate_paths` drops the
+answers citing given pages explicitly.
+
+With an `AnswerStore`, answers are also kept in SQLite and loaded back on
+start, so a restarted process keeps its cache.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import numpy as np
+from pydantic_ai.messages import ModelMessage, ToolReturnPart
+
+from search_cache import QueryIndex, ngram_embedding, normalize_query
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    paths: list[str]
+    fingerprints: Dict[str, Optional[str]] = field(default_factory=dict)
+    stored_at: float = field(default_factory=time.time)
+    similarity: float = 1.0
+
+
+def cited_paths(messages: list[ModelMessage]) -> list[str]:
+    """
+    The doc pages read in `messages`, in order: the pages the tools returned
+    ("path" of a page, the keys of "pages"), after any path correction. Calls
+    that failed or were answered with a pointer to an earlier result add none.
+    """
+    paths: list[str] = []
+    for message in messages:
+        for part in message.parts:
+            if isinstance(part, ToolReturnPart) and isinstance(part.content, dict):
+                found = part.content.get("pages") or [part.content.get("path")]
+                for path in found:
+                    if isinstance(path, str) and path not in paths:
+                        paths.append(path)
+    return paths
+
+
+class AnswerStore:
+    """Persistent tier: one SQLite row per cached answer."""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        # WAL: a write doesn't wait for a full sync; a crash loses at most the last few answers
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._lock, self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, question TEXT, answer TEXT, paths TEXT, "
+                "fingerprints TEXT, stored_at REAL)"
+            )
+
+    def load(self, limit: int) -> list[CachedAnswer]:
+        """The `limit` most recently stored answers, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT question, answer, paths, fingerprints, stored_at FROM answers "
+                "ORDER BY stored_at DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [
+            CachedAnswer(question, answer, json.loads(paths), json.loads(fingerprints), stored_at)
+            for question, answer, paths, fingerprints, stored_at in reversed(rows)
+        ]
+
+    def put(self, key: str, entry: CachedAnswer) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    entry.question,
+                    entry.answer,
+                    json.dumps(entry.paths),
+                    json.dumps(entry.fingerprints),
+                    entry.stored_at,
+                ),
+            )
+
+    def delete(self, keys: Iterable[str]) -> None:
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM answers WHERE key = ?", [(key,) for key in keys])
+
+    def clear(self) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM answers")
+
+    def close(self) -> None:
+        self._db.close()
+
+
+class AnswerCache:
+    """
+    Thread-safe cache of answers keyed on the question; see the module docstring.
+
+    At most `capacity` answers are kept, evicting the least recently used.
+    A reworded question matches if its cosine similarity to a cached one is at
+    least `threshold` and only filler words differ.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 512,
+        threshold: float = 0.85,
+        ttl: float = 24 * 60 * 60,
+        store: Optional[AnswerStore] = None,
+        fingerprint: Optional[Callable[[str], Optional[str]]] = None,
+        embed: Callable[[str], np.ndarray] = ngram_embedding,
+    ):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.store = store
+        self.fingerprint = fingerprint
+        self._index = QueryIndex(capacity, threshold, ttl, "lru", embed)
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        if store is not None:
+            now = time.time()
+            for entry in store.load(capacity):
+                if now - entry.stored_at <= ttl:
+                    self._insert(normalize_query(entry.question), entry)
+
+    def get(self, question: str) -> Optional[CachedAnswer]:
+        key = normalize_query(question)
+        now = time.time()
+        with self._lock:
+            slot, similarity = self._index.find(key, now)
+            if slot is None:
+                self.misses += 1
+                return None
+            entry = self._index.values[slot]
+            if self._changed(entry):
+                self._remove([slot])
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            if similarity >= 1.0:
+                self.exact_hits += 1
+            else:
+                self.semantic_hits += 1
+            self._index.touch(slot, now)
+            return CachedAnswer(
+                entry.question, entry.answer, entry.paths, entry.fingerprints, entry.stored_at, similarity
+            )
+
+    def _changed(self, entry: CachedAnswer) -> bool:
+        """Whether a page `entry` cites changed, or can't be shown unchanged."""
+        if self.fingerprint is None:
+            return False
+        for path in entry.paths:
+            recorded = entry.fingerprints.get(path)
+            if recorded is None or self.fingerprint(path) != recorded:
+                return True
+        return False
+
+    def put(self, question: str, answer: str, paths: list[str]) -> bool:
+        """Cache `answer` to `question`, based on the doc pages at `paths`. Return whether it was cached."""
+        fingerprints = {}
+        if self.fingerprint is not None:
+            fingerprints = {path: self.fingerprint(path) for path in paths}
+            if None in fingerprints.values():
+                return False
+        entry = CachedAnswer(question, answer, list(paths), fingerprints)
+        key = normalize_query(question)
+        with self._lock:
+            self._insert(key, entry)
+        if self.store is not None:
+            self.store.put(key, entry)
+        return True
+
+    def _insert(self, key: str, entry: CachedAnswer) -> None:
+        evicted = self._index.insert(key, entry, entry.stored_at, time.time())
+        self.evictions += len(evicted)
+        if evicted and self.store is not None:
+            self.store.delete(evicted)
+
+    def _remove(self, slots: list[int]) -> None:
+        keys = self._index.remove(slots)
+        if self.store is not None:
+            self.store.delete(keys)
+
+    def invalidate_paths(self, paths: Iterable[str]) -> int:
+        """Drop every answer citing one of `paths`. Return how many were dropped."""
+        paths = set(paths)
+        with self._lock:
+            slots = [
+                slot
+                for slot in self._index.slots.values()
+                if paths.intersection(self._index.values[slot].paths)
+            ]
+            self._remove(slots)
+            self.invalidations += len(slots)
+        return len(slots)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._index.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._index),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,294 @@
+"""
+Run an agent over many (deps, prompt) jobs at once, e.g. for evals.
+
+Running thousands of jobs one `run_sync` at a time is mostly waiting on the
+model. `run_batch` keeps up to `concurrency` runs in flight and returns the
+results in job order.
+
+Model requests go through the process-wide limiter (see rate_limit.py) in its
+batch lane, so they stay under the provider limits and, in a process that
+also serves chat, wait behind interactive turns. The limiter also retries
+them (and the Weaviate queries) after 429s, 5xx errors and dropped
+connections; a job itself is only retried when an attempt exceeds its timeout.
+
+Each result is appended to a JSONL file as soon as its job finishes. Run the
+same batch again with the same file and jobs that already succeeded are
+skipped, so a crashed or interrupted batch resumes where it stopped. Jobs are
+identified by their deps and prompt, not their position, so editing or
+reordering the input files between runs doesn't mix up results.
+
+    python batch_runner.py dev/step3_tool_choice.py:basic_agent \\
+        --users users.jsonl --prompts prompts.txt --out results.jsonl --concurrency 16 --rpm 50
+
+`--users` is a JSONL file of deps (e.g. {"name": "JP", "city": "Edinburgh"}),
+`--prompts` one prompt per line; every user is paired with every prompt.
+Without `--users`, each job gets the agent's deps type made with its
+defaults, if it has defaults for every field.
+
+With `--record CASSETTE`, the model responses and Weaviate queries are
+recorded (see cassette.py); `--replay CASSETTE` runs the batch again from the
+recording, offline, e.g. to load-test at high `--concurrency`.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import importlib.util
+import json
+import random
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from pydantic_ai import Agent
+from pydantic_ai.models import infer_model
+from pydantic_core import to_jsonable_python
+
+from rate_limit import BATCH, lane, limiter, rate_limited
+
+
+@dataclass
+class BatchJob:
+    id: str
+    prompt: str
+    deps: Any = None
+
+
+@dataclass
+class JobResult:
+    id: str
+    index: int
+    output: Any = None
+    error: Optional[str] = None
+    attempts: int = 0
+    seconds: float = 0.0
+    usage: Optional[Dict[str, int]] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def job_id(deps: Any, prompt: str) -> str:
+    """A stable id for a (deps, prompt) pair: a hash of both, serialized as JSON."""
+    payload = json.dumps([to_jsonable_python(deps), prompt], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def matrix_jobs(users: Iterable[Any], prompts: Iterable[str]) -> list[BatchJob]:
+    """
+    Every user (deps) paired with every prompt, with ids from `job_id`.
+
+    A pair that occurs more than once gets "-2", "-3", ... appended to its id.
+    """
+    prompts = list(prompts)
+    jobs, seen = [], {}
+    for deps in users:
+        for prompt in prompts:
+            id = job_id(deps, prompt)
+            seen[id] = seen.get(id, 0) + 1
+            jobs.append(BatchJob(id if seen[id] == 1 else f"{id}-{seen[id]}", prompt, deps))
+    return jobs
+
+
+def read_results(path: str) -> Dict[str, JobResult]:
+    """Results recorded in a JSONL file, by job id; the latest line for an id wins."""
+    results: Dict[str, JobResult] = {}
+    if not Path(path).exists():
+        return results
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by a crash
+            results[record["id"]] = JobResult(**{k: record.get(k) for k in JobResult.__dataclass_fields__})
+    return results
+
+
+def is_retryable(error: BaseException) -> bool:
+    # Errors of the calls inside a run were already retried by the limiter; retrying the job
+    # would multiply those attempts. Only an attempt cut off by the job timeout is tried again.
+    return isinstance(error, asyncio.TimeoutError)
+
+
+async def run_batch(
+    agent: Agent,
+    jobs: list[BatchJob],
+    out: Optional[str] = None,
+    model: Any = None,
+    concurrency: int = 8,
+    retries: int = 3,
+    backoff: float = 1.0,
+    timeout: Optional[float] = None,
+    on_result: Optional[Callable[[JobResult], Any]] = None,
+) -> list[JobResult]:
+    """
+    Run `agent` on every job and return the results in job order.
+
+    `model` replaces the agent's model for the batch. Either way, its requests
+    are rate limited (see rate_limit.py), in the batch lane.
+    With `out`, results are appended to that JSONL file as they complete, and
+    jobs already recorded there as successful are not run again. `timeout`
+    bounds each attempt; a job that times out is tried up to `retries + 1`
+    times, `backoff * 2**n` seconds (with jitter) apart.
+    """
+    done = {id: r for id, r in read_results(out).items() if r.ok} if out else {}
+    results: list[Optional[JobResult]] = [None] * len(jobs)
+    queue: asyncio.Queue = asyncio.Queue()
+    for index, job in enumerate(jobs):
+        if job.id in done:
+            results[index] = done[job.id]
+            results[index].index = index
+        else:
+            queue.put_nowait((index, job))
+
+    async def attempt(job: BatchJob):
+        run = agent.run(job.prompt, deps=job.deps)
+        return await (asyncio.wait_for(run, timeout) if timeout else run)
+
+    async def run_job(index: int, job: BatchJob) -> JobResult:
+        start = time.perf_counter()
+        for n in range(retries + 1):
+            try:
+                result = await attempt(job)
+            except Exception as e:
+                if n == retries or not is_retryable(e):
+                    return JobResult(
+                        job.id,
+                        index,
+                        error=f"{type(e).__name__}: {e}",
+                        attempts=n + 1,
+                        seconds=time.perf_counter() - start,
+                    )
+                await asyncio.sleep(backoff * 2**n * random.uniform(0.5, 1.5))
+                continue
+            usage = result.usage()
+            return JobResult(
+                job.id,
+                index,
+                output=to_jsonable_python(result.output),
+                attempts=n + 1,
+                seconds=time.perf_counter() - start,
+                usage={
+                    "requests": usage.requests,
+                    "input_tokens": usage.input_tokens,
+                    "output_tokens": usage.output_tokens,
+                },
+            )
+
+    with contextlib.ExitStack() as stack:
+        log_file = stack.enter_context(open(out, "a")) if out else None
+        stack.enter_context(agent.override(model=rate_limited(model or agent.model)))
+        # The workers' tasks inherit the lane
+        stack.enter_context(lane(BATCH))
+
+        async def worker() -> None:
+            while True:
+                try:
+                    index, job = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                result = await run_job(index, job)
+                results[index] = result
+                if log_file is not None:
+                    # One write per line, flushed, so a crash loses at most the line being written
+                    record = {**result.__dict__, "prompt": job.prompt}
+                    log_file.write(json.dumps(record, default=str) + "\n")
+                    log_file.flush()
+                if on_result is not None:
+                    on_result(result)
+
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, queue.qsize()))))
+    return results
+
+
+def load_agent(spec: str) -> Agent:
+    """Load "path/to/script.py:attribute" (the default attribute is "agent")."""
+    path, _, attribute = spec.partition(":")
+    module_spec = importlib.util.spec_from_file_location(Path(path).stem.replace("-", "_"), path)
+    module = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(module)
+    return getattr(module, attribute or "agent")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("agent", help='the agent, as "path/to/script.py:attribute"')
+    parser.add_argument("--users", help="JSONL file of deps, one per line")
+    parser.add_argument("--prompts", required=True, help="text file, one prompt per line")
+    parser.add_argument("--out", required=True, help="JSONL file for the results (also used to resume)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rpm", type=float, help="model requests per minute to the agent's provider")
+    parser.add_argument("--tpm", type=float, help="model tokens per minute to the agent's provider")
+    parser.add_argument("--retries", type=int, default=3, help="retries of a job whose attempt timed out")
+    parser.add_argument("--timeout", type=float, help="seconds per attempt")
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument("--record", metavar="CASSETTE", help="record model and Weaviate responses to CASSETTE")
+    cassette.add_argument("--replay", metavar="CASSETTE", help="answer model and Weaviate requests from CASSETTE")
+    parser.add_argument(
+        "--replay-latency",
+        type=float,
+        help="replaying, wait this multiple of each response's recorded time (default: no wait)",
+    )
+    args = parser.parse_args()
+
+    agent = load_agent(args.agent)
+    prompts = [line.strip() for line in Path(args.prompts).read_text().splitlines() if line.strip()]
+    users = [None]
+    if args.users:
+        lines = [line for line in Path(args.users).read_text().splitlines() if line.strip()]
+        users = [agent.deps_type(**json.loads(line)) for line in lines]
+    jobs = matrix_jobs(users, prompts)
+    if not args.users and agent.deps_type is not type(None):
+        # Deps with a default for every field (e.g. step5's ChatDeps) are made fresh for each job,
+        # after the ids, which stay those of jobs without deps so that a rerun resumes
+        try:
+            jobs = [replace(job, deps=agent.deps_type()) for job in jobs]
+        except (TypeError, ValueError):
+            parser.error(f"{args.agent} needs deps ({agent.deps_type.__name__}): pass them with --users")
+    previously = sum(r.ok for r in read_results(args.out).values())
+    print(f"{len(jobs)} jobs, {previously} already done in {args.out}")
+
+    finished = 0
+
+    def progress(result: JobResult) -> None:
+        nonlocal finished
+        finished += 1
+        status = "ok" if result.ok else f"failed: {result.error}"
+        print(f"[{finished}] {result.id} {status} ({result.attempts} attempts, {result.seconds:.1f}s)")
+
+    start = time.perf_counter()
+    if args.rpm or args.tpm:
+        limiter.configure(infer_model(agent.model).system, rpm=args.rpm, tpm=args.tpm)
+    with contextlib.ExitStack() as stack:
+        model = None
+        if args.record or args.replay:
+            from cassette import Cassette, use_cassette
+
+            mode = "record" if args.record else "replay"
+            cassette = stack.enter_context(Cassette(args.record or args.replay, mode, args.replay_latency))
+            stack.enter_context(use_cassette(cassette))
+            model = cassette.model(agent.model)
+        results = asyncio.run(
+            run_batch(
+                agent,
+                jobs,
+                out=args.out,
+                model=model,
+                concurrency=args.concurrency,
+                retries=args.retries,
+                timeout=args.timeout,
+                on_result=progress,
+            )
+        )
+        if model is not None:
+            print(f"Cassette: {cassette.stats()}")
+    failed = sum(not r.ok for r in results)
+    print(f"\n{len(results) - failed} ok, {failed} failed in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
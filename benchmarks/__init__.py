@@ -0,0 +1,2 @@
+# Offline micro-benchmarks. Run from the repo root, e.g.:
+#   python -m benchmarks.bench_client_pool
@@ -0,0 +1,361 @@
+"""
+Offline benchmark of whole agent turns for every workshop step.
+
+Each scenario runs one of the workshop agents with a scripted model (see
+scripted.py) and, for the Weaviate tools, the DocCatalog stand-in, so no API
+keys are used. Per scenario it reports turn latency, tool calls, model
+requests, repeated tool calls skipped (see tool_memo.py), Weaviate round trips,
+framework overhead per model request (turn time minus time inside the model,
+divided by requests) and peak memory:
+
+    python -m benchmarks.bench_agents --json .cache/bench/agents.json
+    python -m benchmarks.bench_agents --compare .cache/bench/agents.json   # after a change
+
+Scenarios marked "(routed)" go through step5's router first (see router.py),
+as the chatbot does: no model request for a canned reply, and the search made
+up front for a doc question.
+
+Tool caches (pages, search results) are cleared before every turn unless
+`--warm` is given. `--model-ms` / `--query-ms` add simulated latency.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+# Benchmark escalations stay out of the real on-disk queue
+os.environ.setdefault("ESCALATION_QUEUE_DB", ":memory:")
+
+import pydantic_ai
+
+import tools
+from benchmarks.common import summarize
+from benchmarks.scripted import ScriptedModel, Step
+from fake_weaviate import TOPICS, FakeDocCatalog, use_stand_in
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Agent name -> (script, module attribute holding the agent)
+AGENTS = {
+    "step2": ("dev/step2_basic_agent.py", "basic_agent"),
+    "step3": ("dev/step3_tool_choice.py", "basic_agent"),
+    "step4": ("step4_weaviate_tools-completed.py", "basic_agent"),
+    "step5": ("step5_final_chatbot.py", "chatbot_agent"),
+}
+
+PATHS = [path for path, _, _ in TOPICS[:3]]
+
+
+def _user_info(module) -> Any:
+    return module.UserInfo(name="JP", city="Edinburgh")
+
+
+def _chat_deps(module) -> Any:
+    return module.ChatDeps()
+
+
+@dataclass
+class Scenario:
+    name: str
+    agent: str
+    prompt: str
+    steps: list[Step]
+    deps: Optional[Callable[[Any], Any]] = None
+    routed: bool = False
+
+
+SCENARIOS = [
+    Scenario(
+        "step2/weather",
+        "step2",
+        "What's the weather like today where I am?",
+        [[("get_weather", {})], "It is cloudy in Edinburgh."],
+        _user_info,
+    ),
+    Scenario(
+        "step3/weather",
+        "step3",
+        "What's the weather like today where I am?",
+        [[("tool_get_weather", {})], "It is cloudy in Edinburgh."],
+        _user_info,
+    ),
+    Scenario(
+        "step3/news",
+        "step3",
+        "What's the trending news item where I am today?",
+        [[("tool_get_trending_news", {})], "A mongoose was found playing with a jogger."],
+        _user_info,
+    ),
+    Scenario(
+        "step3/no-tool",
+        "step3",
+        "What country is my city in?",
+        ["Edinburgh is in Scotland, in the United Kingdom."],
+        _user_info,
+    ),
+    Scenario(
+        "step4/search-only",
+        "step4",
+        "What aliases are available in Weaviate?",
+        [[("tool_search_weaviate_docs", {"query": "collection aliases"})], "Use collection aliases."],
+    ),
+    Scenario(
+        "step4/search+fetch x3",
+        "step4",
+        "What aliases are available in Weaviate? How do I use it?",
+        [
+            [("tool_search_weaviate_docs", {"query": "collection aliases"})],
+            [("tool_fetch_weaviate_docs_page", {"path": path}) for path in PATHS],
+            "Create an alias with client.alias.create(...).",
+        ],
+    ),
+    Scenario(
+        "step5/search-only",
+        "step5",
+        "How do collection aliases work?",
+        [[("tool_search_weaviate_docs", {"query": "collection aliases"})], "Aliases point to a collection."],
+        _chat_deps,
+    ),
+    Scenario(
+        "step5/search+fetch x3",
+        "step5",
+        "How do collection aliases work?",
+        [
+            [("tool_search_weaviate_docs", {"query": "collection aliases"})],
+            [("tool_fetch_weaviate_docs_page", {"path": path}) for path in PATHS],
+            "Aliases point to a collection; switch them to migrate without downtime.",
+        ],
+        _chat_deps,
+    ),
+    Scenario(
+        "step5/search+fetch x3 (routed)",
+        "step5",
+        "How do collection aliases work?",
+        [
+            [("tool_fetch_weaviate_docs_page", {"path": path}) for path in PATHS],
+            "Aliases point to a collection; switch them to migrate without downtime.",
+        ],
+        _chat_deps,
+        routed=True,
+    ),
+    Scenario(
+        "step5/escalation",
+        "step5",
+        "I'm getting a 404 error when I query my alias in production",
+        [
+            [("tool_search_weaviate_docs", {"query": "alias 404 error"})],
+            [
+                (
+                    "contact_human_support",
+                    {
+                        "title": "404 when querying an alias",
+                        "description": "Queries through a collection alias return 404 in production.",
+                        "issue_type": "bug",
+                        "department": "support",
+                    },
+                )
+            ],
+            "I have escalated this to human support.",
+        ],
+        _chat_deps,
+    ),
+    Scenario(
+        "step5/repeated calls",
+        "step5",
+        "How do collection aliases work?",
+        [
+            [("tool_search_weaviate_docs", {"query": "collection aliases"})],
+            [("tool_fetch_weaviate_docs_page", {"path": PATHS[0]})],
+            [
+                ("tool_search_weaviate_docs", {"query": "Collection aliases?"}),
+                ("tool_fetch_weaviate_docs_page", {"path": PATHS[0]}),
+            ],
+            "Aliases point to a collection.",
+        ],
+        _chat_deps,
+    ),
+    Scenario(
+        "step5/refusal",
+        "step5",
+        "What's the weather?",
+        ["I'm a Weaviate support assistant, so I can only help with Weaviate questions."],
+        _chat_deps,
+    ),
+    Scenario(
+        "step5/refusal (routed)",
+        "step5",
+        "What's the weather?",
+        ["I'm a Weaviate support assistant, so I can only help with Weaviate questions."],
+        _chat_deps,
+        routed=True,
+    ),
+]
+
+
+_modules: Dict[str, Any] = {}
+
+
+def load_agent_module(name: str):
+    """Import a workshop script by path (some names aren't valid module names)."""
+    if name not in _modules:
+        path, _ = AGENTS[name]
+        spec = importlib.util.spec_from_file_location(f"bench_{name}", ROOT / path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules[name] = module
+    return _modules[name]
+
+
+async def routed_turn(module, agent, prompt: str, deps):
+    """A step5 turn through the router; None when it was answered without the agent."""
+    prepared = await module.route_turn(prompt, deps)
+    if prepared.reply is not None:
+        return None
+    return await agent.run(prepared.prompt, deps=deps)
+
+
+def count_tool_calls(result) -> int:
+    if result is None:
+        return 0
+    return sum(
+        part.part_kind == "tool-call" for message in result.all_messages() for part in message.parts
+    )
+
+
+def run_scenario(
+    scenario: Scenario, catalog: FakeDocCatalog, n: int, model_latency: float, warm: bool, memory_runs: int
+) -> Dict[str, Any]:
+    module = load_agent_module(scenario.agent)
+    agent = getattr(module, AGENTS[scenario.agent][1])
+    script = ScriptedModel(scenario.steps, latency=model_latency)
+
+    def turn():
+        if not warm:
+            tools.page_cache.clear()
+            tools.search_cache.clear()
+        # Deps hold per-run state, so every turn gets fresh ones
+        deps = scenario.deps(module) if scenario.deps else None
+        if scenario.routed:
+            turn = routed_turn(module, agent, scenario.prompt, deps)
+            return asyncio.get_event_loop().run_until_complete(turn), deps
+        return agent.run_sync(scenario.prompt, deps=deps), deps
+
+    with agent.override(model=script.model()), contextlib.redirect_stdout(io.StringIO()):
+        result, deps = turn()  # warm-up: imports, schema generation, client connection
+        memo = getattr(deps, "memo", None)
+        script.reset()
+        queries_before = catalog.queries
+        samples = []
+        for _ in range(n):
+            start = time.perf_counter()
+            turn()
+            samples.append(time.perf_counter() - start)
+        requests = script.requests / n
+        model_time = script.model_time / n
+        queries = (catalog.queries - queries_before) / n
+
+        peaks = []
+        for _ in range(memory_runs):
+            tracemalloc.start()
+            turn()
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+    latency = summarize(samples)
+    return {
+        "scenario": scenario.name,
+        "agent": scenario.agent,
+        "latency": latency,
+        "model_requests": requests,
+        "tool_calls": count_tool_calls(result),
+        "weaviate_queries": queries,
+        "repeated_calls_skipped": memo.total_hits if memo else 0,
+        "overhead_per_request_ms": (latency["mean_ms"] - model_time * 1000) / max(requests, 1),
+        "peak_memory_kb": max(peaks) / 1024 if peaks else None,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results: list[Dict[str, Any]], baseline: Optional[Dict[str, Any]] = None) -> None:
+    previous = {r["scenario"]: r for r in (baseline or {}).get("results", [])}
+    print(
+        f"{'scenario':<32} {'p50':>9} {'p95':>9} {'overhead/req':>13} "
+        f"{'reqs':>5} {'tools':>5} {'dedup':>5} {'queries':>7} {'peak mem':>10}"
+    )
+    for r in results:
+        line = (
+            f"{r['scenario']:<32} {r['latency']['p50_ms']:7.2f}ms {r['latency']['p95_ms']:7.2f}ms "
+            f"{r['overhead_per_request_ms']:11.3f}ms {r['model_requests']:5.0f} {r['tool_calls']:5d} "
+            f"{r['repeated_calls_skipped']:5d} {r['weaviate_queries']:7.1f} {r['peak_memory_kb'] or 0:8.0f}KB"
+        )
+        if r["scenario"] in previous:
+            before = previous[r["scenario"]]["latency"]["p50_ms"]
+            line += f"  p50 {(r['latency']['p50_ms'] / before - 1) * 100:+.1f}%"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=50, help="timed turns per scenario")
+    parser.add_argument("--memory-runs", type=int, default=3, help="turns traced for peak memory")
+    parser.add_argument("--model-ms", type=float, default=0.0)
+    parser.add_argument("--query-ms", type=float, default=0.0)
+    parser.add_argument("--warm", action="store_true", help="keep page and search caches between turns")
+    parser.add_argument("--scenario", action="append", help="only run scenarios starting with this name")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="compare p50 latency with a previous --json file")
+    args = parser.parse_args()
+
+    catalog = use_stand_in(query_latency=args.query_ms / 1000)
+    # One event loop for every turn, as in the chatbot, so the async client is reused
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    scenarios = [
+        s for s in SCENARIOS if not args.scenario or any(s.name.startswith(p) for p in args.scenario)
+    ]
+    results = [
+        run_scenario(s, catalog, args.n, args.model_ms / 1000, args.warm, args.memory_runs)
+        for s in scenarios
+    ]
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "pydantic_ai": pydantic_ai.__version__,
+        "settings": {
+            "n": args.n,
+            "model_ms": args.model_ms,
+            "query_ms": args.query_ms,
+            "warm": args.warm,
+        },
+        "results": results,
+    }
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(results, baseline)
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.json).write_text(json.dumps(report, indent=2))
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
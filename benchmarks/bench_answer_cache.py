@@ -0,0 +1,73 @@
+"""
+Answer cache lookup latency: exact hits, reworded hits and misses, with a full
+cache, and the time to load it back from SQLite after a restart.
+
+    python -m benchmarks.bench_answer_cache --entries 512
+"""
+
+import argparse
+import random
+import tempfile
+import time
+
+from answer_cache import AnswerCache, AnswerStore
+from benchmarks.common import print_row, summarize, time_calls
+from fake_weaviate import TOPICS
+
+TEMPLATES = [
+    "How do I use {}?",
+    "What is {} in Weaviate?",
+    "How do I configure {} for production?",
+    "Can you explain {} with an example?",
+]
+
+
+def questions(n: int) -> list[str]:
+    rng = random.Random(0)
+    out = []
+    while len(out) < n:
+        title = rng.choice(TOPICS)[1].lower()
+        question = rng.choice(TEMPLATES).format(f"{title} {len(out)}")
+        out.append(question)
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=512)
+    parser.add_argument("-n", type=int, default=1000, help="lookups per case")
+    args = parser.parse_args()
+
+    cached = questions(args.entries)
+    answer = "Collection aliases let you point a stable name at a collection. " * 20
+    rng = random.Random(1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = f"{directory}/answers.sqlite"
+        cache = AnswerCache(capacity=args.entries, store=AnswerStore(db))
+        start = time.perf_counter()
+        for question in cached:
+            cache.put(question, answer, [TOPICS[0][0]])
+        put_ms = (time.perf_counter() - start) * 1000 / len(cached)
+
+        exact = time_calls(lambda: cache.get(rng.choice(cached)), args.n)
+        reworded = time_calls(lambda: cache.get("Please, " + rng.choice(cached).upper() + " thanks"), args.n)
+        miss = time_calls(lambda: cache.get(f"How do I shard tenant {rng.random()}?"), args.n)
+        stats = cache.stats()
+
+        start = time.perf_counter()
+        restarted = AnswerCache(capacity=args.entries, store=AnswerStore(db))
+        load_ms = (time.perf_counter() - start) * 1000
+        after_restart = time_calls(lambda: restarted.get(rng.choice(cached)), args.n)
+
+    print(f"{args.entries} cached answers, {put_ms:.3f}ms per put (with SQLite)\n")
+    print_row("exact hit", summarize(exact))
+    print_row("reworded hit (semantic)", summarize(reworded))
+    print_row("miss", summarize(miss))
+    print_row("hit after restart", summarize(after_restart))
+    print(f"\nLoaded {restarted.stats()['entries']} answers from SQLite in {load_ms:.1f}ms")
+    print(f"Stats: {stats}")
+
+
+if __name__ == "__main__":
+    main()
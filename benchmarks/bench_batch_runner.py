@@ -0,0 +1,75 @@
+"""
+Eval-style batches: a sequential `run_sync` loop vs. batch_runner.run_batch.
+
+The step3 agent runs every (user, prompt) pair with a scripted model that
+calls the weather tool and then answers, waiting `--model-ms` per request:
+
+    python -m benchmarks.bench_batch_runner --users 20 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import tempfile
+import time
+
+from batch_runner import matrix_jobs, run_batch
+from benchmarks.bench_agents import load_agent_module
+from benchmarks.common import event_loop
+from benchmarks.scripted import ScriptedModel
+
+PROMPTS = [
+    "What's the weather like today where I am?",
+    "What's the trending news item where I am today?",
+    "What country is my city in?",
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--model-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    module = load_agent_module("step3")
+    agent = module.basic_agent
+    users = [module.UserInfo(name=f"user{i}", city="Edinburgh") for i in range(args.users)]
+    jobs = matrix_jobs(users, PROMPTS)
+    script = ScriptedModel([[("tool_get_weather", {})], "It is cloudy."], latency=args.model_ms / 1000)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        with agent.override(model=script.model()), event_loop():
+            start = time.perf_counter()
+            for job in jobs:
+                agent.run_sync(job.prompt, deps=job.deps)
+            sequential = time.perf_counter() - start
+
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            results = asyncio.run(
+                run_batch(
+                    agent,
+                    jobs,
+                    out=f"{directory}/results.jsonl",
+                    model=script.model(),
+                    concurrency=args.concurrency,
+                )
+            )
+            batched = time.perf_counter() - start
+
+    print(
+        f"{len(jobs)} jobs ({args.users} users x {len(PROMPTS)} prompts), "
+        f"{args.model_ms}ms per model request\n"
+    )
+    label = f"run_batch, concurrency {args.concurrency}"
+    print(f"{'sequential run_sync':<32} {sequential:7.2f}s  {len(jobs) / sequential:7.1f} jobs/s")
+    print(
+        f"{label:<32} {batched:7.2f}s  {len(jobs) / batched:7.1f} jobs/s  "
+        f"({sum(r.ok for r in results)} ok)"
+    )
+
+
+if __name__ == "__main__":
+    main()
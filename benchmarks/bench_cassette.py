@@ -0,0 +1,115 @@
+"""
+Replaying recorded step5 sessions from a cassette (see cassette.py).
+
+Each step5 scenario of bench_agents is recorded once, with a scripted model
+waiting `--model-ms` per request and the DocCatalog stand-in `--query-ms`
+per query. The recorded turns are then replayed `--sessions` times over, at
+several concurrencies: at memory speed, and with the recorded latency. Every
+replayed answer is checked against the recorded one:
+
+    python -m benchmarks.bench_cassette --sessions 50 --concurrency 1 16 64
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import tempfile
+import time
+
+from benchmarks.bench_agents import SCENARIOS, load_agent_module
+from benchmarks.common import event_loop, print_row, summarize
+from benchmarks.scripted import ScriptedModel
+from cassette import Cassette, use_cassette
+from fake_weaviate import use_stand_in
+import tools
+
+STEP5 = [s for s in SCENARIOS if s.agent == "step5" and not s.routed]
+
+
+def prompt(scenario) -> str:
+    # Scenarios sharing a question would record different answers to the same request,
+    # replayed in turn, so concurrent replays could pair them differently
+    return f"{scenario.prompt} ({scenario.name})"
+
+
+def clear_caches() -> None:
+    tools.page_cache.clear()
+    tools.search_cache.clear()
+
+
+def record(path: str, module, model_latency: float) -> tuple[dict, float, dict]:
+    """Record every scenario once; return the answers by scenario, the seconds taken and the cassette stats."""
+    agent = module.chatbot_agent
+    answers = {}
+    start = time.perf_counter()
+    with Cassette(path, "record") as cassette, use_cassette(cassette), event_loop():
+        for scenario in STEP5:
+            clear_caches()
+            script = ScriptedModel(scenario.steps, latency=model_latency)
+            with agent.override(model=cassette.model(script.model())):
+                result = agent.run_sync(prompt(scenario), deps=module.ChatDeps())
+            answers[scenario.name] = result.output
+        stats = cassette.stats()
+    return answers, time.perf_counter() - start, stats
+
+
+async def replay(cassette: Cassette, module, sessions: int, concurrency: int) -> tuple[list[float], list[tuple[str, str]]]:
+    """Replay every scenario `sessions` times, `concurrency` turns at once; return turn times and answers."""
+    agent = module.chatbot_agent
+    gate = asyncio.Semaphore(concurrency)
+    samples, outputs = [], []
+
+    async def turn(scenario) -> None:
+        async with gate:
+            start = time.perf_counter()
+            result = await agent.run(prompt(scenario), deps=module.ChatDeps())
+            samples.append(time.perf_counter() - start)
+            outputs.append((scenario.name, result.output))
+
+    clear_caches()
+    await asyncio.gather(*(turn(scenario) for _ in range(sessions) for scenario in STEP5))
+    return samples, outputs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--model-ms", type=float, default=300.0)
+    parser.add_argument("--query-ms", type=float, default=30.0)
+    args = parser.parse_args()
+
+    use_stand_in(query_latency=args.query_ms / 1000)
+    module = load_agent_module("step5")
+    turns = args.sessions * len(STEP5)
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        path = f"{directory}/step5.cassette"
+        answers, recorded, stats = record(path, module, args.model_ms / 1000)
+        rows = []
+        for latency in (None, 1.0):
+            for concurrency in args.concurrency:
+                with Cassette(path, "replay", latency=latency) as cassette:
+                    with use_cassette(cassette, module.chatbot_agent):
+                        start = time.perf_counter()
+                        samples, outputs = asyncio.run(replay(cassette, module, args.sessions, concurrency))
+                        elapsed = time.perf_counter() - start
+                    mismatches = sum(output != answers[name] for name, output in outputs)
+                    label = f"{'recorded latency' if latency else 'memory speed'}, concurrency {concurrency}"
+                    rows.append((label, summarize(samples), turns / elapsed, mismatches, cassette.stats()))
+    print(
+        f"{len(STEP5)} step5 turns recorded in {recorded:.2f}s "
+        f"({args.model_ms:.0f}ms per model request, {args.query_ms:.0f}ms per query): "
+        f"{stats['recorded']} responses, {stats['bytes'] / 1024:.0f}KB on disk; "
+        f"replayed {args.sessions}x each ({turns} turns)\n"
+    )
+    for label, latency, throughput, mismatches, stats in rows:
+        print_row(label, latency)
+        print(
+            f"{'':<4}{throughput:8.1f} turns/s, {mismatches} answers differing, "
+            f"{stats['hits']} responses replayed, {stats['misses']} misses"
+        )
+
+
+if __name__ == "__main__":
+    main()
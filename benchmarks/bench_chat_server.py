@@ -0,0 +1,147 @@
+"""
+Load test for chat_server.py: many sessions chatting at once, fully offline.
+
+The step5 agent runs with a scripted model (search, fetch the top result,
+then stream an answer, with `--model-ms` of latency per model request) against
+the DocCatalog stand-in. The server runs in-process on a local port and each
+simulated user sends `--turns` messages over server-sent events:
+
+    python -m benchmarks.bench_chat_server --users 50 --turns 3 --max-runs 8
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import socket
+import time
+
+import httpx
+import uvicorn
+from pydantic_ai.messages import ModelResponse, TextPart, ToolCallPart, ToolReturnPart
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, FunctionModel
+
+from benchmarks.common import summarize
+from chat_server import ChatServer, create_app
+from fake_weaviate import use_stand_in
+from step5_final_chatbot import ChatDeps, chatbot_agent
+
+ANSWER = "Collection aliases let you point a stable name at a collection and switch it without downtime. " * 3
+
+
+def scripted_model(model_latency: float) -> FunctionModel:
+    """Search for the question, fetch the top hit, then answer."""
+
+    def next_step(messages):
+        last = messages[-1].parts[-1]
+        if isinstance(last, ToolReturnPart) and last.tool_name == "tool_search_weaviate_docs":
+            return ToolCallPart("tool_fetch_weaviate_docs_page", {"path": last.content[0]["path"]})
+        if isinstance(last, ToolReturnPart):
+            return None
+        return ToolCallPart("tool_search_weaviate_docs", {"query": str(last.content)})
+
+    async def respond(messages, info: AgentInfo) -> ModelResponse:
+        await asyncio.sleep(model_latency)
+        call = next_step(messages)
+        return ModelResponse(parts=[call if call else TextPart(ANSWER)])
+
+    async def stream(messages, info: AgentInfo):
+        await asyncio.sleep(model_latency)
+        call = next_step(messages)
+        if call:
+            yield {0: DeltaToolCall(call.tool_name, json.dumps(call.args))}
+            return
+        for word in ANSWER.split(" "):
+            yield word + " "
+
+    return FunctionModel(respond, stream_function=stream)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def user(client: httpx.AsyncClient, turns: int, latencies: list, first_tokens: list, errors: list):
+    response = await client.post("/sessions")
+    session_id = response.json()["session_id"]
+    for i in range(turns):
+        start = time.perf_counter()
+        first = None
+        async with client.stream(
+            "POST", f"/sessions/{session_id}/messages", json={"message": f"How do collection aliases work? ({i})"}
+        ) as response:
+            if response.status_code != 200:
+                errors.append(response.status_code)
+                continue
+            event = None
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line.split(":", 1)[1].strip()
+                elif line.startswith("data:") and event == "text" and first is None:
+                    first = time.perf_counter() - start
+                elif line.startswith("data:") and event == "error":
+                    errors.append(line)
+        latencies.append(time.perf_counter() - start)
+        if first is not None:
+            first_tokens.append(first)
+
+
+async def run(args):
+    use_stand_in(query_latency=args.query_ms / 1000)
+    server = ChatServer(
+        chatbot_agent, ChatDeps, max_concurrent_runs=args.max_runs, max_waiting=args.users * 2
+    )
+    port = free_port()
+    config = uvicorn.Config(create_app(server), host="127.0.0.1", port=port, log_level="warning")
+    http_server = uvicorn.Server(config)
+    serve = asyncio.create_task(http_server.serve())
+    while not http_server.started:
+        await asyncio.sleep(0.01)
+
+    latencies, first_tokens, errors = [], [], []
+    limits = httpx.Limits(max_connections=args.users * 2)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(user(client, args.turns, latencies, first_tokens, errors) for _ in range(args.users))
+        )
+        elapsed = time.perf_counter() - start
+
+    http_server.should_exit = True
+    await serve
+    return latencies, first_tokens, errors, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--max-runs", type=int, default=8)
+    parser.add_argument("--model-ms", type=float, default=50.0)
+    parser.add_argument("--query-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    with chatbot_agent.override(model=scripted_model(args.model_ms / 1000)):
+        # The tools print as they run; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            latencies, first_tokens, errors, elapsed = asyncio.run(run(args))
+
+    print(
+        f"{args.users} users x {args.turns} turns, max {args.max_runs} concurrent runs, "
+        f"{args.model_ms}ms per model request, {args.query_ms}ms per Weaviate query\n"
+    )
+    for label, samples in (("turn latency", latencies), ("time to first token", first_tokens)):
+        stats = summarize(samples)
+        print(
+            f"{label:<22} n={stats['n']:<5} p50={stats['p50_ms']:9.1f}ms "
+            f"p95={stats['p95_ms']:9.1f}ms p99={stats['p99_ms']:9.1f}ms"
+        )
+    print(f"{'throughput':<22} {len(latencies) / elapsed:.1f} turns/s")
+    print(f"{'errors':<22} {len(errors)}")
+
+
+if __name__ == "__main__":
+    main()
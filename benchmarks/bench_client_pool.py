@@ -0,0 +1,93 @@
+"""
+Per-call latency of the doc tools: connect-per-call vs. the shared client.
+
+Uses the local stand-in from fake_weaviate.py with a simulated handshake cost,
+so it runs without network access:
+
+    python -m benchmarks.bench_client_pool --connect-ms 80 --query-ms 5
+"""
+
+import argparse
+import contextlib
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+from weaviate.classes.query import Filter
+
+import tools
+from benchmarks.common import print_row, summarize, time_calls
+from fake_weaviate import FakeDocCatalog, FakeWeaviateClient
+
+QUERY = "How do collection aliases work?"
+PATH = "weaviate/manage-collections/collection-aliases.md"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--connect-ms", type=float, default=80.0)
+    parser.add_argument("--query-ms", type=float, default=5.0)
+    parser.add_argument("-n", type=int, default=30)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    catalog = FakeDocCatalog()
+
+    def connect() -> FakeWeaviateClient:
+        return FakeWeaviateClient(
+            catalog,
+            connect_latency=args.connect_ms / 1000,
+            query_latency=args.query_ms / 1000,
+        )
+
+    # The previous implementation: a fresh client per tool call
+    def connect_per_call_fetch() -> str:
+        with connect() as client:
+            col = client.collections.use(tools.COLLECTION_NAME)
+            response = col.query.fetch_objects(
+                limit=1, filters=Filter.by_property("path").equal(PATH)
+            )
+        return response.objects[0].properties["content"]
+
+    def connect_per_call_search() -> list:
+        with connect() as client:
+            col = client.collections.use(tools.COLLECTION_NAME)
+            return col.query.near_text(query=QUERY, limit=5).objects
+
+    tools.client_manager.set_connect(connect)
+
+    def pooled_chain() -> None:
+        tools.search_weaviate_docs(QUERY)
+        tools.fetch_weaviate_docs_page(PATH)
+        tools.fetch_weaviate_docs_page(PATH)
+
+    def per_call_chain() -> None:
+        connect_per_call_search()
+        connect_per_call_fetch()
+        connect_per_call_fetch()
+
+    def threaded_chains() -> list[float]:
+        per_thread = max(1, args.n // args.threads)
+        with ThreadPoolExecutor(args.threads) as pool:
+            chunks = pool.map(
+                lambda _: time_calls(pooled_chain, per_thread), range(args.threads)
+            )
+            return [s for chunk in chunks for s in chunk]
+
+    print(f"Simulated handshake {args.connect_ms}ms, query {args.query_ms}ms\n")
+    rows = []
+    # Silence the search result printing while timing
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows.append(("fetch, connect per call", time_calls(connect_per_call_fetch, args.n)))
+        tools.fetch_weaviate_docs_page(PATH)  # warm the shared client
+        rows.append(("fetch, shared client", time_calls(lambda: tools.fetch_weaviate_docs_page(PATH), args.n)))
+        rows.append(("search+fetch+fetch, connect per call", time_calls(per_call_chain, args.n)))
+        rows.append(("search+fetch+fetch, shared client", time_calls(pooled_chain, args.n)))
+        rows.append((f"search+fetch+fetch, shared, {args.threads} threads", threaded_chains()))
+    for label, samples in rows:
+        print_row(label, summarize(samples))
+    print(f"\nConnections opened by the shared manager: {tools.client_manager.connects}")
+    tools.client_manager.close()
+
+
+if __name__ == "__main__":
+    main()
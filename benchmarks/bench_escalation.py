@@ -0,0 +1,101 @@
+"""
+Escalations: filing each ticket inside the tool call vs. queueing it.
+
+Inline, every `contact_human_support` call waits for the ticketing backend
+(`--backend-ms` per call). Queued, the tool returns once the ticket is on
+disk, and a background worker files the tickets in batches, retrying the
+batches the backend fails (`--failure-rate`):
+
+    python -m benchmarks.bench_escalation --tickets 100 --backend-ms 300
+"""
+
+import argparse
+import asyncio
+import logging
+import tempfile
+import time
+
+from benchmarks.common import print_row, summarize
+from escalation import EscalationQueue, LocalTicketBackend, Ticket, new_ticket_id
+from fake_weaviate import TOPICS
+
+
+def tickets(n: int, sessions: int) -> list[tuple[str, str, str, str, str]]:
+    """Tickets about a different docs topic each, spread round-robin over `sessions`."""
+    requests = []
+    for i in range(n):
+        path, title, keywords = TOPICS[i % len(TOPICS)]
+        requests.append(
+            (
+                f"session{i % sessions}",
+                f"{title} not working as documented ({i})",
+                f"Following {path} fails on cluster {i}: {keywords}.",
+                "bug",
+                "support",
+            )
+        )
+    return requests
+
+
+async def inline(backend: LocalTicketBackend, requests) -> list[float]:
+    samples = []
+    for session_id, title, description, issue_type, department in requests:
+        start = time.perf_counter()
+        ticket = Ticket(new_ticket_id(), session_id, title, description, issue_type, department)
+        await backend.submit([ticket])
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def queued(queue: EscalationQueue, requests) -> list[float]:
+    samples = []
+    for request in requests:
+        start = time.perf_counter()
+        queue.enqueue(*request)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tickets", type=int, default=100)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--backend-ms", type=float, default=300.0, help="ticketing backend latency per call")
+    parser.add_argument("--failure-rate", type=float, default=0.2, help="share of backend calls that fail")
+    args = parser.parse_args()
+    logging.getLogger("escalation").setLevel(logging.ERROR)
+
+    requests = tickets(args.tickets, args.sessions)
+    latency = args.backend_ms / 1000
+    inline_backend = LocalTicketBackend(latency=latency)
+    inline_samples = asyncio.run(inline(inline_backend, requests))
+
+    with tempfile.TemporaryDirectory() as directory:
+        backend = LocalTicketBackend(latency=latency, failure_rate=args.failure_rate, seed=1)
+        queue = EscalationQueue(f"{directory}/escalations.sqlite", submit=backend.submit, backoff=0.1)
+        start = time.perf_counter()
+        queued_samples = queued(queue, requests)
+        repeats = queued(queue, requests[: args.sessions])
+        queue.flush(timeout=120)
+        delivered = time.perf_counter() - start
+        stats = queue.stats()
+        queue.close()
+
+    print(
+        f"{args.tickets} tickets from {args.sessions} sessions, "
+        f"backend {args.backend_ms:.0f}ms per call, {args.failure_rate:.0%} of calls failing\n"
+    )
+    print_row("inline submit (tool latency)", summarize(inline_samples))
+    print_row("enqueue (tool latency)", summarize(queued_samples))
+    print_row("enqueue a repeat (deduplicated)", summarize(repeats))
+    print(
+        f"\nInline: {sum(inline_samples):.1f}s of tool time, {inline_backend.batches} backend calls"
+        f"\nQueued: all filed {delivered:.1f}s after the first enqueue, {backend.batches} backend calls "
+        f"({backend.failures} failed and retried), {len(backend.tickets)} tickets filed, "
+        f"{args.sessions} repeats dropped"
+        f"\nQueue: {stats}"
+    )
+
+
+if __name__ == "__main__":
+    main()
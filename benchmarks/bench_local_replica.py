@@ -0,0 +1,73 @@
+"""
+Search latency: stand-in cluster vs. the local replica's float32 brute-force search.
+
+    python -m benchmarks.bench_local_replica --docs 20000 --query-ms 40
+"""
+
+import argparse
+import tempfile
+
+import numpy as np
+
+from benchmarks.common import print_row, summarize, time_calls
+from fake_weaviate import FakeDocCatalog, FakeWeaviateClient, make_doc_corpus
+from local_replica import LocalDocCatalog, export_collection
+
+QUERIES = [
+    "How do collection aliases work?",
+    "configure product quantization",
+    "backup to s3",
+    "hybrid search alpha",
+    "multi tenancy offload",
+]
+
+
+def dense_vectors(n: int, dim: int, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """Cohere-sized dense vectors, and 64 queries that are noisy copies of random docs."""
+    rng = np.random.default_rng(seed)
+    docs = rng.standard_normal((n, dim)).astype(np.float32)
+    picks = rng.choice(n, 64, replace=False)
+    queries = docs[picks] + 0.8 * rng.standard_normal((64, dim)).astype(np.float32)
+    return docs, queries
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--query-ms", type=float, default=40.0)
+    parser.add_argument("-n", type=int, default=50)
+    args = parser.parse_args()
+
+    catalog = FakeDocCatalog(make_doc_corpus(args.docs, content_chars=200))
+    client = FakeWeaviateClient(catalog, query_latency=args.query_ms / 1000)
+    col = client.collections.use("DocCatalog")
+
+    with tempfile.TemporaryDirectory() as replica_dir:
+        export_collection(col, replica_dir, {"provider": "stand-in", "model": None})
+        local = LocalDocCatalog(replica_dir)
+        queries = iter(QUERIES * args.n)
+        remote = time_calls(lambda: col.query.near_text(next(queries), limit=5), args.n)
+        queries = iter(QUERIES * args.n)
+        exact = time_calls(lambda: local.near_text(next(queries), limit=5), args.n)
+
+    # Same export path, with dense vectors the size of the cluster's Cohere embeddings
+    docs, batch = dense_vectors(args.docs, args.dim)
+    catalog.vectors = list(docs)
+    with tempfile.TemporaryDirectory() as replica_dir:
+        export_collection(col, replica_dir, {"provider": "stand-in", "model": None})
+        dense = LocalDocCatalog(replica_dir)
+        one = iter(batch)
+        dense_exact = time_calls(lambda: dense.search_vectors(next(one), 5), len(batch))
+        batched = time_calls(lambda: dense.search_vectors(batch, 5), 10)
+
+    print(f"{args.docs} docs, {args.query_ms}ms simulated cluster latency\n")
+    print_row("stand-in cluster near_text", summarize(remote))
+    print_row("local replica near_text", summarize(exact))
+    print(f"\n{args.dim}-dim dense vectors:")
+    print_row("local, float32 brute force", summarize(dense_exact))
+    print_row("local, float32, batch of 64", summarize(batched))
+
+
+if __name__ == "__main__":
+    main()
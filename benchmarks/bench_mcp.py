@@ -0,0 +1,137 @@
+"""
+MCP tools: a server started per agent run vs. a warm, pre-started pool.
+
+Runs the bonus MCP demo's agent against the local stand-in server
+(benchmarks/dummy_mcp_server.py), with a scripted model that searches, fetches
+a page and answers. `--startup-ms` stands in for `uv run` and the server's
+own startup; `--tool-ms` is added to each tool call:
+
+    python -m benchmarks.bench_mcp --startup-ms 1500 --tool-ms 20 --runs 10
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from pydantic_ai.mcp import MCPServerStdio
+
+from benchmarks.common import print_row, summarize
+from benchmarks.scripted import ScriptedModel
+from bonus_weaviate_mcp_demo import basic_agent
+from mcp_pool import WarmMCPPool
+
+QUERY = "How do I configure backups in Weaviate?"
+PATH = "weaviate/configuration/backups.md"
+STEPS = [
+    [("search_weaviate_docs", {"query": QUERY})],
+    [("fetch_weaviate_docs_page", {"path": PATH})],
+    "Here is how to configure backups.",
+]
+
+
+def server_factory(startup_ms: float, tool_ms: float):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def make_server() -> MCPServerStdio:
+        return MCPServerStdio(
+            sys.executable,
+            ["-m", "benchmarks.dummy_mcp_server", "--startup-ms", str(startup_ms), "--tool-ms", str(tool_ms)],
+            cwd=root,
+            env=dict(os.environ, PYTHONPATH=root),
+            timeout=30,  # servers starting side by side on few cores take longer than the default 5s
+        )
+
+    return make_server
+
+
+async def cold_runs(make_server, model, runs: int) -> list[float]:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        with basic_agent.override(model=model, toolsets=[make_server()]):
+            await basic_agent.run(QUERY)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def warm_runs(pool: WarmMCPPool, model, runs: int) -> list[float]:
+    samples = []
+    with basic_agent.override(model=model, toolsets=[pool]):
+        for _ in range(runs):
+            start = time.perf_counter()
+            await basic_agent.run(QUERY)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def tool_calls(make_server, pool: WarmMCPPool, calls: int) -> tuple[list[float], list[float]]:
+    """First call on a freshly started server vs. a call on the warm pool."""
+    cold, warm = [], []
+    tools = await pool.get_tools(None)
+    for _ in range(calls):
+        start = time.perf_counter()
+        async with make_server() as server:
+            await server.direct_call_tool("search_weaviate_docs", {"query": QUERY})
+        cold.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        await pool.call_tool("search_weaviate_docs", {"query": QUERY}, None, tools["search_weaviate_docs"])
+        warm.append(time.perf_counter() - start)
+    return cold, warm
+
+
+async def concurrent_runs(make_server, model, size: int, runs: int) -> tuple[float, float]:
+    """Start a pool of `size` servers, then `runs` agent runs at once. Return both durations."""
+    pool = WarmMCPPool(make_server, size=size)
+    startup_seconds = await pool.start()
+    start = time.perf_counter()
+    with basic_agent.override(model=model, toolsets=[pool]):
+        await asyncio.gather(*(basic_agent.run(QUERY) for _ in range(runs)))
+    elapsed = time.perf_counter() - start
+    await pool.close()
+    return startup_seconds, elapsed
+
+
+async def run(args) -> None:
+    make_server = server_factory(args.startup_ms, args.tool_ms)
+    model = ScriptedModel(STEPS, latency=args.model_ms / 1000).model()
+
+    print(
+        f"Server startup {args.startup_ms:.0f}ms, tool calls {args.tool_ms:.0f}ms, "
+        f"model requests {args.model_ms:.0f}ms, {len(STEPS)} per run\n"
+    )
+    cold = await cold_runs(make_server, model, args.runs)
+    pool = WarmMCPPool(make_server)
+    startup_seconds = await pool.start()
+    warm = await warm_runs(pool, model, args.runs)
+    cold_calls, warm_calls = await tool_calls(make_server, pool, args.calls)
+    await pool.close()
+
+    print_row("agent run, server started per run", summarize(cold))
+    print_row("agent run, warm pool", summarize(warm))
+    print_row("tool call, freshly started server", summarize(cold_calls))
+    print_row("tool call, warm pool", summarize(warm_calls))
+    print(f"\nPool startup (once, before the first prompt): {startup_seconds:.2f}s")
+
+    print(f"\n{args.concurrent} concurrent agent runs:")
+    for size in (1, 4):
+        startup_seconds, elapsed = await concurrent_runs(make_server, model, size, args.concurrent)
+        print(f"pool of {size}: started in {startup_seconds:.2f}s, runs took {elapsed:.2f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--startup-ms", type=float, default=1500.0, help="server startup before the handshake")
+    parser.add_argument("--tool-ms", type=float, default=20.0)
+    parser.add_argument("--model-ms", type=float, default=20.0)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--calls", type=int, default=5)
+    parser.add_argument("--concurrent", type=int, default=20)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
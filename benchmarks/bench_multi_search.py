@@ -0,0 +1,87 @@
+"""
+Rephrased searches: one tool call per phrasing vs. one fan-out search.
+
+A scripted step5 agent searches for `--queries` phrasings of a question, one
+`tool_search_weaviate_docs` call (and model round trip) after another, then
+the same phrasings in a single `tool_search_weaviate_docs_multi` call, which
+runs them (plus their keyword variants) concurrently and fuses the results:
+
+    python -m benchmarks.bench_multi_search --model-ms 400 --query-ms 30
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+os.environ.setdefault("ESCALATION_QUEUE_DB", ":memory:")
+
+import tools
+from benchmarks.bench_agents import load_agent_module
+from benchmarks.common import print_row, summarize
+from benchmarks.scripted import ScriptedModel
+from fake_weaviate import use_stand_in
+
+PHRASINGS = [
+    "How do I make my vectors use less memory?",
+    "vector compression options",
+    "configure product quantization",
+    "binary quantization recall trade-off",
+]
+EXPECTED = {
+    "weaviate/configuration/compression/pq-compression.md",
+    "weaviate/configuration/compression/bq-compression.md",
+}
+
+
+async def turns(module, steps, latency: float, n: int) -> tuple[list[float], int]:
+    script = ScriptedModel(steps, latency=latency)
+    samples = []
+    with module.chatbot_agent.override(model=script.model()):
+        for _ in range(n):
+            tools.search_cache.clear()
+            start = time.perf_counter()
+            await module.chatbot_agent.run(PHRASINGS[0], deps=module.ChatDeps())
+            samples.append(time.perf_counter() - start)
+    return samples, script.requests // n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=3, choices=range(1, len(PHRASINGS) + 1))
+    parser.add_argument("--model-ms", type=float, default=400.0)
+    parser.add_argument("--query-ms", type=float, default=30.0)
+    parser.add_argument("-n", type=int, default=10)
+    args = parser.parse_args()
+    logging.getLogger("tools").setLevel(logging.WARNING)
+
+    module = load_agent_module("step5")
+    catalog = use_stand_in(query_latency=args.query_ms / 1000)
+    queries = PHRASINGS[: args.queries]
+    answer = "Use PQ or BQ compression."
+    sequential = [[("tool_search_weaviate_docs", {"query": q})] for q in queries] + [answer]
+    fan_out = [[("tool_search_weaviate_docs_multi", {"queries": queries})], answer]
+    latency = args.model_ms / 1000
+
+    print(f"{len(queries)} phrasings, model {args.model_ms:.0f}ms per request, query {args.query_ms:.0f}ms\n")
+    rows = []
+    for label, steps in [("one search call per phrasing", sequential), ("one fan-out search call", fan_out)]:
+        before = catalog.queries
+        samples, requests = asyncio.run(turns(module, steps, latency, args.n))
+        rows.append((label, samples, requests, (catalog.queries - before) // args.n))
+    for label, samples, requests, queries_run in rows:
+        print_row(label, summarize(samples))
+        print(f"{'':<40} {requests} model requests, {queries_run} Weaviate queries per turn")
+
+    tools.search_cache.clear()
+    single = {r["path"] for r in tools.search_weaviate_docs(queries[0])}
+    fused = {r["path"] for r in tools.search_weaviate_docs_multi(queries)}
+    print(
+        f"\nExpected pages in the top 5: first phrasing alone {len(single & EXPECTED)}/{len(EXPECTED)}, "
+        f"fused {len(fused & EXPECTED)}/{len(EXPECTED)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Page fetch latency for cold pages, hot pages (memory) and warm restarts (disk).
+
+    python -m benchmarks.bench_page_cache --query-ms 20
+"""
+
+import argparse
+import tempfile
+
+import tools
+from benchmarks.common import print_row, summarize, time_calls
+from fake_weaviate import FakeDocCatalog, FakeWeaviateClient
+from page_cache import DiskPageStore, PageCache
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--query-ms", type=float, default=20.0)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--content-kb", type=int, default=32)
+    args = parser.parse_args()
+
+    catalog = FakeDocCatalog()
+    paths = [doc["path"] for doc in catalog.docs[: args.pages]]
+    tools.client_manager.set_connect(
+        lambda: FakeWeaviateClient(catalog, query_latency=args.query_ms / 1000)
+    )
+    for doc in catalog.docs:
+        doc["content"] = (doc["content"] * (args.content_kb * 1024 // len(doc["content"]) + 1))[
+            : args.content_kb * 1024
+        ]
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        tools.page_cache = PageCache(store=DiskPageStore(cache_dir))
+        it = iter(paths)
+        cold = time_calls(lambda: tools.fetch_weaviate_docs_page(next(it)), len(paths))
+        it = iter(paths)
+        hot = time_calls(lambda: tools.fetch_weaviate_docs_page(next(it)), len(paths))
+        memory_stats = tools.page_cache.stats()
+
+        # Simulate a restart: empty memory tier, same directory on disk
+        tools.page_cache = PageCache(store=DiskPageStore(cache_dir))
+        it = iter(paths)
+        warm = time_calls(lambda: tools.fetch_weaviate_docs_page(next(it)), len(paths))
+        disk_stats = tools.page_cache.stats()
+
+    print(f"{len(paths)} pages of {args.content_kb}KB, {args.query_ms}ms per query\n")
+    print_row("cold (Weaviate)", summarize(cold))
+    print_row("hot (memory LRU)", summarize(hot))
+    print_row("warm restart (disk, mmap)", summarize(warm))
+    print(f"\nFirst process: {memory_stats}")
+    print(f"After restart: {disk_stats}")
+
+
+if __name__ == "__main__":
+    main()
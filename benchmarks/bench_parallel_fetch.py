@@ -0,0 +1,67 @@
+"""
+Turn latency when the model asks for several page fetches in one response.
+
+A scripted FunctionModel requests `--fetches` `tool_fetch_weaviate_docs_page`
+calls at once, then answers. The step5 agent's async tools run against the
+async stand-in client, so the turn should take about one fetch, not the sum.
+The page cache is cleared before every turn, so each fetch is a query:
+
+    python -m benchmarks.bench_parallel_fetch --fetches 5 --query-ms 50
+"""
+
+import argparse
+import contextlib
+import io
+
+from pydantic_ai.messages import ModelResponse, TextPart, ToolCallPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from benchmarks.common import print_row, summarize, time_calls
+from fake_weaviate import TOPICS, use_stand_in
+from step5_final_chatbot import chatbot_agent
+import tools
+
+
+def fetch_all_model(n_fetches: int) -> FunctionModel:
+    """First response: n parallel fetches. Second response: a final answer."""
+    paths = [path for path, _, _ in TOPICS[:n_fetches]]
+
+    def respond(messages, info: AgentInfo) -> ModelResponse:
+        if len(messages) == 1:
+            return ModelResponse(
+                parts=[
+                    ToolCallPart("tool_fetch_weaviate_docs_page", {"path": path})
+                    for path in paths
+                ]
+            )
+        return ModelResponse(parts=[TextPart("Done.")])
+
+    return FunctionModel(respond)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fetches", type=int, default=5)
+    parser.add_argument("--query-ms", type=float, default=50.0)
+    parser.add_argument("-n", type=int, default=10)
+    args = parser.parse_args()
+
+    use_stand_in(query_latency=args.query_ms / 1000)
+
+    def run_turn() -> None:
+        # A cached page would skip the very fetches being timed
+        tools.page_cache.clear()
+        chatbot_agent.run_sync("Compare these pages")
+
+    with chatbot_agent.override(model=fetch_all_model(args.fetches)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_turn()  # connect the shared client
+            samples = time_calls(run_turn, args.n)
+
+    print(f"{args.fetches} fetches per turn, {args.query_ms}ms per fetch")
+    print(f"Sum of fetch latencies: {args.fetches * args.query_ms:.0f}ms\n")
+    print_row("step5 turn, async tools", summarize(samples))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Wrong page paths: a round trip to find nothing vs. the local path index.
+
+First the lookup cost of the index itself (exact, corrected and rejected
+paths) as the catalog grows, then a wrong path through `fetch_weaviate_docs_page`,
+before (a Weaviate query that returns no page) and after (corrected or
+rejected locally):
+
+    python -m benchmarks.bench_path_index --sizes 1000 10000 50000 --query-ms 30
+"""
+
+import argparse
+import logging
+import time
+
+import tools
+from benchmarks.common import print_row, summarize, time_calls
+from fake_weaviate import make_doc_corpus, use_stand_in
+from path_index import PathIndex
+
+# (requested, kind): typos, wrong folders, missing .md, made-up pages
+WRONG_PATHS = [
+    ("weaviate/configuration/backup.md", "typo"),
+    ("weaviate/config/backups.md", "wrong folder"),
+    ("weaviate/search/hybrid", "no .md"),
+    ("weaviate/search/hybird-search.md", "typo"),
+    ("weaviate/manage-data/collection-aliases.md", "wrong folder"),
+    ("weaviate/totally/made-up-page.md", "made up"),
+]
+VALID_PATH = "weaviate/configuration/backups.md"
+
+
+def lookups(sizes: list[int], n: int) -> None:
+    for size in sizes:
+        paths = [doc["path"] for doc in make_doc_corpus(n_docs=size, content_chars=0)]
+        index = PathIndex(lambda: paths)
+        index.refresh()
+        wrong = iter([path for path, _ in WRONG_PATHS] * n)
+        print_row(f"{size} paths, valid path", summarize(time_calls(lambda: index.resolve(VALID_PATH), n)))
+        print_row(f"{size} paths, wrong path", summarize(time_calls(lambda: index.resolve(next(wrong)), n)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--query-ms", type=float, default=30.0)
+    parser.add_argument("-n", type=int, default=300)
+    args = parser.parse_args()
+    logging.getLogger("tools").setLevel(logging.WARNING)
+
+    print("Path index lookups:")
+    lookups(args.sizes, args.n)
+
+    catalog = use_stand_in(query_latency=args.query_ms / 1000)
+    tools.path_index.refresh()
+    outcomes = {}
+
+    # The previous behaviour: every path goes to Weaviate, and a wrong one finds nothing
+    def unchecked(path: str) -> bool:
+        try:
+            tools._page(path, tools._load_pages([path]))
+            return True
+        except ValueError:
+            return False
+
+    def checked(path: str) -> bool:
+        try:
+            tools.fetch_weaviate_docs_page(path)
+            outcomes[path] = "corrected"
+            return True
+        except tools.PageNotFoundError as error:
+            outcomes[path] = f"rejected locally, {len(error.suggestions)} suggestions"
+            return False
+
+    print(f"\nA wrong path through fetch_weaviate_docs_page, query {args.query_ms:.0f}ms:")
+    for label, fetch in [("sent to Weaviate", unchecked), ("checked against the index", checked)]:
+        before = catalog.queries
+        samples, pages = [], 0
+        for path, _ in WRONG_PATHS:
+            tools.page_cache.clear()
+            start = time.perf_counter()
+            pages += fetch(path)
+            samples.append(time.perf_counter() - start)
+        print_row(label, summarize(samples))
+        print(
+            f"{'':<40} {len(WRONG_PATHS)} wrong paths: {catalog.queries - before} Weaviate queries, "
+            f"{pages} pages returned"
+        )
+    print()
+    for path, kind in WRONG_PATHS:
+        print(f"{kind:<13} {path:<45} {outcomes[path]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Rate limiting against a provider that answers 429 over its quota.
+
+A batch of step3 jobs runs against a scripted model with a simulated quota of
+`--rpm` requests per minute, first with no client-side limit (429s, pauses
+and retries), then with the limiter set to the quota. Then a few interactive
+turns run while a batch is going, in their own lane and in the batch's lane:
+
+    python -m benchmarks.bench_rate_limit --rpm 600 --users 20
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+from batch_runner import matrix_jobs, run_batch
+from benchmarks.bench_agents import load_agent_module
+from benchmarks.common import print_row, summarize
+from benchmarks.scripted import ScriptedModel, SimulatedQuota
+from rate_limit import BATCH, INTERACTIVE, lane, limiter, rate_limited
+
+PROMPTS = ["What's the weather like today where I am?", "What country is my city in?"]
+STEPS = [[("tool_get_weather", {})], "It is cloudy."]
+
+
+def run_jobs(agent, jobs, rpm: float, latency: float, concurrency: int) -> tuple[float, SimulatedQuota, int]:
+    quota = SimulatedQuota(per_minute=rpm, burst=2)
+    script = ScriptedModel(STEPS, latency=latency, quota=quota)
+    start = time.perf_counter()
+    results = asyncio.run(run_batch(agent, jobs, model=script.model(), concurrency=concurrency))
+    return time.perf_counter() - start, quota, sum(r.ok for r in results)
+
+
+async def turns_during_batch(agent, jobs, deps, priority: int, latency: float, turns: int) -> list[float]:
+    script = ScriptedModel(STEPS, latency=latency)
+    batch = asyncio.create_task(run_batch(agent, jobs, model=script.model(), concurrency=16))
+    await asyncio.sleep(0.2)  # let the batch fill the queue
+    samples = []
+    with agent.override(model=rate_limited(script.model())), lane(priority):
+        for _ in range(turns):
+            start = time.perf_counter()
+            await agent.run(PROMPTS[0], deps=deps)
+            samples.append(time.perf_counter() - start)
+    await batch
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rpm", type=float, default=600, help="the simulated provider's quota")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--model-ms", type=float, default=20.0)
+    parser.add_argument("--turns", type=int, default=10, help="interactive turns during a batch")
+    args = parser.parse_args()
+
+    module = load_agent_module("step3")
+    agent = module.basic_agent
+    users = [module.UserInfo(name=f"user{i}", city="Edinburgh") for i in range(args.users)]
+    jobs = matrix_jobs(users, PROMPTS)
+    latency = args.model_ms / 1000
+    print(f"{len(jobs)} jobs, 2 model requests each, provider quota {args.rpm:.0f} requests/minute\n")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = [("no client limit", *run_jobs(agent, jobs, args.rpm, latency, args.concurrency))]
+        # FunctionModel's provider name is "function"
+        limiter.configure("function", rpm=args.rpm, burst_seconds=0.2)
+        rows.append(("limited to the quota", *run_jobs(agent, jobs, args.rpm, latency, args.concurrency)))
+    for label, seconds, quota, ok in rows:
+        print(f"{label:<24} {seconds:6.2f}s  {ok} ok  {quota.rejected:4d} 429s")
+
+    print(f"\nInteractive turns during a batch of {len(jobs)} jobs:")
+    with contextlib.redirect_stdout(io.StringIO()):
+        interactive = asyncio.run(turns_during_batch(agent, jobs, users[0], INTERACTIVE, latency, args.turns))
+        behind = asyncio.run(turns_during_batch(agent, jobs, users[0], BATCH, latency, args.turns))
+    print_row("interactive lane", summarize(interactive))
+    print_row("same lane as the batch", summarize(behind))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Search payload: every property of each hit vs. only the ones the results use.
+
+The previous search pulled each hit's full page `content` and
+`referenced_files`, then kept only `path` and `summary`. The stand-in charges
+`--transfer-ms-per-kb` for every KB of a response, on top of `--query-ms`:
+
+    python -m benchmarks.bench_search_payload --transfer-ms-per-kb 0.1 --query-ms 5
+"""
+
+import argparse
+import logging
+
+import tools
+from benchmarks.common import print_row, summarize, time_calls
+from fake_weaviate import use_stand_in
+from telemetry import metrics
+
+QUERIES = [
+    "How do collection aliases work?",
+    "vector compression options",
+    "configure backups to s3",
+    "hybrid search alpha",
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--transfer-ms-per-kb", type=float, default=0.1)
+    parser.add_argument("--query-ms", type=float, default=5.0)
+    parser.add_argument("-n", type=int, default=40)
+    args = parser.parse_args()
+    logging.getLogger("tools").setLevel(logging.WARNING)
+
+    catalog = use_stand_in(query_latency=args.query_ms / 1000, transfer_latency=args.transfer_ms_per_kb / 1000)
+    queries = iter(QUERIES * args.n)
+
+    # The previous implementation: no return_properties, so every property comes back
+    def all_properties() -> list:
+        col = tools.client_manager.get().collections.use(tools.COLLECTION_NAME)
+        response = col.query.near_text(query=next(queries), limit=5, target_vector="default")
+        return [{"path": o.properties["path"], "summary": o.properties["summary"]} for o in response.objects]
+
+    def projected() -> list:
+        tools.search_cache.clear()
+        return tools.search_weaviate_docs(next(queries))
+
+    print(
+        f"Query {args.query_ms}ms + {args.transfer_ms_per_kb}ms per KB, "
+        f"{tools.SEARCH_LIMIT} hits per search\n"
+    )
+    rows = []
+    for label, search in [("all properties", all_properties), ("path + summary only", projected)]:
+        before = catalog.bytes_sent
+        samples = time_calls(search, args.n)
+        rows.append((label, samples, (catalog.bytes_sent - before) / args.n))
+    for label, samples, nbytes in rows:
+        print_row(label, summarize(samples))
+        print(f"{'':<40} {nbytes / 1024:8.1f} KB per search")
+    mean_bytes = metrics.mean("weaviate_response_bytes")
+    print(f"\nweaviate_response_bytes metric (path + summary only): mean {mean_bytes:.0f} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Check how doc pages are split into sections, offline (see page_sections.py).
+
+Each page below has headings and fenced code blocks whose lines start with
+`#` (shell and Python comments, markdown samples). The sections found must be
+the page's headings and only those, in order, and together cover the page.
+Exits with status 1 if a check fails:
+
+    python -m benchmarks.check_page_sections
+"""
+
+import sys
+
+from page_sections import page_window, split_sections
+
+# (name, page, expected section titles)
+PAGES = [
+    (
+        "backtick fence",
+        "# Install\n\nRun:\n\n```bash\n# comment: not a heading\npip install weaviate-client\n```\n\n## Connect\n\nDone.\n",
+        ["Install", "Connect"],
+    ),
+    (
+        "tilde fence",
+        "Intro text.\n\n~~~markdown\n## Sample heading\n~~~\n\n## Next steps\n",
+        ["(introduction)", "Next steps"],
+    ),
+    (
+        "longer fence around a shorter one",
+        "# Docs\n\n````md\n```python\n# still code\n```\n# still code\n````\n\n# After\n",
+        ["Docs", "After"],
+    ),
+    (
+        "indented fence",
+        "# Steps\n\n1. Query:\n\n   ```python\n   # comment\n   ```\n\n## Results\n",
+        ["Steps", "Results"],
+    ),
+    (
+        "unclosed fence",
+        "# Start\n\n```python\n# code to the end of the page\n\n# Not a heading\n",
+        ["Start"],
+    ),
+]
+
+
+def main() -> None:
+    failures = 0
+    for name, page, expected in PAGES:
+        sections = split_sections(page)
+        titles = [s.title for s in sections]
+        problems = []
+        if titles != expected:
+            problems.append(f"sections {titles}, expected {expected}")
+        if "".join(page[s.start : s.end] for s in sections) != page:
+            problems.append("sections do not cover the page")
+        if [entry["title"] for entry in page_window(page)["table_of_contents"]] != titles:
+            problems.append("table of contents differs from the sections")
+        failures += bool(problems)
+        print(f"{name:<36} {'; '.join(problems) or 'ok'}")
+    if failures:
+        print(f"\n{failures} check(s) failed")
+        sys.exit(1)
+    print("\nAll pages split as expected")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Check the prompt-cache markers of step5's model requests, offline (see prompt_cache.py).
+
+A three-turn step5 conversation runs against a simulated Anthropic Messages
+API: scripted replies, and a prompt cache that reads the longest cached
+prefix at or up to 20 blocks before each breakpoint and writes the prefixes
+at the breakpoints (when at least `--min-tokens` long). Every request
+payload is checked for breakpoints on the last tool, the system prompt, the
+end of the earlier turns and the last message, and nowhere else. The cache
+tokens of each request and turn are printed, and the prompt tokens compared
+with the same conversation without caching. Exits with status 1 if a check fails:
+
+    python -m benchmarks.check_prompt_cache
+"""
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import sys
+from typing import Any, Dict
+
+import httpx
+from anthropic import AsyncAnthropic
+from pydantic_ai.models.anthropic import AnthropicModel
+from pydantic_ai.providers.anthropic import AnthropicProvider
+
+from benchmarks.bench_agents import load_agent_module
+from benchmarks.scripted import Step
+from chat_memory import ConversationMemory, outline_turns
+from compression import estimate_tokens
+from fake_weaviate import TOPICS, use_stand_in
+from prompt_cache import CachingAnthropicModel, turn_start
+
+MODEL = "claude-3-5-haiku-latest"
+PATHS = [path for path, _, _ in TOPICS[:3]]
+
+# The conversation: each user message and the model's replies in its turn
+TURNS: Dict[str, list[Step]] = {
+    "How do collection aliases work?": [
+        [("tool_search_weaviate_docs", {"query": "collection aliases"})],
+        [("tool_fetch_weaviate_docs_page", {"path": path}) for path in PATHS[:2]],
+        "Aliases point to a collection; switch them to migrate without downtime.",
+    ],
+    "How do I switch an alias to a new collection?": [
+        [("tool_fetch_weaviate_docs_page", {"path": PATHS[2]})],
+        "Update the alias with client.alias.update(...).",
+    ],
+    "Does that work with multi-tenant collections?": [
+        [("tool_search_weaviate_docs", {"query": "aliases multi-tenancy"})],
+        "Yes, an alias can point to a multi-tenant collection.",
+    ],
+}
+
+
+def _blocks(message: Dict[str, Any]) -> list[Dict[str, Any]]:
+    content = message["content"]
+    return [{"type": "text", "text": content}] if isinstance(content, str) else content
+
+
+def _marked(block: Dict[str, Any]) -> bool:
+    return "cache_control" in block
+
+
+def count_markers(payload: Dict[str, Any]) -> int:
+    system = payload.get("system")
+    blocks = [*payload.get("tools", []), *(system if isinstance(system, list) else [])]
+    blocks += [b for m in payload["messages"] for b in _blocks(m)]
+    return sum(map(_marked, blocks))
+
+
+class SimulatedMessagesAPI:
+    """The Anthropic Messages API as far as the check needs: scripted replies and a prompt cache."""
+
+    def __init__(self, min_tokens: int, lookback: int = 20):
+        self.min_tokens = min_tokens
+        self.lookback = lookback
+        self.payloads: list[Dict[str, Any]] = []
+        self.usages: list[Dict[str, int]] = []
+        self._cache: set[str] = set()
+
+    def _segments(self, payload: Dict[str, Any]) -> list[tuple[str, int, bool]]:
+        """The request's blocks in cache order (tools, system, messages): (prefix hash, prefix tokens, marked)."""
+        system = payload.get("system") or []
+        if isinstance(system, str):
+            system = [{"type": "text", "text": system}]
+        blocks = [*payload.get("tools", []), *system]
+        blocks += [{"role": m["role"], **b} for m in payload["messages"] for b in _blocks(m)]
+        segments, digest, tokens = [], hashlib.sha256(), 0
+        for block in blocks:
+            canonical = json.dumps({k: v for k, v in block.items() if k != "cache_control"}, sort_keys=True)
+            digest.update(canonical.encode("utf-8"))
+            tokens += estimate_tokens(canonical)
+            segments.append((digest.hexdigest(), tokens, _marked(block)))
+        return segments
+
+    def _account(self, payload: Dict[str, Any]) -> Dict[str, int]:
+        segments = self._segments(payload)
+        breakpoints = [i for i, (_, _, marked) in enumerate(segments) if marked]
+        readable = {j for b in breakpoints for j in range(max(0, b - self.lookback + 1), b + 1)}
+        read = max((segments[j][1] for j in readable if segments[j][0] in self._cache), default=0)
+        written = 0
+        for b in breakpoints:
+            prefix, tokens, _ = segments[b]
+            if tokens >= self.min_tokens and tokens > read:
+                self._cache.add(prefix)
+                written = max(written, tokens)
+        total = segments[-1][1] if segments else 0
+        write = max(0, written - read)
+        return {
+            "input_tokens": total - read - write,
+            "cache_read_input_tokens": read,
+            "cache_creation_input_tokens": write,
+        }
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        self.payloads.append(payload)
+        messages = payload["messages"]
+        start = turn_start(messages)
+        steps = TURNS[next(b["text"] for b in _blocks(messages[start]) if b.get("type") == "text")]
+        taken = sum(m["role"] == "assistant" for m in messages[start:])
+        step = steps[min(taken, len(steps) - 1)]
+        if isinstance(step, str):
+            content = [{"type": "text", "text": step}]
+        else:
+            content = [
+                {"type": "tool_use", "id": f"toolu_{len(self.payloads)}_{i}", "name": name, "input": args}
+                for i, (name, args) in enumerate(step)
+            ]
+        usage = self._account(payload)
+        self.usages.append(usage)
+        body = {
+            "id": f"msg_{len(self.payloads)}",
+            "type": "message",
+            "role": "assistant",
+            "model": payload["model"],
+            "content": content,
+            "stop_reason": "end_turn" if isinstance(step, str) else "tool_use",
+            "stop_sequence": None,
+            "usage": {**usage, "output_tokens": estimate_tokens(json.dumps(content))},
+        }
+        return httpx.Response(200, json=body)
+
+
+def check_markers(payload: Dict[str, Any]) -> list[str]:
+    """What is wrong with the breakpoints of one request payload."""
+    problems = []
+    tools = payload.get("tools", [])
+    if tools and ([_marked(t) for t in tools] != [False] * (len(tools) - 1) + [True]):
+        problems.append("the last tool (and only it) should be marked")
+    system = payload.get("system")
+    if not (isinstance(system, list) and len(system) == 1 and _marked(system[0])):
+        problems.append("the system prompt should be one marked text block")
+    messages = payload["messages"]
+    expected = {len(messages) - 1, turn_start(messages) - 1} - {-1}
+    for i, message in enumerate(messages):
+        marks = [_marked(b) for b in _blocks(message)]
+        if i in expected and not any(marks):
+            problems.append(f"message {i} ({message['role']}) should be marked")
+        if i not in expected and any(marks):
+            problems.append(f"message {i} ({message['role']}) should not be marked")
+        if sum(marks) > 1:
+            problems.append(f"message {i} has {sum(marks)} marked blocks")
+    total = count_markers(payload)
+    if total > 4:
+        problems.append(f"{total} breakpoints, over the API's limit of 4")
+    return problems
+
+
+async def converse(module, model) -> list:
+    """Run the conversation as the step5 chat loop does; return each turn's usage."""
+    memory = ConversationMemory(summarize=outline_turns)
+    turns = []
+    with module.chatbot_agent.override(model=model):
+        for message in TURNS:
+            result = await module.chatbot_agent.run(
+                message, message_history=memory.history(), deps=module.ChatDeps(session_id="check")
+            )
+            turns.append(memory.add_turn(result))
+    return turns
+
+
+def simulated_model(model_class, api: SimulatedMessagesAPI) -> AnthropicModel:
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(api.handle))
+    client = AsyncAnthropic(api_key="offline", http_client=http_client)
+    return model_class(MODEL, provider=AnthropicProvider(anthropic_client=client))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--min-tokens", type=int, default=2048, help="shortest prefix the cache stores (2048 for Haiku models)"
+    )
+    args = parser.parse_args()
+
+    use_stand_in()
+    module = load_agent_module("step5")
+    cached_api, plain_api = SimulatedMessagesAPI(args.min_tokens), SimulatedMessagesAPI(args.min_tokens)
+    with contextlib.redirect_stdout(io.StringIO()):
+        turns = asyncio.run(converse(module, simulated_model(CachingAnthropicModel, cached_api)))
+        plain_turns = asyncio.run(converse(module, simulated_model(AnthropicModel, plain_api)))
+
+    failures = 0
+    print(f"{'request':>7} {'tools':>5} {'msgs':>4} {'marks':>5} {'input':>7} {'read':>7} {'written':>7}  check")
+    for n, (payload, usage) in enumerate(zip(cached_api.payloads, cached_api.usages), 1):
+        problems = check_markers(payload)
+        failures += bool(problems)
+        print(
+            f"{n:>7} {len(payload.get('tools', [])):>5} {len(payload['messages']):>4} {count_markers(payload):>5} "
+            f"{usage['input_tokens']:>7} {usage['cache_read_input_tokens']:>7} "
+            f"{usage['cache_creation_input_tokens']:>7}  {'; '.join(problems) or 'ok'}"
+        )
+    if any(count_markers(payload) for payload in plain_api.payloads):
+        failures += 1
+        print("Requests without caching carry markers")
+
+    print()
+    for i, (turn, plain) in enumerate(zip(turns, plain_turns), 1):
+        print(
+            f"turn {i}: prompt {turn.prompt_tokens} tokens over {turn.requests} requests, "
+            f"{turn.cache_read_tokens} read from cache, {turn.cache_write_tokens} written "
+            f"(without caching: {plain.prompt_tokens} uncached)"
+        )
+    prompt = sum(t.prompt_tokens for t in turns)
+    read = sum(t.cache_read_tokens for t in turns)
+    print(f"\n{read / prompt:.0%} of {prompt} prompt tokens read from the cache")
+    if read == 0:
+        failures += 1
+        print("No request read from the cache")
+    if failures:
+        print(f"\n{failures} check(s) failed")
+        sys.exit(1)
+    print("\nAll requests marked as expected")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Small helpers shared by the benchmark scripts."""
+
+import asyncio
+import contextlib
+import statistics
+import time
+from typing import Callable, Dict, Iterator
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile of `samples` (0 < pct <= 100)."""
+    ordered = sorted(samples)
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples: list[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds."""
+    return {
+        "n": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+    }
+
+
+def time_calls(fn: Callable[[], object], n: int) -> list[float]:
+    """Call `fn` `n` times and return the wall-clock duration of each call."""
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+@contextlib.contextmanager
+def event_loop() -> Iterator[asyncio.AbstractEventLoop]:
+    """A new current event loop, e.g. for `run_sync` calls, closed on exit."""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        yield loop
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def print_row(label: str, stats: Dict[str, float]) -> None:
+    print(
+        f"{label:<40} n={stats['n']:<5} mean={stats['mean_ms']:9.3f}ms "
+        f"p50={stats['p50_ms']:9.3f}ms p95={stats['p95_ms']:9.3f}ms"
+    )
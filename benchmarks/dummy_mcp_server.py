@@ -0,0 +1,56 @@
+"""
+A local MCP server (stdio) serving the DocCatalog stand-in, for benchmarks.
+
+It has the shape of the docs MCP server used by bonus_weaviate_mcp_demo.py:
+a search tool and a page tool. `--startup-ms` delays the handshake, like
+`uv run` resolving dependencies does, and `--tool-ms` is added to each call:
+
+    python -m benchmarks.dummy_mcp_server --startup-ms 1500 --tool-ms 20
+"""
+
+import argparse
+import time
+
+from mcp.server.fastmcp import FastMCP
+from weaviate.classes.query import Filter
+
+from fake_weaviate import FakeDocCatalog, FakeWeaviateAsyncClient
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--startup-ms", type=float, default=0.0)
+    parser.add_argument("--tool-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    time.sleep(args.startup_ms / 1000)
+    client = FakeWeaviateAsyncClient(FakeDocCatalog(), query_latency=args.tool_ms / 1000)
+    server = FastMCP("weaviate-docs-stand-in", log_level="WARNING")
+
+    @server.tool()
+    async def search_weaviate_docs(query: str) -> list[dict]:
+        """Search the Weaviate docs; return the paths and summaries of the best matching pages."""
+        if not client.is_connected():
+            await client.connect()
+        response = await client.collections.use("DocCatalog").query.near_text(
+            query=query, limit=5, return_properties=["path", "summary"]
+        )
+        return [{"path": o.properties["path"], "summary": o.properties["summary"]} for o in response.objects]
+
+    @server.tool()
+    async def fetch_weaviate_docs_page(path: str) -> str:
+        """Fetch the full content of a Weaviate docs page by its path."""
+        if not client.is_connected():
+            await client.connect()
+        response = await client.collections.use("DocCatalog").query.fetch_objects(
+            limit=1, filters=Filter.by_property("path").equal(path)
+        )
+        if not response.objects:
+            raise ValueError(f"No Weaviate docs page found with path: {path}")
+        return response.objects[0].properties["content"]
+
+    server.run("stdio")
+
+
+if __name__ == "__main__":
+    main()
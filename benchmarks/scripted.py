@@ -0,0 +1,102 @@
+"""Scripted stand-ins for the LLM, so agent turns can run offline and repeatably."""
+
+import asyncio
+import time
+from typing import Any, Dict, Optional, Union
+
+import httpx
+from pydantic_ai.exceptions import ModelHTTPError
+from pydantic_ai.messages import ModelMessage, ModelRequest, ModelResponse, TextPart, ToolCallPart, UserPromptPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+# One model response: a final answer, or tool calls (made in parallel) as (tool name, args)
+Step = Union[str, list[tuple[str, Dict[str, Any]]]]
+
+
+def _steps_taken(messages: list[ModelMessage]) -> int:
+    """Model responses since the latest user prompt."""
+    taken = 0
+    for message in reversed(messages):
+        if isinstance(message, ModelResponse):
+            taken += 1
+        elif isinstance(message, ModelRequest) and any(isinstance(p, UserPromptPart) for p in message.parts):
+            break
+    return taken
+
+
+def throttled_error(model_name: str, retry_after: Optional[float]) -> ModelHTTPError:
+    """The error a provider's 429 turns into, with the HTTP response (and its retry-after) as the cause."""
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    headers = {"retry-after": f"{retry_after:.3f}"} if retry_after is not None else {}
+    response = httpx.Response(429, headers=headers, request=request)
+    error = ModelHTTPError(429, model_name, {"type": "rate_limit_error"})
+    error.__cause__ = httpx.HTTPStatusError("429 Too Many Requests", request=request, response=response)
+    return error
+
+
+class SimulatedQuota:
+    """
+    A provider's own rate limit: `per_minute` requests, `burst` at once.
+
+    Requests over it are rejected like the real API does, with a 429 whose
+    retry-after header (unless `retry_after` is false) says when to come back.
+    """
+
+    def __init__(self, per_minute: float, burst: float = 1.0, retry_after: bool = True):
+        self.rate = per_minute / 60
+        self.capacity = burst
+        self.retry_after = retry_after
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self.accepted = 0
+        self.rejected = 0
+
+    def check(self, model_name: str = "scripted") -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens < 1:
+            self.rejected += 1
+            wait = (1 - self._tokens) / self.rate
+            raise throttled_error(model_name, wait if self.retry_after else None)
+        self._tokens -= 1
+        self.accepted += 1
+
+
+class ScriptedModel:
+    """
+    Answer the n-th model request of each turn with `steps[n]` (the last step repeats).
+
+    Each request waits `latency` seconds, like a model API call would, and is
+    rejected with a 429 when over `quota`. `model_time` accumulates the time spent inside the model, so callers can
+    tell it apart from framework and tool time.
+    """
+
+    def __init__(self, steps: list[Step], latency: float = 0.0, quota: Optional[SimulatedQuota] = None):
+        self.steps = steps
+        self.latency = latency
+        self.quota = quota
+        self.requests = 0
+        self.model_time = 0.0
+
+    async def respond(self, messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        if self.quota is not None:
+            self.quota.check()
+        start = time.perf_counter()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        step = self.steps[min(_steps_taken(messages), len(self.steps) - 1)]
+        self.requests += 1
+        if isinstance(step, str):
+            parts = [TextPart(step)]
+        else:
+            parts = [ToolCallPart(name, args) for name, args in step]
+        self.model_time += time.perf_counter() - start
+        return ModelResponse(parts=parts)
+
+    def model(self) -> FunctionModel:
+        return FunctionModel(self.respond)
+
+    def reset(self) -> None:
+        self.requests = 0
+        self.model_time = 0.0
@@ -1,20 +1,36 @@
 # Reference: https://ai.pydantic.dev/agents/
 # Using a simple, personal demo MCP server for Weaviate docs (https://github.com/databyjp/weaviate-docs-mcp)
+# The server is started once, before the first prompt, and kept running for all of them (see mcp_pool.py).
+# Run with --cold to start it per prompt instead, as an agent with the server as its toolset does.
 from pydantic_ai import Agent
 from pathlib import Path
 from pydantic_ai.mcp import MCPServerStdio
+from mcp_pool import WarmMCPPool
+import asyncio
 import os
+import sys
+import time
 
 weaviate_docs_mcp_directory = Path.home() / "code" / "weaviate-docs-mcp"
-weaviate_docs_mcp_server = MCPServerStdio(
-    command="uv",
-    args=["--directory", str(weaviate_docs_mcp_directory), "run", "weaviate-docs-mcp"],
-    env=os.environ.copy(),
+
+
+def make_weaviate_docs_mcp_server() -> MCPServerStdio:
+    return MCPServerStdio(
+        command="uv",
+        args=["--directory", str(weaviate_docs_mcp_directory), "run", "weaviate-docs-mcp"],
+        env=os.environ.copy(),
+    )
+
+
+# MCP_POOL_SIZE servers share the calls; one is usually enough, as MCP multiplexes requests
+weaviate_docs_mcp_pool = WarmMCPPool(
+    make_weaviate_docs_mcp_server, size=int(os.getenv("MCP_POOL_SIZE", "1"))
 )
 
 basic_agent = Agent(
     model="anthropic:claude-3-5-haiku-latest",
-    toolsets=[weaviate_docs_mcp_server]
+    defer_model_check=True,  # resolved on the first run, so importing needs no API key
+    toolsets=[weaviate_docs_mcp_pool],
 )
 
 
@@ -35,15 +51,35 @@ def set_system_prompt() -> str:
     """
 
 
-for prompt in [
+prompts = [
     # "How do I configure backups in Weaviate? ",
     """What vector compression methods are available in Weaviate?
     Concretely, how do I configure it?
     Show me a code example using an actual compression method.
     Preferably, show me an end-to-end example from connection, collection creation, data ingestion and query.
     """,
-]:
-    print(f">> RUNNING PROMPT: {prompt}")
-    model_response = basic_agent.run_sync(user_prompt=prompt)
-    print(f"Agent response:")
-    print(model_response.output, "\n\n")
+]
+
+
+async def main(cold: bool = False) -> None:
+    if not cold:
+        # Pre-warm: start the server and list its tools while nobody is waiting on an answer
+        startup_seconds = await weaviate_docs_mcp_pool.start()
+        print(f"MCP server ready in {startup_seconds:.2f}s")
+    try:
+        for prompt in prompts:
+            print(f">> RUNNING PROMPT: {prompt}")
+            start = time.perf_counter()
+            if cold:
+                with basic_agent.override(toolsets=[make_weaviate_docs_mcp_server()]):
+                    model_response = await basic_agent.run(user_prompt=prompt)
+            else:
+                model_response = await basic_agent.run(user_prompt=prompt)
+            print(f"Agent response ({time.perf_counter() - start:.1f}s):")
+            print(model_response.output, "\n\n")
+    finally:
+        await weaviate_docs_mcp_pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(cold="--cold" in sys.argv[1:]))
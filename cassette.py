@@ -0,0 +1,565 @@
+"""
+Record an agent's model requests and the tools' Weaviate queries, and replay them offline.
+
+Recording, every model request the agent makes and every query tools.py sends
+to Weaviate is passed through, and its response stored in a cassette: a
+SQLite file with one compressed row per response. Replaying, the same
+requests are answered from the cassette, without a network call or API key.
+Responses come back at memory speed, or with `latency` set, after the time
+they took when recorded (times `latency`). Step scripts and load tests then
+run the same sessions repeatably, as often as needed:
+
+    with Cassette("sessions.cassette", "record") as cassette, use_cassette(cassette, chatbot_agent):
+        ...  # chat as usual
+    with Cassette("sessions.cassette", "replay") as cassette, use_cassette(cassette, chatbot_agent):
+        ...  # the same turns, offline
+
+A request is looked up by its fingerprint, a hash of what decides its
+response, in a dict loaded from the cassette at startup:
+
+- Model requests: the messages (without timestamps, and without the content
+  of tool returns, which may hold ticket IDs or times) and the tool names.
+- Weaviate queries: the collection, the query method and its arguments.
+
+A request recorded more than once (the same question in several sessions) is
+answered with its recorded responses in turn, so sessions replayed at once
+may get them in a different order than recorded. Many sessions can replay at
+once; replaying never writes to the cassette. A request that was not recorded
+raises `CassetteMiss`: record the session again.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter, ModelResponse
+from pydantic_ai.models import Model, ModelRequestParameters, StreamedResponse, infer_model
+
+from rate_limit import RateLimitedModel
+
+log = logging.getLogger(__name__)
+
+MODEL = "model"
+QUERY = "weaviate"
+
+# Parts of a serialized message that differ between otherwise identical requests
+VOLATILE_KEYS = {"timestamp", "provider_response_id", "provider_details", "usage"}
+METADATA_FIELDS = ("distance", "certainty", "score", "explain_score", "last_update_time")
+
+
+class CassetteMiss(LookupError):
+    """A request the cassette has no recorded response for."""
+
+
+def fingerprint(value: Any) -> str:
+    """Hash of `value`'s canonical JSON."""
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _canonical(value: Any) -> Any:
+    """`value` as plain JSON types. Objects (e.g. filters, whose repr has their address) become their fields."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_canonical(v) for v in value), key=str)
+    if hasattr(value, "__dict__"):
+        fields = {k: _canonical(v) for k, v in vars(value).items() if not k.startswith("_")}
+        return {"type": type(value).__name__, **fields}
+    return str(value)
+
+
+def _stable(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_stable(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    skip = VOLATILE_KEYS | ({"content"} if value.get("part_kind") == "tool-return" else set())
+    return {k: _stable(v) for k, v in value.items() if k not in skip}
+
+
+def model_fingerprint(messages: list[ModelMessage], parameters: ModelRequestParameters) -> str:
+    return fingerprint(
+        {
+            "messages": _stable(ModelMessagesTypeAdapter.dump_python(messages, mode="json")),
+            "tools": sorted(tool.name for tool in parameters.function_tools),
+            "output_tools": sorted(tool.name for tool in parameters.output_tools),
+        }
+    )
+
+
+def query_fingerprint(collection: str, method: str, args: tuple, kwargs: Dict[str, Any]) -> str:
+    return fingerprint(
+        {"collection": collection, "method": method, "args": _canonical(args), "kwargs": _canonical(kwargs)}
+    )
+
+
+@dataclass
+class RecordedMetadata:
+    distance: Optional[float] = None
+    certainty: Optional[float] = None
+    score: Optional[float] = None
+    explain_score: Optional[str] = None
+    last_update_time: Optional[str] = None
+
+
+@dataclass
+class RecordedObject:
+    """A returned object as replayed: what the tools read of a Weaviate object."""
+
+    properties: Dict[str, Any]
+    metadata: RecordedMetadata = field(default_factory=RecordedMetadata)
+    vector: Dict[str, list[float]] = field(default_factory=dict)
+    uuid: Optional[str] = None
+
+
+@dataclass
+class RecordedQueryReturn:
+    objects: list[RecordedObject]
+
+
+def _dump_objects(objects) -> bytes:
+    dumped = []
+    for o in objects:
+        metadata = getattr(o, "metadata", None)
+        uuid = getattr(o, "uuid", None)
+        dumped.append(
+            {
+                "properties": o.properties,
+                "metadata": {
+                    name: getattr(metadata, name)
+                    for name in METADATA_FIELDS
+                    if getattr(metadata, name, None) is not None
+                },
+                "vector": getattr(o, "vector", None) or {},
+                "uuid": str(uuid) if uuid is not None else None,
+            }
+        )
+    # Values JSON has no type for (dates, UUIDs) are replayed as strings
+    return json.dumps(dumped, default=str).encode("utf-8")
+
+
+def _load_objects(dumped: list[Dict[str, Any]]) -> list[RecordedObject]:
+    return [
+        RecordedObject(o["properties"], RecordedMetadata(**o["metadata"]), o["vector"], o["uuid"])
+        for o in dumped
+    ]
+
+
+class Cassette:
+    """
+    Recorded responses in a SQLite file at `path`, in `mode` "record" or "replay".
+
+    Recording adds to what the file already holds; delete it to start over.
+    Replaying, each response waits the time it took when recorded, times
+    `latency` (no wait when None). Thread-safe.
+    """
+
+    def __init__(self, path: str, mode: str = "replay", latency: Optional[float] = None):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode {mode!r}, expected 'record' or 'replay'")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        if self.replaying and not self.path.exists():
+            raise FileNotFoundError(f"No cassette at {path}; record one first")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS interactions ("
+            "fingerprint TEXT NOT NULL, seq INTEGER NOT NULL, kind TEXT NOT NULL, "
+            "response BLOB NOT NULL, seconds REAL NOT NULL, PRIMARY KEY (fingerprint, seq))"
+        )
+        self._lock = threading.Lock()
+        # Replaying: fingerprint -> [(kind, response, seconds)] in recording order. Recording: counts only
+        self._entries: Dict[str, list[tuple[str, Any, float]]] = {}
+        self._counts: Dict[str, int] = defaultdict(int)
+        self._served: Dict[str, int] = defaultdict(int)
+        self.recorded = 0
+        self.hits = 0
+        self.misses = 0
+        if self.replaying:
+            self._load()
+        else:
+            rows = self._db.execute("SELECT fingerprint, COUNT(*) FROM interactions GROUP BY fingerprint")
+            self._counts.update(rows)
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _load(self) -> None:
+        rows = self._db.execute("SELECT fingerprint, kind, response, seconds FROM interactions ORDER BY rowid")
+        for fp, kind, response, seconds in rows:
+            payload = zlib.decompress(response)
+            if kind == QUERY:
+                payload = json.loads(payload)
+            self._entries.setdefault(fp, []).append((kind, payload, seconds))
+        log.info("Loaded %d recorded responses from %s", len(self), self.path)
+
+    def __len__(self) -> int:
+        if self.replaying:
+            return sum(len(entries) for entries in self._entries.values())
+        return sum(self._counts.values())
+
+    def _record(self, fp: str, kind: str, payload: bytes, seconds: float) -> None:
+        with self._lock:
+            seq = self._counts[fp]
+            self._counts[fp] += 1
+            self._db.execute(
+                "INSERT INTO interactions VALUES (?, ?, ?, ?, ?)", (fp, seq, kind, zlib.compress(payload), seconds)
+            )
+            self.recorded += 1
+
+    def _take(self, fp: str, kind: str) -> tuple[Any, float]:
+        """The next recorded response to request `fp`, and how long to wait before returning it."""
+        entries = self._entries.get(fp)
+        with self._lock:
+            if not entries:
+                self.misses += 1
+                raise CassetteMiss(f"No recorded {kind} response for request {fp[:12]} in {self.path}")
+            n = self._served[fp]
+            self._served[fp] = n + 1
+            self.hits += 1
+        _, payload, seconds = entries[n % len(entries)]
+        return payload, seconds * self.latency if self.latency else 0.0
+
+    def record_response(self, fp: str, response: ModelResponse, seconds: float) -> None:
+        self._record(fp, MODEL, ModelMessagesTypeAdapter.dump_json([response]), seconds)
+
+    async def replay_response(self, fp: str) -> ModelResponse:
+        payload, delay = self._take(fp, MODEL)
+        if delay:
+            await asyncio.sleep(delay)
+        return ModelMessagesTypeAdapter.validate_json(payload)[0]
+
+    def record_objects(self, fp: str, objects, seconds: float) -> None:
+        self._record(fp, QUERY, _dump_objects(objects), seconds)
+
+    def replay_objects(self, fp: str) -> tuple[list[RecordedObject], float]:
+        """The recorded objects for query `fp`, and the time the caller should wait before returning them."""
+        payload, delay = self._take(fp, QUERY)
+        return _load_objects(payload), delay
+
+    def model(self, model: Any) -> Model:
+        """
+        `model` (a Model or a name) recording to or replaying from the cassette.
+        A rate-limited model keeps its limits when recording; replays aren't limited.
+        """
+        if isinstance(model, RateLimitedModel):
+            if self.replaying:
+                return CassetteModel(model.wrapped, self)
+            return RateLimitedModel(CassetteModel(model.wrapped, self), model.limiter, model.provider_name)
+        return CassetteModel(model, self)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "responses": len(self),
+            "recorded": self.recorded,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bytes": sum(f.stat().st_size for f in (self.path, Path(f"{self.path}-wal")) if f.exists()),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self) -> "Cassette":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class CassetteModel(Model):
+    """
+    `wrapped`, with its responses recorded to (or replayed from) `cassette`.
+
+    Replaying, `wrapped` is never called or even resolved, so no API key is
+    needed, and the provider is "cassette", which has no rate limits.
+    """
+
+    def __init__(self, wrapped: Any, cassette: Cassette):
+        super().__init__()
+        self.cassette = cassette
+        self.wrapped = None if cassette.replaying else infer_model(wrapped)
+        if isinstance(wrapped, str):
+            self._model_name = wrapped.partition(":")[2] or wrapped
+        else:
+            self._model_name = wrapped.model_name
+
+    @property
+    def model_name(self) -> str:
+        return self._model_name
+
+    @property
+    def system(self) -> str:
+        return "cassette" if self.wrapped is None else self.wrapped.system
+
+    @property
+    def profile(self):
+        return super().profile if self.wrapped is None else self.wrapped.profile
+
+    async def request(self, messages, model_settings, model_request_parameters) -> ModelResponse:
+        fp = model_fingerprint(messages, model_request_parameters)
+        if self.wrapped is None:
+            return await self.cassette.replay_response(fp)
+        start = time.perf_counter()
+        response = await self.wrapped.request(messages, model_settings, model_request_parameters)
+        self.cassette.record_response(fp, response, time.perf_counter() - start)
+        return response
+
+    @contextlib.asynccontextmanager
+    async def request_stream(
+        self, messages, model_settings, model_request_parameters, run_context=None
+    ) -> AsyncIterator[StreamedResponse]:
+        fp = model_fingerprint(messages, model_request_parameters)
+        if self.wrapped is None:
+            yield _ReplayedStream(model_request_parameters, await self.cassette.replay_response(fp))
+            return
+        start = time.perf_counter()
+        async with self.wrapped.request_stream(
+            messages, model_settings, model_request_parameters, run_context
+        ) as stream:
+            yield stream
+        # Recorded once the caller has read the stream: the whole response
+        self.cassette.record_response(fp, stream.get(), time.perf_counter() - start)
+
+
+@dataclass
+class _ReplayedStream(StreamedResponse):
+    """A recorded response, streamed as one event per part."""
+
+    _response: ModelResponse = None
+
+    def __post_init__(self):
+        self._usage = self._response.usage
+        self.provider_response_id = self._response.provider_response_id
+        self.finish_reason = self._response.finish_reason
+
+    async def _get_event_iterator(self):
+        for i, part in enumerate(self._response.parts):
+            yield self._parts_manager.handle_part(vendor_part_id=i, part=part)
+
+    @property
+    def model_name(self) -> str:
+        return self._response.model_name or "cassette"
+
+    @property
+    def provider_name(self) -> Optional[str]:
+        return self._response.provider_name
+
+    @property
+    def timestamp(self) -> datetime:
+        return self._response.timestamp
+
+
+class _RecordingQuery:
+    def __init__(self, query, collection: str, cassette: Cassette, is_async: bool):
+        self._query = query
+        self._collection = collection
+        self._cassette = cassette
+        self._async = is_async
+
+    def __getattr__(self, method: str):
+        call = getattr(self._query, method)
+        cassette, collection = self._cassette, self._collection
+
+        def recorded(*args, **kwargs):
+            start = time.perf_counter()
+            response = call(*args, **kwargs)
+            fp = query_fingerprint(collection, method, args, kwargs)
+            cassette.record_objects(fp, response.objects, time.perf_counter() - start)
+            return response
+
+        async def recorded_async(*args, **kwargs):
+            start = time.perf_counter()
+            response = await call(*args, **kwargs)
+            fp = query_fingerprint(collection, method, args, kwargs)
+            cassette.record_objects(fp, response.objects, time.perf_counter() - start)
+            return response
+
+        return recorded_async if self._async else recorded
+
+
+class _RecordingCollection:
+    def __init__(self, collection, name: str, cassette: Cassette, is_async: bool):
+        self._collection = collection
+        self._name = name
+        self._cassette = cassette
+        self.query = _RecordingQuery(collection.query, name, cassette, is_async)
+
+    def iterator(self, *args, **kwargs):
+        start = time.perf_counter()
+        objects = list(self._collection.iterator(*args, **kwargs))
+        fp = query_fingerprint(self._name, "iterator", args, kwargs)
+        self._cassette.record_objects(fp, objects, time.perf_counter() - start)
+        return iter(objects)
+
+    def __getattr__(self, name: str):
+        return getattr(self._collection, name)
+
+
+class _RecordingCollections:
+    def __init__(self, collections, cassette: Cassette, is_async: bool):
+        self._collections = collections
+        self._cassette = cassette
+        self._async = is_async
+
+    def use(self, name: str) -> _RecordingCollection:
+        return _RecordingCollection(self._collections.use(name), name, self._cassette, self._async)
+
+    get = use
+
+    def __getattr__(self, name: str):
+        return getattr(self._collections, name)
+
+
+class _RecordingClient:
+    """A connected Weaviate client (sync or async) whose collection queries are recorded."""
+
+    def __init__(self, client, cassette: Cassette, is_async: bool = False):
+        self._client = client
+        self.collections = _RecordingCollections(client.collections, cassette, is_async)
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+
+
+class _ReplayQuery:
+    def __init__(self, collection: str, cassette: Cassette, is_async: bool):
+        self._collection = collection
+        self._cassette = cassette
+        self._async = is_async
+
+    def __getattr__(self, method: str):
+        cassette, collection = self._cassette, self._collection
+
+        def replayed(*args, **kwargs) -> RecordedQueryReturn:
+            objects, delay = cassette.replay_objects(query_fingerprint(collection, method, args, kwargs))
+            if delay:
+                time.sleep(delay)
+            return RecordedQueryReturn(objects)
+
+        async def replayed_async(*args, **kwargs) -> RecordedQueryReturn:
+            objects, delay = cassette.replay_objects(query_fingerprint(collection, method, args, kwargs))
+            if delay:
+                await asyncio.sleep(delay)
+            return RecordedQueryReturn(objects)
+
+        return replayed_async if self._async else replayed
+
+
+class _ReplayCollection:
+    def __init__(self, name: str, cassette: Cassette, is_async: bool):
+        self._name = name
+        self._cassette = cassette
+        self.query = _ReplayQuery(name, cassette, is_async)
+
+    def iterator(self, *args, **kwargs):
+        objects, delay = self._cassette.replay_objects(query_fingerprint(self._name, "iterator", args, kwargs))
+        if delay:
+            time.sleep(delay)
+        return iter(objects)
+
+
+class _ReplayCollections:
+    def __init__(self, cassette: Cassette, is_async: bool):
+        self._cassette = cassette
+        self._async = is_async
+
+    def use(self, name: str) -> _ReplayCollection:
+        return _ReplayCollection(name, self._cassette, self._async)
+
+    get = use
+
+
+class ReplayClient:
+    """Stands in for `weaviate.WeaviateClient`, answering queries from a cassette."""
+
+    def __init__(self, cassette: Cassette):
+        self.collections = _ReplayCollections(cassette, is_async=False)
+
+    def connect(self) -> None:
+        pass
+
+    def is_connected(self) -> bool:
+        return True
+
+    def is_ready(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        pass
+
+
+class AsyncReplayClient:
+    """Stands in for `weaviate.WeaviateAsyncClient`, answering queries from a cassette."""
+
+    def __init__(self, cassette: Cassette):
+        self.collections = _ReplayCollections(cassette, is_async=True)
+
+    async def connect(self) -> None:
+        pass
+
+    def is_connected(self) -> bool:
+        return True
+
+    async def is_ready(self) -> bool:
+        return True
+
+    async def close(self) -> None:
+        pass
+
+
+@contextlib.contextmanager
+def use_cassette(cassette: Cassette, agent: Optional[Agent] = None):
+    """
+    Record (or replay) the Weaviate queries of the shared clients in tools.py,
+    and the model requests of `agent` if given, until the block exits.
+    """
+    import tools
+
+    connect, connect_async = tools.client_manager.connect, tools.async_client_manager.connect
+    if cassette.replaying:
+
+        async def cassette_connect_async() -> AsyncReplayClient:
+            return AsyncReplayClient(cassette)
+
+        tools.client_manager.set_connect(lambda: ReplayClient(cassette))
+    else:
+
+        async def cassette_connect_async() -> _RecordingClient:
+            return _RecordingClient(await connect_async(), cassette, is_async=True)
+
+        tools.client_manager.set_connect(lambda: _RecordingClient(connect(), cassette))
+    tools.async_client_manager.set_connect(cassette_connect_async)
+    try:
+        with agent.override(model=cassette.model(agent.model)) if agent is not None else contextlib.nullcontext():
+            yield cassette
+    finally:
+        tools.client_manager.set_connect(connect)
+        tools.async_client_manager.set_connect(connect_async)
@@ -0,0 +1,256 @@
+"""
+Multi-turn memory for the chatbot, kept under a token budget.
+
+Every turn's messages are kept and passed back as `message_history`, so
+follow-up questions have the earlier answers and the pages already read.
+When the history grows past `budget_tokens`, older turns are compacted:
+
+1. Tool results (page text, search summaries) in turns older than the last
+   `keep_recent_turns` are replaced with a short stub. The tool calls stay,
+   so the paths the agent read (its citations) remain visible. Context added
+   to the user's question (see router.py) is dropped, keeping the question.
+2. If that is not enough, the oldest turns are replaced with a summary
+   (from `summarize`, if given) or dropped. Summaries of successive drops are
+   joined, keeping the latest within `summary_budget_tokens`.
+
+The system prompt is always kept at the start of the history.
+"""
+
+from dataclasses import dataclass, replace
+from typing import Callable, Optional
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelMessagesTypeAdapter,
+    ModelRequest,
+    ModelResponse,
+    SystemPromptPart,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+
+from compression import estimate_tokens
+
+TRIMMED_RESULT = "[Result trimmed to save context. Call the tool again if the details are needed.]"
+SUMMARY_HEADER = "Summary of the earlier conversation:\n"
+
+
+def estimate_message_tokens(messages: list[ModelMessage]) -> int:
+    """Rough token count of `messages`, as serialized for the model."""
+    if not messages:
+        return 0
+    return estimate_tokens(ModelMessagesTypeAdapter.dump_json(messages).decode("utf-8"))
+
+
+def split_turns(messages: list[ModelMessage]) -> list[list[ModelMessage]]:
+    """Group messages into turns, each starting at a request with a user prompt."""
+    turns: list[list[ModelMessage]] = []
+    for message in messages:
+        starts_turn = isinstance(message, ModelRequest) and any(
+            isinstance(part, UserPromptPart) for part in message.parts
+        )
+        if starts_turn or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def outline_turns(turns: list[list[ModelMessage]]) -> str:
+    """
+    Local, no-LLM summary of `turns`: each question, the pages read, and the start of the answer.
+    """
+    lines = []
+    for turn in turns:
+        for message in turn:
+            for part in message.parts:
+                if isinstance(part, UserPromptPart):
+                    lines.append(f"User asked: {_question(part)}")
+                elif isinstance(part, ToolCallPart) and "path" in part.args_as_dict():
+                    lines.append(f"  read {part.args_as_dict()['path']}")
+                elif isinstance(part, ToolCallPart) and "paths" in part.args_as_dict():
+                    lines.append(f"  read {', '.join(part.args_as_dict()['paths'])}")
+        answer = _final_text(turn)
+        if answer:
+            lines.append(f"  answered: {answer[:300]}{'...' if len(answer) > 300 else ''}")
+    return "\n".join(lines)
+
+
+def _question(part: UserPromptPart) -> str:
+    """The question itself: the first part of a prompt with context added."""
+    if isinstance(part.content, str):
+        return part.content
+    return next((c for c in part.content if isinstance(c, str)), "")
+
+
+def _final_text(turn: list[ModelMessage]) -> str:
+    for message in reversed(turn):
+        if isinstance(message, ModelResponse):
+            text = "".join(p.content for p in message.parts if isinstance(p, TextPart))
+            if text:
+                return text
+    return ""
+
+
+@dataclass
+class TurnUsage:
+    history_tokens: int
+    prompt_tokens: int
+    requests: int
+    # Of the prompt tokens, those read from and written to the provider's prompt cache
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+
+
+class ConversationMemory:
+    """
+    Message history for a chat session, compacted to stay under `budget_tokens`.
+
+    Pass `history()` as `message_history` to the next run, then `add_turn(result)`.
+    `turns` records, per turn, the estimated size of the history sent and the
+    prompt (input) tokens the model reported, summed over the turn's requests,
+    with how many of them were read from or written to the prompt cache.
+
+    The summary of dropped turns takes at most `summary_budget_tokens` of the
+    budget (an eighth of it by default); its oldest lines are dropped first.
+    """
+
+    def __init__(
+        self,
+        budget_tokens: int = 8000,
+        keep_recent_turns: int = 2,
+        summarize: Optional[Callable[[list[list[ModelMessage]]], str]] = None,
+        summary_budget_tokens: Optional[int] = None,
+    ):
+        self.budget_tokens = budget_tokens
+        self.summary_budget_tokens = budget_tokens // 8 if summary_budget_tokens is None else summary_budget_tokens
+        self.keep_recent_turns = keep_recent_turns
+        self.summarize = summarize
+        self.messages: list[ModelMessage] = []
+        self.turns: list[TurnUsage] = []
+        self.trimmed_results = 0
+        self.dropped_turns = 0
+        self._history_tokens = 0
+
+    def history(self) -> list[ModelMessage]:
+        """The history to send with the next turn, compacted if over budget."""
+        if estimate_message_tokens(self.messages) > self.budget_tokens:
+            self.messages = self._compact(self.messages)
+        self._history_tokens = estimate_message_tokens(self.messages)
+        return list(self.messages)
+
+    def add_turn(self, result) -> TurnUsage:
+        """Append a finished run's new messages and record its token usage."""
+        self.messages.extend(result.new_messages())
+        usage = result.usage()
+        turn = TurnUsage(
+            self._history_tokens,
+            usage.input_tokens,
+            usage.requests,
+            usage.cache_read_tokens,
+            usage.cache_write_tokens,
+        )
+        self.turns.append(turn)
+        self._history_tokens = 0
+        return turn
+
+    def add_messages(self, messages: list[ModelMessage]) -> TurnUsage:
+        """Append a turn answered without running the agent (no tokens used)."""
+        self.messages.extend(messages)
+        turn = TurnUsage(self._history_tokens, 0, 0)
+        self.turns.append(turn)
+        self._history_tokens = 0
+        return turn
+
+    def clear(self) -> None:
+        self.messages = []
+        self._history_tokens = 0
+
+    def _compact(self, messages: list[ModelMessage]) -> list[ModelMessage]:
+        turns = split_turns(messages)
+        if not turns:
+            return messages
+        old = max(0, len(turns) - self.keep_recent_turns)
+        for i in range(old):
+            turns[i] = [self._trim_results(m) for m in turns[i]]
+            if estimate_message_tokens(_flatten(turns)) <= self.budget_tokens:
+                return _flatten(turns)
+
+        system_parts, earlier = [], []
+        for message in turns[0]:
+            for part in message.parts:
+                if isinstance(part, SystemPromptPart) and part.content.startswith(SUMMARY_HEADER):
+                    earlier.append(part.content[len(SUMMARY_HEADER):])
+                elif isinstance(part, SystemPromptPart):
+                    system_parts.append(part)
+        # Room for the summary is kept while choosing how much to drop, so `summarize` runs once
+        reserve = self.summary_budget_tokens if earlier or self.summarize is not None else 0
+        drop = 0
+        while len(turns) - drop > self.keep_recent_turns:
+            drop += 1
+            kept = _with_prefix(turns[drop:], system_parts, None)
+            if estimate_message_tokens(kept) + reserve <= self.budget_tokens:
+                break
+        self.dropped_turns += drop
+        summary = self._capped("\n".join(earlier + [s for s in [self._summary(turns[:drop])] if s]))
+        return _with_prefix(turns[drop:], system_parts, summary or None)
+
+    def _trim_results(self, message: ModelMessage) -> ModelMessage:
+        if not isinstance(message, ModelRequest):
+            return message
+        parts = []
+        for part in message.parts:
+            if isinstance(part, ToolReturnPart):
+                trimmed = _trimmed(part.content)
+                if trimmed != part.content:
+                    part = replace(part, content=trimmed)
+                    self.trimmed_results += 1
+            elif isinstance(part, UserPromptPart) and not isinstance(part.content, str):
+                if len(part.content) > 1:
+                    part = replace(part, content=[_question(part)])
+                    self.trimmed_results += 1
+            parts.append(part)
+        return replace(message, parts=parts)
+
+    def _summary(self, dropped: list[list[ModelMessage]]) -> Optional[str]:
+        if not dropped or self.summarize is None:
+            return None
+        return self.summarize(dropped)
+
+    def _capped(self, summary: str) -> str:
+        """The latest lines of `summary` within `summary_budget_tokens`."""
+        lines, tokens = [], 0
+        for line in reversed(summary.splitlines()):
+            tokens += estimate_tokens(line) + 1
+            if tokens > self.summary_budget_tokens:
+                break
+            lines.append(line)
+        return "\n".join(reversed(lines))
+
+
+def _trimmed(content):
+    # Search results keep their paths, so the agent can fetch them again without searching
+    if isinstance(content, list) and all(isinstance(c, dict) and "path" in c for c in content):
+        return [{"path": c["path"]} for c in content]
+    return TRIMMED_RESULT
+
+
+def _flatten(turns: list[list[ModelMessage]]) -> list[ModelMessage]:
+    return [message for turn in turns for message in turn]
+
+
+def _with_prefix(
+    turns: list[list[ModelMessage]], system_parts: list, summary: Optional[str]
+) -> list[ModelMessage]:
+    """Put the system prompt (and the summary of dropped turns) back at the start."""
+    messages = _flatten(turns)
+    if not messages:
+        return messages
+    prefix = list(system_parts)
+    if summary:
+        prefix.append(SystemPromptPart(SUMMARY_HEADER + summary))
+    first = messages[0]
+    rest = [p for p in first.parts if not isinstance(p, SystemPromptPart)]
+    messages[0] = replace(first, parts=prefix + rest)
+    return messages
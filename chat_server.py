@@ -0,0 +1,488 @@
+"""
+Serve the step5 support chatbot to many users at once, over HTTP.
+
+    python chat_server.py --port 8000
+    python chat_server.py --port 8000 --stand-in   # local DocCatalog stand-in, no cluster
+    python chat_server.py --port 8000 --replay sessions.cassette   # recorded responses, offline
+
+Endpoints:
+
+- POST   /sessions                 start a conversation, returns {"session_id": ...}
+- POST   /sessions/{id}/messages   {"message": "...", "stream": true}
+                                   streams the answer as server-sent events:
+                                   "text" (answer chunks) and "tool" (tool calls), then "done"
+                                   (timing and token usage) or "error".
+                                   With "stream": false, returns the answer as JSON.
+- DELETE /sessions/{id}            forget a conversation
+- GET    /health                   load: sessions, running and queued turns, and the
+                                   provider rate limits (waiting calls per lane, 429s)
+- GET    /metrics                  latency histograms and token counters (Prometheus text)
+
+With a `prepare` hook (step5's `route_turn`, see router.py), greetings,
+off-topic messages and questions already in the answer cache are answered
+without running the agent; the "done" event then has "route" set and no token
+usage. An `after_run` hook (step5's `remember_answer`) sees every finished run.
+
+Each session keeps its own `ConversationMemory`, and its turns run one at a
+time, in order. At most `max_concurrent_runs` turns run at once across all
+sessions; the rest wait. A session with `max_queued_per_session` turns already
+waiting gets 429, and the server answers 503 once `max_waiting` turns are
+queued overall, so load beyond capacity is refused instead of piling up.
+On shutdown, new turns are refused and running ones get `drain_timeout`
+seconds to finish. Event streams are plain `StreamingResponse`s, which uvicorn
+lets finish (up to `timeout_graceful_shutdown`) instead of cutting them off.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from pydantic_ai import Agent
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from starlette.types import Receive, Scope, Send
+
+from chat_memory import ConversationMemory, outline_turns
+from rate_limit import limiter
+from router import PreparedTurn
+from streaming import stream_turn
+from telemetry import metrics
+
+_DONE = object()
+_LINE_BREAK_RE = re.compile(r"\r\n|\r|\n")
+
+
+class Overloaded(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass
+class ChatSession:
+    id: str
+    memory: ConversationMemory
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    queued: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class ChatServer:
+    """
+    Sessions, admission control and turn execution for `agent`.
+
+    Sessions idle for longer than `session_ttl` seconds are forgotten.
+    `deps_factory`, if given, makes the deps for each run from the session ID. `prepare`, if given,
+    is awaited with the message, the deps and the history before each run, and
+    decides whether the agent runs and on what prompt. `after_run`, if given,
+    is called with the message, the history and the result after each run.
+    """
+
+    def __init__(
+        self,
+        agent: Agent,
+        deps_factory: Optional[Callable[[str], Any]] = None,
+        max_concurrent_runs: int = 8,
+        max_queued_per_session: int = 2,
+        max_waiting: int = 64,
+        max_sessions: int = 1000,
+        session_ttl: float = 3600.0,
+        history_budget: int = 8000,
+        drain_timeout: float = 30.0,
+        prepare: Optional[Callable[[str, Any, list], Awaitable[PreparedTurn]]] = None,
+        after_run: Optional[Callable[[str, list, Any], None]] = None,
+    ):
+        self.agent = agent
+        self.deps_factory = deps_factory
+        self.prepare = prepare
+        self.after_run = after_run
+        self.max_concurrent_runs = max_concurrent_runs
+        self.max_queued_per_session = max_queued_per_session
+        self.max_waiting = max_waiting
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self.history_budget = history_budget
+        self.drain_timeout = drain_timeout
+        self.sessions: Dict[str, ChatSession] = {}
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+        self.answered_locally = 0
+        self.failed = 0
+        self.draining = False
+        self._runs: Optional[asyncio.Semaphore] = None
+        self._idle: Optional[asyncio.Event] = None
+
+    def start(self) -> None:
+        """Create the loop-bound primitives; call from the server's event loop."""
+        self._runs = asyncio.Semaphore(self.max_concurrent_runs)
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def drain(self) -> None:
+        """Refuse new turns and wait (up to `drain_timeout`) for queued and running ones."""
+        self.draining = True
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self._idle.wait(), self.drain_timeout)
+
+    def create_session(self) -> str:
+        if self.draining:
+            raise Overloaded(503, "Server is shutting down")
+        self._expire_sessions()
+        if len(self.sessions) >= self.max_sessions:
+            raise Overloaded(503, "Too many open sessions")
+        session_id = uuid.uuid4().hex
+        self.sessions[session_id] = ChatSession(
+            session_id,
+            ConversationMemory(budget_tokens=self.history_budget, summarize=outline_turns)
+        )
+        return session_id
+
+    def delete_session(self, session_id: str) -> bool:
+        return self.sessions.pop(session_id, None) is not None
+
+    def _expire_sessions(self) -> None:
+        cutoff = time.monotonic() - self.session_ttl
+        for session_id, session in list(self.sessions.items()):
+            if session.last_used < cutoff and not session.queued:
+                del self.sessions[session_id]
+
+    def admit(self, session_id: str) -> ChatSession:
+        """Reserve a queue slot for one turn of `session_id`, or raise."""
+        if self.draining:
+            raise Overloaded(503, "Server is shutting down")
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise KeyError(session_id)
+        if session.queued >= self.max_queued_per_session:
+            raise Overloaded(429, "Too many turns queued for this session")
+        if self.waiting >= self.max_waiting:
+            raise Overloaded(503, "Server is at capacity")
+        session.queued += 1
+        self.waiting += 1
+        self._idle.clear()
+        return session
+
+    @contextlib.asynccontextmanager
+    async def turn(self, session: ChatSession):
+        """
+        Wait for the session (its turns run in order) and a global run slot.
+
+        Yields the history to send. The reservation from `admit` is released on exit.
+        """
+        started = False
+        try:
+            async with session.lock:
+                async with self._runs:
+                    self.waiting -= 1
+                    self.running += 1
+                    started = True
+                    try:
+                        yield session.memory.history()
+                    finally:
+                        self.running -= 1
+                        session.last_used = time.monotonic()
+        finally:
+            self._release(session, waiting=not started)
+
+    def withdraw(self, session: ChatSession) -> None:
+        """Release the reservation from `admit` of a turn that will never run."""
+        self._release(session, waiting=True)
+
+    def _release(self, session: ChatSession, waiting: bool) -> None:
+        if waiting:
+            self.waiting -= 1
+        session.queued -= 1
+        if self.running == 0 and self.waiting == 0:
+            self._idle.set()
+
+    async def run(self, session: ChatSession, message: str) -> Dict[str, Any]:
+        """Run one turn to completion (no streaming)."""
+        start = time.perf_counter()
+        try:
+            async with self.turn(session) as history:
+                deps = self._deps(session)
+                prepared = await self._prepare(message, deps, history)
+                if prepared.reply is None:
+                    result = await self.agent.run(prepared.prompt, message_history=history, deps=deps)
+                    usage = session.memory.add_turn(result)
+                    self._after_run(message, history, result)
+                elif prepared.messages:
+                    session.memory.add_messages(prepared.messages)
+        except BaseException:
+            self.failed += 1
+            raise
+        self.completed += 1
+        if prepared.reply is not None:
+            self.answered_locally += 1
+            return {
+                "output": prepared.reply,
+                "total_s": time.perf_counter() - start,
+                "route": prepared.decision.route,
+            }
+        return {
+            "output": result.output,
+            "total_s": time.perf_counter() - start,
+            "prompt_tokens": usage.prompt_tokens,
+            "cache_read_tokens": usage.cache_read_tokens,
+            "cache_write_tokens": usage.cache_write_tokens,
+            "history_tokens": usage.history_tokens,
+        }
+
+    async def stream(self, session: ChatSession, message: str):
+        """Run one turn, yielding server-sent events as the answer is produced."""
+        start = time.perf_counter()
+        try:
+            async with self.turn(session) as history:
+                deps = self._deps(session)
+                prepared = await self._prepare(message, deps, history)
+                if prepared.reply is not None:
+                    if prepared.messages:
+                        session.memory.add_messages(prepared.messages)
+                    yield {"event": "text", "data": prepared.reply}
+                    yield {
+                        "event": "done",
+                        "data": {"total_s": time.perf_counter() - start, "route": prepared.decision.route},
+                    }
+                    self.completed += 1
+                    self.answered_locally += 1
+                    return
+                chunks: asyncio.Queue = asyncio.Queue()
+                task = asyncio.create_task(
+                    stream_turn(
+                        self.agent,
+                        prepared.prompt,
+                        write=lambda text: chunks.put_nowait(("text", text)),
+                        write_tool=lambda text: chunks.put_nowait(("tool", text)),
+                        message_history=history,
+                        deps=deps,
+                    )
+                )
+                task.add_done_callback(lambda _: chunks.put_nowait(_DONE))
+                try:
+                    while (chunk := await chunks.get()) is not _DONE:
+                        yield {"event": chunk[0], "data": chunk[1]}
+                    result, timing = task.result()
+                finally:
+                    # The client went away: stop the run and free the slot
+                    task.cancel()
+                usage = session.memory.add_turn(result)
+                self._after_run(message, history, result)
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client went away, or the server cut the stream off
+            self.failed += 1
+            raise
+        except Exception as e:
+            self.failed += 1
+            yield {"event": "error", "data": f"{type(e).__name__}: {e}"}
+            return
+        self.completed += 1
+        yield {
+            "event": "done",
+            "data": {
+                "first_token_s": timing.time_to_first_token,
+                "total_s": time.perf_counter() - start,
+                "tool_calls": len(timing.tool_calls),
+                "prompt_tokens": usage.prompt_tokens,
+                "cache_read_tokens": usage.cache_read_tokens,
+                "cache_write_tokens": usage.cache_write_tokens,
+                "history_tokens": usage.history_tokens,
+            },
+        }
+
+    def _deps(self, session: ChatSession) -> Any:
+        return self.deps_factory(session.id) if self.deps_factory else None
+
+    async def _prepare(self, message: str, deps: Any, history: list) -> PreparedTurn:
+        if self.prepare is None:
+            return PreparedTurn(None, message)
+        return await self.prepare(message, deps, history)
+
+    def _after_run(self, message: str, history: list, result) -> None:
+        if self.after_run is not None:
+            self.after_run(message, history, result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self.sessions),
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "answered_locally": self.answered_locally,
+            "failed": self.failed,
+            "max_concurrent_runs": self.max_concurrent_runs,
+            "draining": self.draining,
+            "rate_limits": limiter.stats(),
+        }
+
+
+def create_app(server: ChatServer, on_shutdown=None) -> Starlette:
+    """The HTTP app for `server`. `on_shutdown` is awaited after draining."""
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        server.start()
+        yield
+        await server.drain()
+        if on_shutdown is not None:
+            await on_shutdown()
+
+    async def create_session(request: Request) -> JSONResponse:
+        try:
+            return JSONResponse({"session_id": server.create_session()}, status_code=201)
+        except Overloaded as e:
+            return _overloaded(e)
+
+    async def delete_session(request: Request) -> JSONResponse:
+        if not server.delete_session(request.path_params["session_id"]):
+            return JSONResponse({"detail": "Unknown session"}, status_code=404)
+        return JSONResponse({"deleted": True})
+
+    async def post_message(request: Request):
+        body = await request.json()
+        message = str(body.get("message", "")).strip()
+        if not message:
+            return JSONResponse({"detail": "message is required"}, status_code=422)
+        try:
+            session = server.admit(request.path_params["session_id"])
+        except KeyError:
+            return JSONResponse({"detail": "Unknown session"}, status_code=404)
+        except Overloaded as e:
+            return _overloaded(e)
+        if body.get("stream", True):
+            return TurnEventStream(server, session, message)
+        return JSONResponse(await server.run(session, message))
+
+    async def health(request: Request) -> JSONResponse:
+        return JSONResponse(server.stats())
+
+    async def get_metrics(request: Request) -> PlainTextResponse:
+        return PlainTextResponse(metrics.to_prometheus(), media_type="text/plain; version=0.0.4")
+
+    return Starlette(
+        routes=[
+            Route("/sessions", create_session, methods=["POST"]),
+            Route("/sessions/{session_id}", delete_session, methods=["DELETE"]),
+            Route("/sessions/{session_id}/messages", post_message, methods=["POST"]),
+            Route("/health", health, methods=["GET"]),
+            Route("/metrics", get_metrics, methods=["GET"]),
+        ],
+        lifespan=lifespan,
+    )
+
+
+class TurnEventStream(StreamingResponse):
+    """
+    One streamed turn of `session`, as server-sent events.
+
+    The turn's reservation from `ChatServer.admit` is released however the
+    response ends: by the turn once its events have started, else (the client
+    was gone before they did) by `ChatServer.withdraw`.
+    """
+
+    def __init__(self, server: ChatServer, session: ChatSession, message: str):
+        self.server = server
+        self.session = session
+        self.events = server.stream(session, message)
+        self.started = False
+        super().__init__(
+            self._encode(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+        )
+
+    async def _encode(self):
+        self.started = True
+        async with contextlib.aclosing(self.events):
+            async for event in self.events:
+                yield server_sent_event(event["event"], event["data"])
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # A disconnected client can leave the events suspended; close them now, not when collected
+            await self.body_iterator.aclose()
+            if not self.started:
+                self.server.withdraw(self.session)
+
+
+def server_sent_event(event: str, data: Any) -> str:
+    """`data` (JSON-encoded unless it is a string) as a server-sent event named `event`."""
+    if not isinstance(data, str):
+        data = json.dumps(data)
+    lines = [f"event: {event}"] + [f"data: {line}" for line in _LINE_BREAK_RE.split(data)]
+    return "\n".join(lines) + "\n\n"
+
+
+def _overloaded(e: Overloaded) -> JSONResponse:
+    return JSONResponse({"detail": e.detail}, status_code=e.status_code, headers={"Retry-After": "1"})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the Weaviate support chatbot over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-runs", type=int, default=8, help="turns running at once, across sessions")
+    parser.add_argument("--max-waiting", type=int, default=64, help="turns queued before returning 503")
+    parser.add_argument("--history-budget", type=int, default=8000)
+    parser.add_argument("--stand-in", action="store_true", help="use the local DocCatalog stand-in")
+    parser.add_argument("--no-router", action="store_true", help="send every message to the model")
+    cassette_mode = parser.add_mutually_exclusive_group()
+    cassette_mode.add_argument(
+        "--record", metavar="CASSETTE", help="record the model and Weaviate responses to CASSETTE (see cassette.py)"
+    )
+    cassette_mode.add_argument("--replay", metavar="CASSETTE", help="answer from CASSETTE, offline")
+    parser.add_argument(
+        "--replay-latency",
+        type=float,
+        help="replaying, wait this multiple of each response's recorded time (default: no wait)",
+    )
+    args = parser.parse_args()
+
+    import uvicorn
+
+    import tools
+    from cassette import Cassette, use_cassette
+    from fake_weaviate import use_stand_in
+    from step5_final_chatbot import ChatDeps, chatbot_agent, escalations, remember_answer, route_turn
+    from telemetry import setup_telemetry
+
+    setup_telemetry()
+    if args.stand_in:
+        use_stand_in()
+    server = ChatServer(
+        chatbot_agent,
+        deps_factory=lambda session_id: ChatDeps(session_id=session_id),
+        max_concurrent_runs=args.max_runs,
+        max_waiting=args.max_waiting,
+        history_budget=args.history_budget,
+        prepare=None if args.no_router else route_turn,
+        after_run=remember_answer,
+    )
+    escalations.start()
+
+    async def shutdown() -> None:
+        await tools.async_client_manager.close()
+        await asyncio.to_thread(escalations.close)
+
+    app = create_app(server, on_shutdown=shutdown)
+    with contextlib.ExitStack() as stack:
+        if args.record or args.replay:
+            mode = "record" if args.record else "replay"
+            cassette = stack.enter_context(Cassette(args.record or args.replay, mode, args.replay_latency))
+            stack.enter_context(use_cassette(cassette, chatbot_agent))
+        uvicorn.run(app, host=args.host, port=args.port, timeout_graceful_shutdown=int(server.drain_timeout))
+
+
+if __name__ == "__main__":
+    main()
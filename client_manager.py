@@ -0,0 +1,202 @@
+"""
+Process-wide Weaviate client management.
+
+Connecting to Weaviate Cloud costs a TLS + gRPC handshake and a metadata check,
+so the tools share one long-lived client instead of connecting on every call.
+"""
+
+import asyncio
+import atexit
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, Optional
+
+import weaviate
+
+log = logging.getLogger(__name__)
+
+
+class WeaviateClientManager:
+    """
+    Lazily create, health-check and share a single Weaviate client.
+
+    `connect` is any zero-argument callable returning a connected client,
+    e.g. a wrapper around `weaviate.connect_to_weaviate_cloud`.
+    The client is checked with `is_ready()` at most every `health_check_interval`
+    seconds, and transparently reconnected if the check fails.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], weaviate.WeaviateClient],
+        health_check_interval: float = 30.0,
+    ):
+        self._connect = connect
+        self._health_check_interval = health_check_interval
+        self._client: Optional[weaviate.WeaviateClient] = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self.connects = 0
+        atexit.register(self.close)
+
+    def get(self) -> weaviate.WeaviateClient:
+        """Return the shared client, connecting or reconnecting as needed."""
+        with self._lock:
+            if self._client is not None and self._is_healthy():
+                return self._client
+            self._close_client()
+            self._client = self._connect()
+            self._last_check = time.monotonic()
+            self.connects += 1
+            return self._client
+
+    def _is_healthy(self) -> bool:
+        now = time.monotonic()
+        if now - self._last_check < self._health_check_interval:
+            return True
+        try:
+            healthy = self._client.is_connected() and self._client.is_ready()
+        except Exception:
+            healthy = False
+        self._last_check = now
+        return healthy
+
+    @property
+    def connect(self) -> Callable[[], weaviate.WeaviateClient]:
+        """The connection factory, e.g. to wrap it and `set_connect` the wrapper."""
+        return self._connect
+
+    def set_connect(self, connect: Callable[[], weaviate.WeaviateClient]) -> None:
+        """Swap the connection factory, closing any existing client."""
+        with self._lock:
+            self._close_client()
+            self._connect = connect
+
+    def close(self) -> None:
+        """Close the shared client. The next `get()` reconnects."""
+        with self._lock:
+            self._close_client()
+
+    def _close_client(self) -> None:
+        if self._client is None:
+            return
+        try:
+            self._client.close()
+        except Exception:
+            pass
+        self._client = None
+
+
+class AsyncWeaviateClientManager:
+    """
+    Async counterpart of `WeaviateClientManager` for `weaviate.WeaviateAsyncClient`.
+
+    `connect` is a zero-argument coroutine function returning a connected client.
+    An async client is bound to the event loop it connected on, so a new client
+    is created if `get()` is called from a different loop. The old one is closed
+    on its own loop if that is still running (e.g. in another thread), else on
+    the new loop before connecting: its connections are released either way.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Awaitable[weaviate.WeaviateAsyncClient]],
+        health_check_interval: float = 30.0,
+    ):
+        self._connect = connect
+        self._health_check_interval = health_check_interval
+        self._client: Optional[weaviate.WeaviateAsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._retired: list[weaviate.WeaviateAsyncClient] = []
+        self._last_check = 0.0
+        self.connects = 0
+        atexit.register(self._close_at_exit)
+
+    async def get(self) -> weaviate.WeaviateAsyncClient:
+        """Return the shared client for the running loop, connecting as needed."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Clients and locks from another loop can't be used (or awaited) here
+            self._retire()
+            self._loop = loop
+            self._lock = asyncio.Lock()
+        while self._retired:
+            await _close_quietly(self._retired.pop())
+        async with self._lock:
+            if self._client is not None and await self._is_healthy():
+                return self._client
+            await self._close_client()
+            self._client = await self._connect()
+            self._last_check = time.monotonic()
+            self.connects += 1
+            return self._client
+
+    async def _is_healthy(self) -> bool:
+        now = time.monotonic()
+        if now - self._last_check < self._health_check_interval:
+            return True
+        try:
+            healthy = self._client.is_connected() and await self._client.is_ready()
+        except Exception:
+            healthy = False
+        self._last_check = now
+        return healthy
+
+    @property
+    def connect(self) -> Callable[[], Awaitable[weaviate.WeaviateAsyncClient]]:
+        """The connection factory."""
+        return self._connect
+
+    def set_connect(
+        self, connect: Callable[[], Awaitable[weaviate.WeaviateAsyncClient]]
+    ) -> None:
+        """Swap the connection factory. The current client is closed."""
+        self._connect = connect
+        self._retire()
+
+    def _retire(self) -> None:
+        """Stop using the current client: close it on its loop if that runs, else on the next `get()`."""
+        client, loop = self._client, self._loop
+        self._client = None
+        if client is None:
+            return
+        log.info("Closing the replaced async Weaviate client")
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(_close_quietly(client), loop)
+        else:
+            self._retired.append(client)
+
+    async def close(self) -> None:
+        """Close the shared client. The next `get()` reconnects."""
+        if self._lock is None:
+            return
+        async with self._lock:
+            await self._close_client()
+
+    async def _close_client(self) -> None:
+        if self._client is None:
+            return
+        try:
+            await self._client.close()
+        except Exception:
+            pass
+        self._client = None
+
+    def _close_at_exit(self) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed() or loop.is_running():
+            return
+        for client in self._retired:
+            loop.run_until_complete(_close_quietly(client))
+        self._retired.clear()
+        loop.run_until_complete(self._close_client())
+
+
+async def _close_quietly(client: weaviate.WeaviateAsyncClient, timeout: float = 5.0) -> None:
+    """Close `client`, logging instead of raising if its connections can't be closed cleanly."""
+    try:
+        await asyncio.wait_for(client.close(), timeout)
+    except Exception as e:
+        log.debug("Closing an async Weaviate client failed: %r", e)
@@ -0,0 +1,156 @@
+"""
+Query-focused extractive compression of doc pages, before they reach the LLM.
+
+Pages are split into passages, every passage is scored against the query with
+BM25 (vectorized with NumPy), and the best passages are kept, in page order,
+up to a token budget. Everything runs locally on the CPU.
+"""
+
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+
+from telemetry import metrics
+
+TOKEN_RE = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it of on or that the "
+    "this to what when where which who why with you your my me we".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (about 4 characters per token for English text and code)."""
+    return (len(text) + 3) // 4
+
+
+def split_passages(text: str, max_chars: int = 1200) -> list[str]:
+    """Split on blank lines, merging short paragraphs and cutting long ones."""
+    passages: list[str] = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            passages.append(paragraph[:cut])
+            paragraph = paragraph[cut:].strip()
+        if passages and len(passages[-1]) + len(paragraph) < max_chars // 4:
+            passages[-1] += "\n\n" + paragraph
+        elif paragraph:
+            passages.append(paragraph)
+    return passages
+
+
+def bm25_scores(passages: list[str], query: str, k1: float = 1.5, b: float = 0.75) -> np.ndarray:
+    """BM25 score of every passage for `query`, treating the passages as the corpus."""
+    terms = list(dict.fromkeys(t for t in TOKEN_RE.findall(query.lower()) if t not in STOPWORDS))
+    if not terms or not passages:
+        return np.zeros(len(passages))
+    term_index = {t: i for i, t in enumerate(terms)}
+    tokens = [TOKEN_RE.findall(p.lower()) for p in passages]
+    lengths = np.array([len(t) for t in tokens], dtype=np.float64)
+    rows = np.repeat(np.arange(len(passages)), lengths.astype(np.int64))
+    cols = np.array([term_index.get(t, -1) for ts in tokens for t in ts], dtype=np.int64)
+    hit = cols >= 0
+    tf = np.zeros((len(passages), len(terms)))
+    np.add.at(tf, (rows[hit], cols[hit]), 1.0)
+    df = (tf > 0).sum(axis=0)
+    idf = np.log1p((len(passages) - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * lengths / max(lengths.mean(), 1.0))
+    return (idf * tf * (k1 + 1) / (tf + norm[:, None])).sum(axis=1)
+
+
+@dataclass
+class CompressionResult:
+    text: str
+    original_tokens: int
+    compressed_tokens: int
+    passages_kept: int
+    passages_total: int
+
+
+class DocCompressor:
+    """
+    Keep the passages of a page most relevant to a query, within `budget_tokens`.
+
+    Pages already under budget are returned unchanged. `budget_tokens` is the
+    default; pass a per-call budget to `compress` to override it. Running totals
+    of original vs. compressed tokens are kept for `stats()`, and counted in the
+    `doc_tokens_total` metric (type "original" or "compressed").
+    """
+
+    def __init__(self, budget_tokens: int = 1500, passage_chars: int = 1200):
+        self.budget_tokens = budget_tokens
+        self.passage_chars = passage_chars
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.original_tokens = 0
+        self.compressed_tokens = 0
+
+    def compress(self, text: str, query: str, budget_tokens: Optional[int] = None) -> CompressionResult:
+        budget = self.budget_tokens if budget_tokens is None else budget_tokens
+        original = estimate_tokens(text)
+        if original <= budget:
+            result = CompressionResult(text, original, original, 1, 1)
+        else:
+            result = self._select(text, query, budget, original)
+        with self._lock:
+            self.calls += 1
+            self.original_tokens += result.original_tokens
+            self.compressed_tokens += result.compressed_tokens
+        metrics.inc("doc_tokens_total", result.original_tokens, type="original")
+        metrics.inc("doc_tokens_total", result.compressed_tokens, type="compressed")
+        return result
+
+    def _select(self, text: str, query: str, budget: int, original: int) -> CompressionResult:
+        passages = split_passages(text, self.passage_chars)
+        scores = bm25_scores(passages, query)
+        # Best first; ties (e.g. no query term matched anywhere) keep page order
+        ranked = np.lexsort((np.arange(len(passages)), -scores))
+        kept, used = [], 0
+        for i in ranked:
+            cost = estimate_tokens(passages[i]) + 2  # room for the "[...]" separators
+            if used + cost > budget:
+                continue
+            kept.append(i)
+            used += cost
+        if not kept and passages:
+            # Not even the best passage fits: keep its start, cut at a word, rather than nothing
+            return self._truncated(passages, int(ranked[0]), budget, original)
+        kept.sort()
+        parts = []
+        for n, i in enumerate(kept):
+            if (n == 0 and i > 0) or (n > 0 and i != kept[n - 1] + 1):
+                parts.append("[...]")
+            parts.append(passages[i])
+        if kept and kept[-1] < len(passages) - 1:
+            parts.append("[...]")
+        compressed = "\n\n".join(parts)
+        return CompressionResult(
+            compressed, original, estimate_tokens(compressed), len(kept), len(passages)
+        )
+
+    def _truncated(self, passages: list[str], i: int, budget: int, original: int) -> CompressionResult:
+        limit = max(budget - 4, 1) * 4  # leaving room for the "[...]" around it
+        cut = passages[i].rfind(" ", 0, limit)
+        parts = [passages[i][: cut if cut > 0 else limit], "[...]"]
+        if i > 0:
+            parts.insert(0, "[...]")
+        compressed = "\n\n".join(parts)
+        return CompressionResult(compressed, original, estimate_tokens(compressed), 1, len(passages))
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "original_tokens": self.original_tokens,
+                "compressed_tokens": self.compressed_tokens,
+                "saved_ratio": 1 - self.compressed_tokens / self.original_tokens
+                if self.original_tokens
+                else 0.0,
+            }
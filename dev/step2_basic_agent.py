@@ -14,6 +14,7 @@ class UserInfo(BaseModel):
 
 basic_agent = Agent(
     model="anthropic:claude-3-5-haiku-latest",
+    defer_model_check=True,  # resolved on the first run, so importing needs no API key
     deps_type=UserInfo,
 )
 
@@ -34,13 +35,14 @@ def get_weather(ctx: RunContext[UserInfo]) -> str:
     return get_weather_for_city(ctx.deps.city)
 
 
-prompt = "What's the weather like today where I am?"
+if __name__ == "__main__":
+    prompt = "What's the weather like today where I am?"
 
-for user_info in [
-    UserInfo(name="JP", city="Edinburgh"),
-    UserInfo(name="Daniel", city="Paris"),
-]:
-    print(f">> RUNNING PROMPT: {prompt} for user: {user_info.name}")
-    model_response = basic_agent.run_sync(user_prompt=prompt, deps=user_info)
-    print(f"Agent response for: {user_info.name}")
-    print(model_response.output, "\n\n")
+    for user_info in [
+        UserInfo(name="JP", city="Edinburgh"),
+        UserInfo(name="Daniel", city="Paris"),
+    ]:
+        print(f">> RUNNING PROMPT: {prompt} for user: {user_info.name}")
+        model_response = basic_agent.run_sync(user_prompt=prompt, deps=user_info)
+        print(f"Agent response for: {user_info.name}")
+        print(model_response.output, "\n\n")
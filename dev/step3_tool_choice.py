@@ -14,6 +14,7 @@ class UserInfo(BaseModel):
 
 basic_agent = Agent(
     model="anthropic:claude-3-5-haiku-latest",
+    defer_model_check=True,  # resolved on the first run, so importing needs no API key
     deps_type=UserInfo,
 )
 
@@ -41,13 +42,14 @@ def tool_get_trending_news(ctx: RunContext[UserInfo]) -> str:
     return get_trending_news_for_city(ctx.deps.city)
 
 
-user_info = UserInfo(name="JP", city="Edinburgh")
-for prompt in [
-    "What's the weather like today where I am?",
-    "What's the trending news item where I am today??",
-    "What country is my city in? Has it always been the case?",
-]:
-    print(f">> RUNNING PROMPT: {prompt} for user: {user_info.name}")
-    model_response = basic_agent.run_sync(user_prompt=prompt, deps=user_info)
-    print(f"Agent response for: {user_info.name}")
-    print(model_response.output, "\n\n")
+if __name__ == "__main__":
+    user_info = UserInfo(name="JP", city="Edinburgh")
+    for prompt in [
+        "What's the weather like today where I am?",
+        "What's the trending news item where I am today??",
+        "What country is my city in? Has it always been the case?",
+    ]:
+        print(f">> RUNNING PROMPT: {prompt} for user: {user_info.name}")
+        model_response = basic_agent.run_sync(user_prompt=prompt, deps=user_info)
+        print(f"Agent response for: {user_info.name}")
+        print(model_response.output, "\n\n")
@@ -0,0 +1,334 @@
+"""
+Escalations to human support, filed without holding up the agent's turn.
+
+`contact_human_support` is where a call to the ticketing system (Zendesk,
+Jira, GitHub Issues, ...) goes, and that call can take seconds. Instead of
+making it in the turn, the tool calls `EscalationQueue.enqueue`. That writes
+the ticket to a local SQLite queue and returns its ID at once. A background
+thread submits queued tickets to the backend in batches. A batch that fails
+is retried from disk with exponential backoff, so tickets survive backend
+outages and restarts. After `max_attempts`, a ticket is marked failed and
+kept for someone to look at.
+
+A ticket that repeats one the same session filed within `dedupe_window` is
+not filed again; the earlier ticket is returned. "Repeats" means the same
+title and description, or a close rewording (by `ngram_embedding` similarity).
+
+`LocalTicketBackend` stands in for the ticketing system, with simulated
+latency and failures:
+
+    escalations = EscalationQueue(".cache/escalations.sqlite", submit=LocalTicketBackend().submit)
+    ticket = escalations.enqueue(session_id, "Backups fail on S3", "...", "bug", "support")
+"""
+
+import asyncio
+import itertools
+import logging
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import numpy as np
+
+from search_cache import ngram_embedding, normalize_query
+from telemetry import metrics
+
+log = logging.getLogger(__name__)
+
+BATCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+
+@dataclass
+class Ticket:
+    id: str
+    session_id: str
+    title: str
+    description: str
+    issue_type: str
+    department: str
+    created_at: float = field(default_factory=time.time)
+    status: str = "queued"  # then "submitted", or "failed" after max_attempts
+    attempts: int = 0
+    reference: Optional[str] = None  # the backend's ID for the ticket, once submitted
+    error: Optional[str] = None
+    duplicate: bool = False  # returned by `enqueue` in place of a repeated ticket
+
+
+def new_ticket_id() -> str:
+    """A random, 122-bit ticket ID (a UUID4)."""
+    return f"ESC-{uuid.uuid4().hex}"
+
+
+COLUMNS = (
+    "id, session_id, title, description, issue_type, department, "
+    "created_at, status, attempts, reference, error"
+)
+
+
+class EscalationQueue:
+    """
+    Thread-safe ticket queue in SQLite at `path`, drained by a background thread.
+
+    `submit` files a batch of tickets with the ticketing backend. It returns
+    the backend's reference for each ticket it accepted, by ticket ID, and
+    raises if the whole batch failed. A batch may be submitted again after a
+    failure, so the backend should treat the ticket ID as an idempotency key.
+
+    The worker waits `linger` seconds after a ticket arrives, so that tickets
+    arriving together go out in one batch of at most `batch_size`. A failed
+    ticket is retried after `backoff * 2**attempts` seconds, with jitter, up
+    to `max_backoff`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        submit: Callable[[list[Ticket]], Awaitable[Dict[str, str]]],
+        batch_size: int = 20,
+        linger: float = 0.1,
+        max_attempts: int = 8,
+        backoff: float = 2.0,
+        max_backoff: float = 300.0,
+        timeout: float = 30.0,
+        dedupe_window: float = 60 * 60,
+        threshold: float = 0.9,
+        embed: Callable[[str], np.ndarray] = ngram_embedding,
+    ):
+        self.path = path
+        self.submit = submit
+        self.batch_size = batch_size
+        self.linger = linger
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.dedupe_window = dedupe_window
+        self.threshold = threshold
+        self._embed = embed
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """The database, opened on first use. Call with the lock held."""
+        if self._db is None:
+            if self.path != ":memory:":
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            # WAL: a queued ticket survives the process crashing; only a power cut can lose the last few
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            with self._db:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS tickets ("
+                    "id TEXT PRIMARY KEY, session_id TEXT, title TEXT, description TEXT, "
+                    "issue_type TEXT, department TEXT, created_at REAL, status TEXT, "
+                    "attempts INTEGER, reference TEXT, error TEXT, next_attempt REAL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS due ON tickets (status, next_attempt)")
+                self._db.execute("CREATE INDEX IF NOT EXISTS by_session ON tickets (session_id, created_at)")
+        return self._db
+
+    def enqueue(
+        self, session_id: str, title: str, description: str, issue_type: str, department: str
+    ) -> Ticket:
+        """Queue a ticket and return it, or the ticket it repeats (with `duplicate` set)."""
+        text = normalize_query(f"{title} {description}")
+        with self._lock:
+            earlier = self._find_repeat(session_id, text)
+            if earlier is None:
+                ticket = Ticket(new_ticket_id(), session_id, title, description, issue_type, department)
+                db = self._connect()
+                with db:
+                    db.execute(
+                        f"INSERT INTO tickets ({COLUMNS}, next_attempt) VALUES ({', '.join('?' * 12)})",
+                        (*self._row(ticket), ticket.created_at),
+                    )
+        if earlier is not None:
+            metrics.inc("escalations_total", outcome="duplicate")
+            return replace(earlier, duplicate=True)
+        metrics.inc("escalations_total", outcome="queued")
+        self.start()
+        self._wake.set()
+        return ticket
+
+    def _find_repeat(self, session_id: str, text: str) -> Optional[Ticket]:
+        rows = self._connect().execute(
+            f"SELECT {COLUMNS} FROM tickets WHERE session_id = ? AND created_at >= ? AND status != 'failed'",
+            (session_id, time.time() - self.dedupe_window),
+        ).fetchall()
+        if not rows:
+            return None
+        vector = self._embed(text)
+        for row in rows:
+            ticket = Ticket(*row)
+            earlier = normalize_query(f"{ticket.title} {ticket.description}")
+            if earlier == text or float(self._embed(earlier) @ vector) >= self.threshold:
+                return ticket
+        return None
+
+    @staticmethod
+    def _row(ticket: Ticket) -> tuple:
+        return (
+            ticket.id,
+            ticket.session_id,
+            ticket.title,
+            ticket.description,
+            ticket.issue_type,
+            ticket.department,
+            ticket.created_at,
+            ticket.status,
+            ticket.attempts,
+            ticket.reference,
+            ticket.error,
+        )
+
+    def get(self, ticket_id: str) -> Optional[Ticket]:
+        with self._lock:
+            row = self._connect().execute(f"SELECT {COLUMNS} FROM tickets WHERE id = ?", (ticket_id,)).fetchone()
+        return Ticket(*row) if row else None
+
+    def start(self) -> None:
+        """Start the worker, if it isn't running. Tickets queued by an earlier process are picked up too."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="escalations", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Submit what is due (waiting up to `timeout` seconds) and stop the worker. Retries stay on disk."""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """Wait until no ticket is queued, or `timeout` passes. Return whether the queue emptied."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.stats()["queued"] == 0:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def _due(self) -> tuple[list[Ticket], Optional[float]]:
+        """Up to `batch_size` tickets due for submission, and the seconds until the next one is due."""
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            rows = db.execute(
+                f"SELECT {COLUMNS} FROM tickets WHERE status = 'queued' AND next_attempt <= ? "
+                "ORDER BY next_attempt LIMIT ?",
+                (now, self.batch_size),
+            ).fetchall()
+            upcoming = db.execute(
+                "SELECT MIN(next_attempt) FROM tickets WHERE status = 'queued' AND next_attempt > ?", (now,)
+            ).fetchone()[0]
+        return [Ticket(*row) for row in rows], (upcoming - now if upcoming is not None else None)
+
+    def _run(self) -> None:
+        loop = asyncio.new_event_loop()
+        try:
+            while True:
+                batch, next_due = self._due()
+                if not batch:
+                    if self._stopping:
+                        return
+                    self._wake.wait(next_due)
+                    self._wake.clear()
+                    if self.linger and not self._stopping:
+                        time.sleep(self.linger)
+                    continue
+                loop.run_until_complete(self._submit_batch(batch))
+        except Exception:
+            log.exception("Escalation worker stopped")
+        finally:
+            loop.close()
+
+    async def _submit_batch(self, batch: list[Ticket]) -> None:
+        metrics.observe("escalation_batch_size", len(batch), BATCH_BUCKETS)
+        start = time.perf_counter()
+        try:
+            references = await asyncio.wait_for(self.submit(batch), self.timeout)
+            error = "Not accepted by the ticketing backend"
+        except Exception as e:
+            references, error = {}, f"{type(e).__name__}: {e}"
+        metrics.observe("escalation_submit_duration_seconds", time.perf_counter() - start)
+        now = time.time()
+        updates = []
+        retries = []
+        for ticket in batch:
+            attempts = ticket.attempts + 1
+            if ticket.id in references:
+                updates.append(("submitted", attempts, references[ticket.id], None, now, ticket.id))
+                metrics.observe("escalation_delivery_seconds", now - ticket.created_at)
+                outcome = "submitted"
+            elif attempts >= self.max_attempts:
+                updates.append(("failed", attempts, None, error, now, ticket.id))
+                log.error("Escalation %s failed after %d attempts: %s", ticket.id, attempts, error)
+                outcome = "failed"
+            else:
+                delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1)) * random.uniform(0.5, 1.5)
+                updates.append(("queued", attempts, None, error, now + delay, ticket.id))
+                retries.append(delay)
+                outcome = "retry"
+            metrics.inc("escalation_submissions_total", outcome=outcome)
+        if retries:
+            log.warning(
+                "%d escalations not filed (%s), retrying in %.1f-%.1fs", len(retries), error, min(retries), max(retries)
+            )
+        with self._lock:
+            db = self._connect()
+            with db:
+                db.executemany(
+                    "UPDATE tickets SET status = ?, attempts = ?, reference = ?, error = ?, next_attempt = ? "
+                    "WHERE id = ?",
+                    updates,
+                )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._connect().execute("SELECT status, COUNT(*) FROM tickets GROUP BY status").fetchall()
+        counts = {"queued": 0, "submitted": 0, "failed": 0, **dict(rows)}
+        return {**counts, "worker_running": self._thread is not None and self._thread.is_alive()}
+
+
+class LocalTicketBackend:
+    """
+    Stand-in for the ticketing system: keeps tickets in memory and numbers them.
+
+    Each batch takes `latency` seconds, and fails as a whole with probability
+    `failure_rate`. A ticket submitted again keeps its first number.
+    """
+
+    def __init__(self, latency: float = 0.2, failure_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.tickets: Dict[str, Ticket] = {}
+        self.references: Dict[str, str] = {}
+        self.batches = 0
+        self.failures = 0
+        self._numbers = itertools.count(10001)
+        self._rng = random.Random(seed)
+
+    async def submit(self, tickets: list[Ticket]) -> Dict[str, str]:
+        self.batches += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self._rng.random() < self.failure_rate:
+            self.failures += 1
+            raise ConnectionError("Ticketing backend unavailable (simulated)")
+        for ticket in tickets:
+            if ticket.id not in self.references:
+                self.references[ticket.id] = f"#{next(self._numbers)}"
+                self.tickets[ticket.id] = ticket
+        return {ticket.id: self.references[ticket.id] for ticket in tickets}
@@ -0,0 +1,473 @@
+"""
+A local, in-memory stand-in for the `DocCatalog` collection on Weaviate Cloud.
+
+It implements the small slice of the Weaviate client API that `tools.py` uses,
+with optional simulated connection, query and transfer latency, so benchmarks
+and offline runs don't need a cluster, a Cohere key or a network connection.
+
+    from fake_weaviate import FakeDocCatalog, FakeWeaviateClient
+    catalog = FakeDocCatalog()
+    client = FakeWeaviateClient(catalog, connect_latency=0.05)
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+EMBEDDING_DIM = 64
+
+TOPICS = [
+    ("weaviate/manage-collections/collection-aliases.md", "Collection aliases", "alias aliases rename collection switch migration zero downtime"),
+    ("weaviate/manage-collections/collection-operations.md", "Collection operations", "create collection delete collection list collections schema properties"),
+    ("weaviate/configuration/compression/pq-compression.md", "Product quantization (PQ)", "compression pq product quantization memory vector index"),
+    ("weaviate/configuration/compression/bq-compression.md", "Binary quantization (BQ)", "compression bq binary quantization memory recall"),
+    ("weaviate/configuration/backups.md", "Backups", "backup restore s3 gcs filesystem module"),
+    ("weaviate/connections/connect-cloud.md", "Connect to Weaviate Cloud", "connect cloud api key cluster url client"),
+    ("weaviate/search/similarity.md", "Vector similarity search", "near text near vector similarity search distance limit"),
+    ("weaviate/search/hybrid.md", "Hybrid search", "hybrid search bm25 keyword vector alpha fusion"),
+    ("weaviate/search/bm25.md", "Keyword (BM25) search", "bm25 keyword search tokenization properties"),
+    ("weaviate/manage-objects/import.md", "Batch import", "batch import objects insert dynamic batching errors"),
+    ("weaviate/config-refs/distances.md", "Distance metrics", "distance metric cosine dot l2 hamming"),
+    ("weaviate/concepts/replication-architecture/index.md", "Replication", "replication consistency factor nodes cluster"),
+    ("weaviate/manage-collections/multi-tenancy.md", "Multi-tenancy", "multi tenancy tenants tenant activity offload"),
+    ("weaviate/model-providers/cohere/embeddings.md", "Cohere embeddings", "cohere embeddings vectorizer text2vec model"),
+]
+
+FILLER = (
+    "weaviate vector database index query object property schema module vectorizer "
+    "filter tenant shard node replica backup batch client python typescript go java "
+    "grpc rest graphql metadata uuid reference cross generative rag rerank"
+).split()
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def embed(text: str, dim: int = EMBEDDING_DIM) -> list[float]:
+    """Deterministic hashed bag-of-words embedding, normalised to unit length."""
+    vector = [0.0] * dim
+    for token in TOKEN_RE.findall(text.lower()):
+        bucket = int(hashlib.md5(token.encode()).hexdigest()[:8], 16)
+        vector[bucket % dim] += 1.0 if bucket & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def make_doc_corpus(
+    n_docs: int = 200, content_chars: int = 8000, seed: int = 0
+) -> list[Dict[str, Any]]:
+    """Build a synthetic DocCatalog: realistic pages first, generated filler pages after."""
+    rng = random.Random(seed)
+    docs = []
+    for i in range(n_docs):
+        if i < len(TOPICS):
+            path, title, keywords = TOPICS[i]
+        else:
+            words = rng.sample(FILLER, 3)
+            path = f"weaviate/{words[0]}/{'-'.join(words[1:])}-{i}.md"
+            title = " ".join(words).capitalize()
+            keywords = " ".join(rng.sample(FILLER, 8))
+        sections = []
+        while sum(len(s) for s in sections) < content_chars:
+            heading = " ".join(rng.sample(keywords.split(), min(3, len(keywords.split()))))
+            body = " ".join(rng.choice(keywords.split() + FILLER) for _ in range(120))
+            sections.append(f"## {heading.capitalize()}\n\n{body}.\n")
+        docs.append(
+            {
+                "path": path,
+                "summary": f"{title}: how to use {keywords} in Weaviate.",
+                "content": f"# {title}\n\n" + "\n".join(sections),
+                "referenced_files": [
+                    f"_includes/code/{path.rsplit('/', 1)[-1].replace('.md', '')}.py"
+                ],
+            }
+        )
+    return docs
+
+
+@dataclass
+class FakeMetadata:
+    distance: Optional[float] = None
+    score: Optional[float] = None
+    last_update_time: Optional[datetime] = None
+
+
+@dataclass
+class FakeObject:
+    properties: Dict[str, Any]
+    metadata: FakeMetadata = field(default_factory=FakeMetadata)
+    vector: Dict[str, list[float]] = field(default_factory=dict)
+
+
+@dataclass
+class FakeQueryReturn:
+    objects: list[FakeObject]
+    nbytes: int = 0
+
+
+def _payload_bytes(objects: list[FakeObject]) -> int:
+    """Size of the objects on the wire: properties as JSON, 4 bytes per vector dimension."""
+    size = 0
+    for o in objects:
+        size += len(json.dumps(o.properties, default=str).encode("utf-8"))
+        size += sum(4 * len(v) for v in o.vector.values())
+    return size
+
+
+def _matches(obj: Dict[str, Any], filters) -> bool:
+    """Evaluate the subset of `weaviate.classes.query.Filter` used by the tools."""
+    if filters is None:
+        return True
+    operator = getattr(filters.operator, "value", filters.operator)
+    if operator == "And":
+        return all(_matches(obj, f) for f in filters.filters)
+    if operator == "Or":
+        return any(_matches(obj, f) for f in filters.filters)
+    value = obj.get(filters.target)
+    if operator == "Equal":
+        return value == filters.value
+    if operator == "NotEqual":
+        return value != filters.value
+    if operator == "ContainsAny":
+        return value in filters.value
+    raise NotImplementedError(f"Filter operator {operator!r} not supported by the stand-in")
+
+
+class _FakeQuery:
+    def __init__(self, collection: "_FakeCollection"):
+        self._col = collection
+
+    def _select(self, doc: Dict[str, Any], return_properties) -> Dict[str, Any]:
+        if return_properties is None:
+            return dict(doc)
+        return {k: doc[k] for k in return_properties}
+
+    def _send(self, objects: list[FakeObject]) -> FakeQueryReturn:
+        response = FakeQueryReturn(objects, _payload_bytes(objects))
+        self._col.catalog.bytes_sent += response.nbytes
+        self._col.client._simulate_transfer(response.nbytes)
+        return response
+
+    def near_text(
+        self,
+        query: str,
+        limit: int = 10,
+        target_vector: Optional[str] = None,
+        distance: Optional[float] = None,
+        filters=None,
+        return_properties=None,
+        return_metadata=None,
+        include_vector: bool = False,
+        **kwargs,
+    ) -> FakeQueryReturn:
+        return self.near_vector(
+            embed(query),
+            limit=limit,
+            distance=distance,
+            filters=filters,
+            return_properties=return_properties,
+            include_vector=include_vector,
+        )
+
+    def near_vector(
+        self,
+        near_vector: list[float],
+        limit: int = 10,
+        target_vector: Optional[str] = None,
+        distance: Optional[float] = None,
+        filters=None,
+        return_properties=None,
+        return_metadata=None,
+        include_vector: bool = False,
+        **kwargs,
+    ) -> FakeQueryReturn:
+        self._col.client._simulate_query()
+        scored = []
+        for doc, vector in zip(self._col.catalog.docs, self._col.catalog.vectors):
+            if not _matches(doc, filters):
+                continue
+            d = 1.0 - sum(a * b for a, b in zip(near_vector, vector))
+            if distance is None or d <= distance:
+                scored.append((d, doc, vector))
+        scored.sort(key=lambda t: t[0])
+        return self._send(
+            [
+                FakeObject(
+                    self._select(doc, return_properties),
+                    FakeMetadata(distance=d),
+                    {"default": vector} if include_vector else {},
+                )
+                for d, doc, vector in scored[:limit]
+            ]
+        )
+
+    def bm25(
+        self,
+        query: str,
+        limit: int = 10,
+        filters=None,
+        return_properties=None,
+        return_metadata=None,
+        **kwargs,
+    ) -> FakeQueryReturn:
+        self._col.client._simulate_query()
+        terms = set(TOKEN_RE.findall(query.lower()))
+        scored = []
+        for doc in self._col.catalog.docs:
+            if not _matches(doc, filters):
+                continue
+            tokens = TOKEN_RE.findall(f"{doc['path']} {doc['summary']}".lower())
+            score = float(sum(1 for t in tokens if t in terms))
+            if score > 0:
+                scored.append((score, doc))
+        scored.sort(key=lambda t: -t[0])
+        return self._send(
+            [
+                FakeObject(self._select(doc, return_properties), FakeMetadata(score=s))
+                for s, doc in scored[:limit]
+            ]
+        )
+
+    def fetch_objects(
+        self,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        filters=None,
+        return_properties=None,
+        include_vector: bool = False,
+        **kwargs,
+    ) -> FakeQueryReturn:
+        self._col.client._simulate_query()
+        hits = [
+            (doc, vector)
+            for doc, vector in zip(self._col.catalog.docs, self._col.catalog.vectors)
+            if _matches(doc, filters)
+        ]
+        hits = hits[offset or 0 :]
+        if limit is not None:
+            hits = hits[:limit]
+        return self._send(
+            [
+                FakeObject(
+                    self._select(doc, return_properties),
+                    vector={"default": vector} if include_vector else {},
+                )
+                for doc, vector in hits
+            ]
+        )
+
+
+class _FakeCollection:
+    def __init__(self, client: "FakeWeaviateClient", name: str):
+        self.client = client
+        self.catalog = client.catalog
+        self.name = name
+        self.query = _FakeQuery(self)
+
+    def iterator(self, include_vector: bool = False, return_properties=None, return_metadata=None, **kwargs):
+        for i, (doc, vector) in enumerate(zip(self.catalog.docs, self.catalog.vectors)):
+            if i % 100 == 0:  # the real iterator pages through 100 objects per query
+                self.client._simulate_query()
+            yield FakeObject(
+                self.query._select(doc, return_properties),
+                FakeMetadata(last_update_time=self.catalog.updated[i] if return_metadata else None),
+                {"default": vector} if include_vector else {},
+            )
+
+
+class _FakeCollections:
+    def __init__(self, client: "FakeWeaviateClient"):
+        self._client = client
+
+    def use(self, name: str) -> _FakeCollection:
+        return _FakeCollection(self._client, name)
+
+    get = use
+
+
+class FakeDocCatalog:
+    """The server side of the stand-in: documents plus their precomputed vectors."""
+
+    def __init__(self, docs: Optional[list[Dict[str, Any]]] = None):
+        self.docs = docs if docs is not None else make_doc_corpus()
+        self.vectors = [embed(f"{d['path']} {d['summary']}") for d in self.docs]
+        self.updated = [datetime.now(timezone.utc)] * len(self.docs)
+        self.queries = 0
+        self.bytes_sent = 0
+
+    def edit(self, path: str, content: str) -> None:
+        """Change a page's content, as a docs update would; its last update time moves on."""
+        i = next(i for i, doc in enumerate(self.docs) if doc["path"] == path)
+        self.docs[i] = {**self.docs[i], "content": content}
+        self.updated[i] = datetime.now(timezone.utc)
+
+
+class FakeWeaviateClient:
+    """
+    Synchronous stand-in for `weaviate.WeaviateClient`.
+
+    `connect_latency` is paid once when the client is created (the handshake),
+    `query_latency` on every query, and `transfer_latency` per KB of each
+    response. `catalog.queries` and `catalog.bytes_sent` count round trips and
+    response bytes across all clients sharing the catalog.
+    """
+
+    def __init__(
+        self,
+        catalog: Optional[FakeDocCatalog] = None,
+        connect_latency: float = 0.0,
+        query_latency: float = 0.0,
+        transfer_latency: float = 0.0,
+    ):
+        self.catalog = catalog if catalog is not None else FakeDocCatalog()
+        self.connect_latency = connect_latency
+        self.query_latency = query_latency
+        self.transfer_latency = transfer_latency
+        self.collections = _FakeCollections(self)
+        self._connected = False
+        self.connect()
+
+    def _simulate_query(self) -> None:
+        if not self._connected:
+            raise RuntimeError("Client is closed")
+        self.catalog.queries += 1
+        if self.query_latency:
+            time.sleep(self.query_latency)
+
+    def _simulate_transfer(self, nbytes: int) -> None:
+        if self.transfer_latency:
+            time.sleep(self.transfer_latency * nbytes / 1024)
+
+    def connect(self) -> None:
+        if self.connect_latency:
+            time.sleep(self.connect_latency)
+        self._connected = True
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    def is_ready(self) -> bool:
+        return self._connected
+
+    def close(self) -> None:
+        self._connected = False
+
+    def __enter__(self) -> "FakeWeaviateClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class _FakeAsyncQuery:
+    """Awaitable wrappers around `_FakeQuery`, with the latency paid on the event loop."""
+
+    def __init__(self, collection: _FakeCollection):
+        self._client = collection.client
+        self._sync = _FakeQuery(collection)
+
+    def __getattr__(self, name: str):
+        method = getattr(self._sync, name)
+
+        async def call(*args, **kwargs):
+            if self._client.query_latency:
+                await asyncio.sleep(self._client.query_latency)
+            response = method(*args, **kwargs)
+            if self._client.transfer_latency and isinstance(response, FakeQueryReturn):
+                await asyncio.sleep(self._client.transfer_latency * response.nbytes / 1024)
+            return response
+
+        return call
+
+
+class _FakeAsyncCollections(_FakeCollections):
+    def use(self, name: str) -> _FakeCollection:
+        collection = _FakeCollection(self._client, name)
+        collection.query = _FakeAsyncQuery(collection)
+        return collection
+
+    get = use
+
+
+class FakeWeaviateAsyncClient:
+    """
+    Stand-in for `weaviate.WeaviateAsyncClient`.
+
+    Like the real async client, it must be connected with `await client.connect()`.
+    Latency is simulated with `asyncio.sleep`, so concurrent queries overlap.
+    """
+
+    def __init__(
+        self,
+        catalog: Optional[FakeDocCatalog] = None,
+        connect_latency: float = 0.0,
+        query_latency: float = 0.0,
+        transfer_latency: float = 0.0,
+    ):
+        self.catalog = catalog if catalog is not None else FakeDocCatalog()
+        self.connect_latency = connect_latency
+        self.query_latency = query_latency
+        self.transfer_latency = transfer_latency
+        self.collections = _FakeAsyncCollections(self)
+        self._connected = False
+
+    def _simulate_query(self) -> None:
+        if not self._connected:
+            raise RuntimeError("Client is closed")
+        self.catalog.queries += 1
+
+    def _simulate_transfer(self, nbytes: int) -> None:
+        pass  # paid with asyncio.sleep by _FakeAsyncQuery
+
+    async def connect(self) -> None:
+        if self.connect_latency:
+            await asyncio.sleep(self.connect_latency)
+        self._connected = True
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    async def is_ready(self) -> bool:
+        return self._connected
+
+    async def close(self) -> None:
+        self._connected = False
+
+    async def __aenter__(self) -> "FakeWeaviateAsyncClient":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+
+def use_stand_in(
+    catalog: Optional[FakeDocCatalog] = None, query_latency: float = 0.0, transfer_latency: float = 0.0
+) -> FakeDocCatalog:
+    """
+    Point the shared clients in tools.py at the stand-in instead of the cluster.
+
+    Return the catalog, whose `queries` and `bytes_sent` counters see every round trip.
+    """
+    import tools
+
+    catalog = catalog if catalog is not None else FakeDocCatalog()
+
+    async def connect_async() -> FakeWeaviateAsyncClient:
+        client = FakeWeaviateAsyncClient(
+            catalog, query_latency=query_latency, transfer_latency=transfer_latency
+        )
+        await client.connect()
+        return client
+
+    tools.client_manager.set_connect(
+        lambda: FakeWeaviateClient(catalog, query_latency=query_latency, transfer_latency=transfer_latency)
+    )
+    tools.async_client_manager.set_connect(connect_async)
+    return catalog
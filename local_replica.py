@@ -0,0 +1,281 @@
+"""
+Offline replica of the DocCatalog collection, with an in-process search engine.
+
+Export (or re-sync) a snapshot:
+
+    python local_replica.py --out .cache/doc_replica
+    python local_replica.py --out .cache/doc_replica --stand-in   # from fake_weaviate, no network
+
+A snapshot is a directory with:
+
+- meta.json     collection name, vectorizer, vector dimensions, object count
+- docs.jsonl    path, summary, referenced_files, last update time and the content's byte range,
+                one line per object
+- content.bin   all page contents, UTF-8, back to back
+- vectors.f32   the "default" vectors as one contiguous (count, dim) float32 array
+
+Point DOC_REPLICA_DIR at the directory and tools.py searches and fetches
+locally, falling back to the cluster when a query can't be served locally.
+Searching a snapshot of the real cluster still embeds each query with Cohere
+(COHERE_API_KEY, one API call per search): only a stand-in snapshot, whose
+vectorizer is local, is fully offline.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+from weaviate.classes.query import MetadataQuery
+
+
+@dataclass
+class ReplicaMetadata:
+    distance: Optional[float] = None
+
+
+@dataclass
+class ReplicaObject:
+    properties: Dict[str, Any]
+    metadata: ReplicaMetadata = field(default_factory=ReplicaMetadata)
+
+
+@dataclass
+class ReplicaQueryReturn:
+    objects: list[ReplicaObject]
+
+
+def export_collection(collection, out_dir: str, vectorizer: Dict[str, Any]) -> int:
+    """
+    Snapshot `collection` into `out_dir`, replacing any previous snapshot atomically.
+
+    Return the number of objects exported.
+    """
+    out = Path(out_dir)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix=out.name + ".", dir=out.parent))
+    count = 0
+    dim = None
+    offset = 0
+    with open(tmp / "docs.jsonl", "w") as docs, open(tmp / "content.bin", "wb") as content, open(
+        tmp / "vectors.f32", "wb"
+    ) as vectors:
+        for o in collection.iterator(
+            include_vector=True,
+            return_properties=["path", "summary", "content", "referenced_files"],
+            return_metadata=MetadataQuery(last_update_time=True),
+        ):
+            updated = getattr(o.metadata, "last_update_time", None)
+            vector = np.asarray(o.vector["default"], dtype=np.float32)
+            dim = dim or vector.shape[0]
+            body = o.properties["content"].encode("utf-8")
+            content.write(body)
+            vectors.write(vector.tobytes())
+            docs.write(
+                json.dumps(
+                    {
+                        "path": o.properties["path"],
+                        "summary": o.properties["summary"],
+                        "referenced_files": o.properties["referenced_files"],
+                        "updated": str(updated) if updated is not None else None,
+                        "content": [offset, len(body)],
+                    }
+                )
+                + "\n"
+            )
+            offset += len(body)
+            count += 1
+    if count == 0:
+        shutil.rmtree(tmp)
+        raise ValueError("Collection is empty; keeping the previous snapshot")
+    meta = {
+        "collection": getattr(collection, "name", None),
+        "vectorizer": vectorizer,
+        "dim": dim,
+        "count": count,
+        "exported_at": time.time(),
+    }
+    (tmp / "meta.json").write_text(json.dumps(meta, indent=2))
+    if out.exists():
+        old = out.with_name(out.name + ".old")
+        os.replace(out, old)
+        os.replace(tmp, out)
+        shutil.rmtree(old)
+    else:
+        os.replace(tmp, out)
+    return count
+
+
+def _vectorizer_info(collection) -> Dict[str, Any]:
+    try:
+        vectorizer = collection.config.get().vector_config["default"].vectorizer
+        return {
+            "provider": str(getattr(vectorizer.vectorizer, "value", vectorizer.vectorizer)),
+            "model": (vectorizer.model or {}).get("model"),
+        }
+    except Exception:
+        return {"provider": "unknown", "model": None}
+
+
+def cohere_query_embedder(model: Optional[str]) -> Callable[[str], np.ndarray]:
+    """Embed queries with Cohere, the same way the cluster's text2vec-cohere module does."""
+    import cohere
+
+    from rate_limit import limiter
+
+    client = cohere.ClientV2(api_key=os.getenv("COHERE_API_KEY"))
+
+    def embed(query: str) -> np.ndarray:
+        response = limiter.call(
+            ("cohere",),
+            lambda: client.embed(
+                texts=[query],
+                model=model or "embed-multilingual-v3.0",
+                input_type="search_query",
+                embedding_types=["float"],
+            ),
+        )
+        return np.asarray(response.embeddings.float_[0], dtype=np.float32)
+
+    return embed
+
+
+def query_embedder_for(vectorizer: Dict[str, Any]) -> Optional[Callable[[str], np.ndarray]]:
+    """Pick a query embedder matching the vectorizer the snapshot was built with."""
+    if vectorizer.get("provider") == "stand-in":
+        from fake_weaviate import embed
+
+        return lambda query: np.asarray(embed(query), dtype=np.float32)
+    if "cohere" in str(vectorizer.get("provider")):
+        try:
+            return cohere_query_embedder(vectorizer.get("model"))
+        except ImportError:
+            return None
+    return None
+
+
+class LocalDocCatalog:
+    """
+    Read-only, memory-mapped DocCatalog snapshot with brute-force float32 vector search.
+
+    Exact search over 20k 1024-dim vectors takes ~2.5ms per query (see
+    benchmarks/bench_local_replica.py), so there is no quantized index: 1-bit
+    codes with float32 rescoring only reached recall@5 = 0.39 at 8x oversampling,
+    and needed 400x, at a higher cost than exact search, to reach 0.95.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        embed_query: Optional[Callable[[str], np.ndarray]] = None,
+    ):
+        self.directory = Path(directory)
+        self.meta = json.loads((self.directory / "meta.json").read_text())
+        with open(self.directory / "docs.jsonl") as f:
+            self.docs = [json.loads(line) for line in f]
+        self.index = {doc["path"]: i for i, doc in enumerate(self.docs)}
+        count, dim = self.meta["count"], self.meta["dim"]
+        self.vectors = np.memmap(
+            self.directory / "vectors.f32", dtype=np.float32, mode="r", shape=(count, dim)
+        )
+        self._content = np.memmap(self.directory / "content.bin", dtype=np.uint8, mode="r")
+        norms = np.linalg.norm(self.vectors, axis=1)
+        self._inv_norms = np.where(norms > 0, 1.0 / np.maximum(norms, 1e-12), 0.0).astype(np.float32)
+        self._embed_query = embed_query or query_embedder_for(self.meta["vectorizer"])
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def content(self, i: int) -> str:
+        start, length = self.docs[i]["content"]
+        return self._content[start : start + length].tobytes().decode("utf-8")
+
+    def search_vectors(self, queries: np.ndarray, limit: int = 5) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Batched cosine search. `queries` is (q, dim); return (indices, distances), each (q, limit).
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        limit = min(limit, len(self.docs))
+        scores = (queries @ self.vectors.T) * self._inv_norms
+        top = np.argpartition(-scores, limit - 1, axis=1)[:, :limit]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return top, 1.0 - top_scores
+
+    def near_text(
+        self, query: str, limit: int = 5, distance: Optional[float] = None
+    ) -> Optional[ReplicaQueryReturn]:
+        """Search by text. Return None if the query can't be embedded locally."""
+        if self._embed_query is None:
+            return None
+        try:
+            vector = self._embed_query(query)
+        except Exception:
+            return None
+        indices, distances = self.search_vectors(vector[None, :], limit)
+        return ReplicaQueryReturn(
+            [
+                ReplicaObject(self.properties(int(i)), ReplicaMetadata(distance=float(d)))
+                for i, d in zip(indices[0], distances[0])
+                if distance is None or d <= distance
+            ]
+        )
+
+    def fetch_paths(self, paths: list[str]) -> ReplicaQueryReturn:
+        return ReplicaQueryReturn(
+            [ReplicaObject(self.properties(self.index[p])) for p in paths if p in self.index]
+        )
+
+    def versions(self) -> Dict[str, str]:
+        """
+        Each page's last update time. Pages without one (snapshots from before
+        it was recorded) get the snapshot's export time, so a re-export counts as a change.
+        """
+        exported = f"exported {self.meta['exported_at']}"
+        return {doc["path"]: doc.get("updated") or exported for doc in self.docs}
+
+    def properties(self, i: int) -> Dict[str, Any]:
+        doc = self.docs[i]
+        return {
+            "path": doc["path"],
+            "summary": doc["summary"],
+            "content": self.content(i),
+            "referenced_files": doc["referenced_files"],
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export or re-sync a local DocCatalog replica.")
+    parser.add_argument("--out", default=".cache/doc_replica")
+    parser.add_argument(
+        "--stand-in", action="store_true", help="export the fake_weaviate stand-in instead of the cluster"
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.stand_in:
+        from fake_weaviate import FakeWeaviateClient
+
+        with FakeWeaviateClient() as client:
+            col = client.collections.use("DocCatalog")
+            count = export_collection(col, args.out, {"provider": "stand-in", "model": None})
+    else:
+        from tools import COLLECTION_NAME, connect_to_doc_catalog
+
+        with connect_to_doc_catalog() as client:
+            col = client.collections.use(COLLECTION_NAME)
+            count = export_collection(col, args.out, _vectorizer_info(col))
+    print(f"Exported {count} objects to {args.out} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
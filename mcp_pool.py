@@ -0,0 +1,216 @@
+"""
+Keep MCP servers running across agent runs, instead of starting one per run.
+
+An `MCPServerStdio` used as an agent toolset is started when a run begins and
+stopped when it ends. Every run pays for spawning the process (with `uv run`,
+resolving its dependencies too) and the initialize handshake. On top of that,
+every model request lists the server's tools again, one more round trip.
+
+`WarmMCPPool` wraps `size` copies of a server and keeps them running from
+`start()` to `close()`. Runs entering and leaving it don't stop them. The
+tool listing is fetched once at startup and served from memory until
+`refresh_tools()`. Each tool call goes to the least busy server, so
+concurrent runs share the pool. MCP multiplexes requests over one session,
+so `size=1` is often enough; more servers help when one handles its calls
+one at a time. A server whose connection breaks (say its process died) is
+started again, and the call is retried once on a running server.
+
+    pool = WarmMCPPool(lambda: MCPServerStdio("uv", ["run", "weaviate-docs-mcp"]), size=2)
+    agent = Agent(model, toolsets=[pool])
+    await pool.start()  # pre-warm, before the first prompt
+    ...
+    await pool.close()
+"""
+
+import asyncio
+import dataclasses
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+import anyio
+from pydantic_ai import RunContext
+from pydantic_ai.mcp import MCPServer
+from pydantic_ai.toolsets.abstract import AbstractToolset, ToolsetTool
+
+log = logging.getLogger(__name__)
+
+
+class _Slot:
+    """One server of the pool, owned by a task that keeps it entered until the pool closes."""
+
+    def __init__(self):
+        self.server: Optional[MCPServer] = None
+        self.ready = asyncio.Event()
+        self.busy = 0
+        self.starts = 0
+        self.came_up = False
+        self.broken = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+
+class WarmMCPPool(AbstractToolset):
+    """
+    `size` MCP servers made by `make_server`, kept running between `start()` and `close()`.
+
+    Use it from one event loop. A server whose connection breaks is started
+    again after `restart_delay` seconds.
+    """
+
+    def __init__(
+        self,
+        make_server: Callable[[], MCPServer],
+        size: int = 1,
+        restart_delay: float = 1.0,
+        id: Optional[str] = None,
+    ):
+        self.make_server = make_server
+        self.size = size
+        self.restart_delay = restart_delay
+        self._id = id
+        self._slots: list[_Slot] = []
+        self._closing: Optional[asyncio.Event] = None
+        self._starting: Optional[asyncio.Future] = None
+        self._tools: Optional[Dict[str, ToolsetTool]] = None
+        self.startup_seconds: Optional[float] = None
+        self.tool_calls = 0
+
+    @property
+    def id(self) -> Optional[str]:
+        return self._id
+
+    async def start(self) -> float:
+        """Start the servers at once and list their tools, if not done yet. Return the seconds it took."""
+        if self._starting is None:
+            self._starting = asyncio.ensure_future(self._start())
+        try:
+            # Shielded: one caller giving up doesn't abort the startup the others wait for
+            return await asyncio.shield(self._starting)
+        except Exception:
+            self._starting = None
+            raise
+
+    async def _start(self) -> float:
+        start = time.perf_counter()
+        self._closing = asyncio.Event()
+        self._slots = [_Slot() for _ in range(self.size)]
+        for slot in self._slots:
+            # Each server is entered and exited in its own task, as anyio requires
+            slot.task = asyncio.create_task(self._keep_running(slot))
+        try:
+            await self._wait_ready(self._slots[0])
+            await self._list_tools()
+            await asyncio.gather(*(self._wait_ready(slot) for slot in self._slots[1:]))
+        except BaseException:
+            await self._stop()
+            raise
+        self.startup_seconds = time.perf_counter() - start
+        log.info("Started %d MCP server(s) in %.2fs", self.size, self.startup_seconds)
+        return self.startup_seconds
+
+    async def _keep_running(self, slot: _Slot) -> None:
+        while not self._closing.is_set():
+            slot.server = self.make_server()
+            slot.starts += 1
+            try:
+                async with slot.server:
+                    slot.came_up = True
+                    slot.ready.set()
+                    await self._wait_any(self._closing, slot.broken)
+            except Exception:
+                if not slot.came_up:
+                    raise  # a server that never started fails `start()` instead of retrying forever
+                log.exception("MCP server stopped, restarting in %.1fs", self.restart_delay)
+            slot.ready.clear()
+            slot.broken.clear()
+            if not self._closing.is_set():
+                await asyncio.sleep(self.restart_delay)
+
+    @staticmethod
+    async def _wait_any(*events: asyncio.Event) -> None:
+        waiters = [asyncio.create_task(event.wait()) for event in events]
+        try:
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
+    async def _wait_ready(self, slot: _Slot) -> None:
+        ready = asyncio.create_task(slot.ready.wait())
+        await asyncio.wait({ready, slot.task}, return_when=asyncio.FIRST_COMPLETED)
+        if not ready.done():
+            ready.cancel()
+            slot.task.result()  # re-raise why the server task ended
+
+    async def _list_tools(self) -> None:
+        # The tools don't depend on the run, so any context (here none) gives the same listing
+        tools = await self._slots[0].server.get_tools(None)
+        self._tools = {name: dataclasses.replace(tool, toolset=self) for name, tool in tools.items()}
+
+    def refresh_tools(self) -> None:
+        """List the tools again on the next model request (after the server's tools changed)."""
+        self._tools = None
+
+    async def close(self) -> None:
+        """Stop the servers."""
+        if not self._slots:
+            return
+        await self._stop()
+        self._starting = None
+
+    async def _stop(self) -> None:
+        self._closing.set()
+        await asyncio.gather(*(slot.task for slot in self._slots), return_exceptions=True)
+        self._slots = []
+        self._tools = None
+
+    async def __aenter__(self) -> "WarmMCPPool":
+        # Entered by every agent run: start the servers if needed, and leave them running on exit
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: Any) -> Optional[bool]:
+        return None
+
+    async def get_tools(self, ctx: RunContext[Any]) -> Dict[str, ToolsetTool]:
+        await self.start()
+        if self._tools is None:
+            await self._list_tools()
+        return self._tools
+
+    async def _pick_slot(self) -> _Slot:
+        ready = [slot for slot in self._slots if slot.ready.is_set()]
+        if ready:
+            return min(ready, key=lambda s: s.busy)
+        slot = min(self._slots, key=lambda s: s.busy)
+        await self._wait_ready(slot)
+        return slot
+
+    async def call_tool(
+        self, name: str, tool_args: Dict[str, Any], ctx: RunContext[Any], tool: ToolsetTool
+    ) -> Any:
+        self.tool_calls += 1
+        for attempt in range(2):
+            slot = await self._pick_slot()
+            slot.busy += 1
+            try:
+                return await slot.server.call_tool(name, tool_args, ctx, tool)
+            except (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream):
+                if attempt:
+                    raise
+                log.warning("MCP server connection broke during %s, retrying on a restarted server", name)
+                # The owner task exits the dead server and starts a new one
+                slot.ready.clear()
+                slot.broken.set()
+            finally:
+                slot.busy -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "servers": len(self._slots),
+            "ready": sum(slot.ready.is_set() for slot in self._slots),
+            "busy": [slot.busy for slot in self._slots],
+            "restarts": sum(max(0, slot.starts - 1) for slot in self._slots),
+            "tool_calls": self.tool_calls,
+            "startup_seconds": self.startup_seconds,
+        }
@@ -0,0 +1,144 @@
+"""
+Content cache for DocCatalog pages.
+
+Doc pages rarely change, so `fetch_weaviate_docs_page` keeps recently fetched
+pages in memory (an LRU bounded by total bytes, with a TTL), optionally backed
+by a directory on local disk so a restarted process starts warm.
+"""
+
+import hashlib
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+
+class DiskPageStore:
+    """
+    Persistent tier: one file per page, read back through a read-only mmap.
+
+    The file's modification time is the time the page was stored.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _file(self, path: str) -> Path:
+        return self.directory / (hashlib.sha256(path.encode()).hexdigest() + ".page")
+
+    def get(self, path: str, max_age: float) -> Optional[str]:
+        file = self._file(path)
+        try:
+            if time.time() - file.stat().st_mtime > max_age:
+                return None
+            with open(file, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return ""
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    return m[:].decode("utf-8")
+        except FileNotFoundError:
+            return None
+
+    def put(self, path: str, content: str) -> None:
+        file = self._file(path)
+        tmp = file.with_suffix(".tmp")
+        tmp.write_bytes(content.encode("utf-8"))
+        # Atomic rename, so concurrent readers never see a half-written page
+        os.replace(tmp, file)
+
+    def clear(self) -> None:
+        for file in self.directory.glob("*.page"):
+            file.unlink(missing_ok=True)
+
+
+class PageCache:
+    """
+    Thread-safe LRU cache of page content, bounded by total UTF-8 bytes.
+
+    Entries older than `ttl` seconds are treated as misses. If `store` is given,
+    memory misses fall through to it and every `put` is written through.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 32 * 1024 * 1024,
+        ttl: float = 24 * 60 * 60,
+        store: Optional[DiskPageStore] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.store = store
+        self._entries: "OrderedDict[str, tuple[str, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, path: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None:
+                content, size, stored_at = entry
+                if time.monotonic() - stored_at <= self.ttl:
+                    self._entries.move_to_end(path)
+                    self.hits += 1
+                    return content
+                self._remove(path)
+                self.expirations += 1
+        if self.store is not None:
+            content = self.store.get(path, self.ttl)
+            if content is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._insert(path, content)
+                return content
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, path: str, content: str) -> None:
+        with self._lock:
+            self._insert(path, content)
+        if self.store is not None:
+            self.store.put(path, content)
+
+    def _insert(self, path: str, content: str) -> None:
+        size = len(content.encode("utf-8"))
+        if path in self._entries:
+            self._remove(path)
+        if size > self.max_bytes:
+            return
+        self._entries[path] = (content, size, time.monotonic())
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, path: str) -> None:
+        _, size, _ = self._entries.pop(path)
+        self._bytes -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,120 @@
+"""
+Split doc pages into sections, so tools can return one part of a page at a time.
+
+Sections follow the page's markdown headings; `#` lines inside fenced code
+blocks (``` or ~~~) are code, not headings. A section longer than
+`max_chars` is cut further at paragraph (or, failing that, line) boundaries.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional
+
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$", re.MULTILINE)
+FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+
+
+class SectionNotFoundError(ValueError):
+    """The requested section number is not on the page, which has `sections` sections."""
+
+    def __init__(self, section: int, sections: int):
+        super().__init__(
+            f"Section {section} does not exist; the page has {sections} sections, numbered 0 to {sections - 1}"
+        )
+        self.section = section
+        self.sections = sections
+
+
+@dataclass
+class Section:
+    title: str
+    level: int
+    start: int
+    end: int
+
+
+def split_sections(content: str, max_chars: int = 4000) -> list[Section]:
+    """Return the sections of `content`, in order, covering the whole text."""
+    starts = list(_headings(content))
+    if not starts or starts[0][0] > 0:
+        starts.insert(0, (0, 0, "(introduction)"))
+    sections = []
+    for i, (start, level, title) in enumerate(starts):
+        end = starts[i + 1][0] if i + 1 < len(starts) else len(content)
+        if not content[start:end].strip():
+            continue
+        part = 1
+        while end - start > max_chars:
+            cut = _cut_point(content, start, start + max_chars)
+            sections.append(Section(f"{title} (part {part})", level, start, cut))
+            start, part = cut, part + 1
+        sections.append(Section(title if part == 1 else f"{title} (part {part})", level, start, end))
+    return sections
+
+
+def _headings(content: str) -> Iterator[tuple[int, int, str]]:
+    """Yield the offset, level and title of each heading outside fenced code blocks."""
+    fence = None
+    offset = 0
+    for line in content.splitlines(keepends=True):
+        opening = FENCE_RE.match(line)
+        if fence is None:
+            if opening:
+                fence = opening.group(1)
+            else:
+                heading = HEADING_RE.match(line)
+                if heading:
+                    yield offset, len(heading.group(1)), heading.group(2)
+        elif opening and line.strip() == opening.group(1) and opening.group(1)[0] == fence[0]:
+            # A closing fence repeats the opening character at least as often, alone on its line
+            if len(opening.group(1)) >= len(fence):
+                fence = None
+        offset += len(line)
+
+
+def _cut_point(content: str, start: int, limit: int) -> int:
+    for separator in ("\n\n", "\n", " "):
+        cut = content.rfind(separator, start + 1, limit)
+        if cut > start:
+            return cut + len(separator)
+    return limit
+
+
+def table_of_contents(sections: list[Section]) -> list[Dict[str, Any]]:
+    return [
+        {"section": i, "title": s.title, "level": s.level, "chars": s.end - s.start}
+        for i, s in enumerate(sections)
+    ]
+
+
+def page_window(
+    content: str,
+    section: Optional[int] = None,
+    offset: int = 0,
+    limit: int = 4000,
+    max_section_chars: int = 4000,
+) -> Dict[str, Any]:
+    """
+    Return a table of contents plus a window of the page.
+
+    With `section`, the window is `[offset, offset + limit)` characters into that
+    section; without it, into the whole page. `next_offset` is None at the end.
+    """
+    sections = split_sections(content, max_section_chars)
+    if section is None:
+        text = content
+    elif 0 <= section < len(sections):
+        s = sections[section]
+        text = content[s.start : s.end]
+    else:
+        raise SectionNotFoundError(section, len(sections))
+    offset = max(0, offset)
+    end = min(len(text), offset + limit)
+    return {
+        "table_of_contents": table_of_contents(sections),
+        "section": section,
+        "text": text[offset:end],
+        "offset": offset,
+        "next_offset": end if end < len(text) else None,
+        "total_chars": len(text),
+    }
@@ -0,0 +1,259 @@
+"""
+Local index of every DocCatalog page path, for checking paths before fetching.
+
+Models sometimes ask for a page path that is slightly off ("backup.md" for
+"backups.md", the right file in the wrong folder) or made up. Fetching it costs
+a round trip to Weaviate that finds nothing. `PathIndex` keeps all the valid
+paths in memory, so a wrong path is caught without a network call, corrected
+when one valid path is clearly meant, and otherwise answered with the nearest
+valid paths.
+
+- Exact lookups are a dict lookup.
+- Prefix lookups (`with_prefix`) bisect the sorted paths.
+- Fuzzy matching compares the words of the path (folder and file name parts,
+  weighted by how rare they are) with an inverted index. Misspelled words are
+  matched to known words by their character trigrams. Only paths sharing a
+  reasonably rare word are scored, so a lookup touches a few hundred entries
+  at most, even with tens of thousands of paths.
+
+The index is loaded in the background on first use and reloaded once it is
+older than `refresh_interval`. Until the first load that finds any paths,
+paths are not checked, and a failed or empty load is retried after
+`retry_interval`.
+`load` may also return each path's version (e.g. its last update time), which
+`version` reports as of the last load.
+"""
+
+import bisect
+import difflib
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Mapping, Optional, Union
+
+log = logging.getLogger(__name__)
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _words(path: str) -> list[str]:
+    return list(dict.fromkeys(WORD_RE.findall(path.lower())))
+
+
+def _trigrams(word: str) -> set[str]:
+    padded = f"^{word}$"
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _normalize(path: str) -> str:
+    """The forms models get wrong most: surrounding slashes and whitespace, a missing `.md`."""
+    path = path.strip().strip("/")
+    return path if path.endswith(".md") else path + ".md"
+
+
+@dataclass
+class PathMatch:
+    """
+    How a requested path resolved: `path` is the valid path to fetch (the
+    requested one, or its correction), or None when there is no such page.
+    """
+
+    requested: str
+    path: Optional[str]
+    suggestions: list[str] = field(default_factory=list)
+
+    @property
+    def corrected(self) -> bool:
+        return self.path is not None and self.path != self.requested
+
+
+class _Snapshot:
+    """Immutable lookup structures for one set of paths, swapped in whole on refresh."""
+
+    def __init__(self, paths: Union[Iterable[str], Mapping[str, Optional[str]]], common_share: float):
+        self.versions = dict(paths) if isinstance(paths, Mapping) else {}
+        self.paths = sorted(set(paths))
+        self.ids = {path: i for i, path in enumerate(self.paths)}
+        self.by_lower = {_normalize(path).lower(): i for i, path in enumerate(self.paths)}
+        self.by_name: Dict[str, list[int]] = defaultdict(list)
+        for i, path in enumerate(self.paths):
+            self.by_name[path.rsplit("/", 1)[-1].lower()].append(i)
+        self.words = [_words(path) for path in self.paths]
+        postings: Dict[str, list[int]] = defaultdict(list)
+        for i, words in enumerate(self.words):
+            for word in words:
+                postings[word].append(i)
+        n = max(1, len(self.paths))
+        self.idf = {word: math.log(1 + n / len(ids)) for word, ids in postings.items()}
+        # Words in most paths ("weaviate", "md") don't tell candidates apart: score, don't index them
+        max_postings = max(50, int(common_share * n))
+        self.postings = {word: ids for word, ids in postings.items() if len(ids) <= max_postings}
+        self.norms = [math.sqrt(sum(self.idf[w] ** 2 for w in words)) or 1.0 for words in self.words]
+        self.word_trigrams: Dict[str, list[str]] = defaultdict(list)
+        for word in self.idf:
+            for gram in _trigrams(word):
+                self.word_trigrams[gram].append(word)
+
+    def similar_words(self, word: str, min_similarity: float = 0.75) -> Dict[str, float]:
+        """Known spellings close to `word`, best two: trigram candidates, scored by edit similarity."""
+        shared = Counter(w for gram in _trigrams(word) for w in self.word_trigrams.get(gram, ()))
+        scored = {}
+        for candidate, _ in shared.most_common(20):
+            similarity = difflib.SequenceMatcher(None, word, candidate).ratio()
+            if similarity >= min_similarity:
+                scored[candidate] = similarity
+        return dict(sorted(scored.items(), key=lambda item: -item[1])[:2])
+
+    def nearest(self, path: str, limit: int) -> list[tuple[str, float]]:
+        """Valid paths most like `path`, best first, with a cosine score in [0, 1]."""
+        # Each query word counts as itself if known, and as its closest known spellings if
+        # unknown or part of the file name (where "backup" for "backups" is most likely)
+        weights: Dict[str, float] = {}
+        query_norm = 0.0
+        name_words = set(_words(path.rsplit("/", 1)[-1]))
+        for word in _words(path):
+            matches = {word: 1.0} if word in self.idf else {}
+            if not matches or word in name_words:
+                matches.update((w, sim) for w, sim in self.similar_words(word).items() if w != word)
+            rarity = max((self.idf[w] for w in matches), default=math.log(1 + len(self.paths)))
+            query_norm += rarity**2
+            for match, similarity in matches.items():
+                weights[match] = max(weights.get(match, 0.0), similarity)
+        candidates = {i for word in weights for i in self.postings.get(word, ())}
+        scored = []
+        for i in candidates:
+            overlap = sum(weights[w] * self.idf[w] ** 2 for w in self.words[i] if w in weights)
+            scored.append((overlap / (math.sqrt(query_norm) * self.norms[i]), i))
+        scored.sort(reverse=True)
+        return [(self.paths[i], min(1.0, score)) for score, i in scored[:limit]]
+
+
+class PathIndex:
+    """
+    All valid page paths, loaded with `load()` and reloaded in the background.
+
+    `load` returns the paths, or a mapping of each path to its version.
+
+    A wrong path whose best match scores at least `auto_correct`, and
+    `margin` more than the runner-up, is corrected to it.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[], Union[Iterable[str], Mapping[str, Optional[str]]]],
+        refresh_interval: float = 60 * 60,
+        retry_interval: float = 60,
+        auto_correct: float = 0.75,
+        margin: float = 0.1,
+        common_share: float = 0.05,
+    ):
+        self._load = load
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.auto_correct = auto_correct
+        self.margin = margin
+        self.common_share = common_share
+        self._snapshot: Optional[_Snapshot] = None
+        self._next_refresh = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self.corrections = 0
+        self.rejections = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._snapshot is not None
+
+    def __len__(self) -> int:
+        snapshot = self._snapshot
+        return len(snapshot.paths) if snapshot is not None else 0
+
+    def __contains__(self, path: str) -> bool:
+        snapshot = self._current()
+        return snapshot is not None and path in snapshot.ids
+
+    def version(self, path: str) -> Optional[str]:
+        """`path`'s version as of the last load, or None if unknown (not loaded, no such page, no versions)."""
+        snapshot = self._current()
+        return snapshot.versions.get(path) if snapshot is not None else None
+
+    def refresh(self) -> int:
+        """Load the paths now and swap them in. Return how many there are."""
+        snapshot = _Snapshot(self._load(), self.common_share)
+        # Likely a failed or partial load: an empty index would reject every path until the next refresh
+        if not snapshot.paths:
+            kept = "keeping the previous index" if self._snapshot is not None else "paths stay unchecked"
+            raise ValueError(f"No paths loaded; {kept}")
+        self._snapshot = snapshot
+        self._next_refresh = time.monotonic() + self.refresh_interval
+        log.info("Indexed %d doc page paths", len(snapshot.paths))
+        return len(snapshot.paths)
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self.refresh()
+        except Exception:
+            log.exception("Loading the doc path index failed, retrying in %.0fs", self.retry_interval)
+            self._next_refresh = time.monotonic() + self.retry_interval
+        finally:
+            self._refreshing = False
+
+    def _current(self) -> Optional[_Snapshot]:
+        """The index as it is, after starting a background reload if it is due."""
+        if time.monotonic() >= self._next_refresh and not self._refreshing:
+            with self._lock:
+                if not self._refreshing and time.monotonic() >= self._next_refresh:
+                    self._refreshing = True
+                    threading.Thread(target=self._refresh_in_background, daemon=True).start()
+        return self._snapshot
+
+    def with_prefix(self, prefix: str, limit: int = 20) -> list[str]:
+        """Valid paths starting with `prefix`, in order."""
+        snapshot = self._current()
+        if snapshot is None:
+            return []
+        start = bisect.bisect_left(snapshot.paths, prefix)
+        found = []
+        for path in snapshot.paths[start : start + limit]:
+            if not path.startswith(prefix):
+                break
+            found.append(path)
+        return found
+
+    def suggest(self, path: str, limit: int = 3) -> list[str]:
+        """The valid paths closest to `path`, best first."""
+        snapshot = self._current()
+        if snapshot is None:
+            return []
+        return [match for match, _ in snapshot.nearest(path, limit)]
+
+    def resolve(self, path: str, limit: int = 3) -> PathMatch:
+        """Check `path`, correcting it if one valid path is clearly meant. Unchecked until loaded."""
+        snapshot = self._current()
+        if snapshot is None or path in snapshot.ids:
+            return PathMatch(path, path)
+        i = snapshot.by_lower.get(_normalize(path).lower())
+        if i is None:
+            # The right file name in the wrong folder, when only one page has that name
+            same_name = snapshot.by_name.get(_normalize(path).rsplit("/", 1)[-1].lower(), [])
+            i = same_name[0] if len(same_name) == 1 else None
+        if i is not None:
+            self.corrections += 1
+            return PathMatch(path, snapshot.paths[i])
+        # A folder: its pages are the suggestions
+        nearest = [(match, 0.0) for match in self.with_prefix(path.rstrip("/") + "/", limit)]
+        nearest = nearest or snapshot.nearest(path, limit)
+        best = nearest[0][1] if nearest else 0.0
+        runner_up = nearest[1][1] if len(nearest) > 1 else 0.0
+        if best >= self.auto_correct and best - runner_up >= self.margin:
+            self.corrections += 1
+            return PathMatch(path, nearest[0][0], [match for match, _ in nearest])
+        self.rejections += 1
+        return PathMatch(path, None, [match for match, _ in nearest])
+
+    def stats(self) -> Dict[str, int]:
+        return {"paths": len(self), "corrections": self.corrections, "rejections": self.rejections}
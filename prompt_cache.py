@@ -0,0 +1,202 @@
+"""
+Anthropic prompt caching for the part of each request that doesn't change.
+
+Every model request of a chat turn starts with the same tool definitions and
+system prompt, then the conversation so far. Anthropic can cache a request's
+prefix up to a `cache_control` marker (a breakpoint). For about five minutes,
+a request starting with the same prefix reads it from the cache instead of
+processing it again. That costs a tenth of the input token price and shortens
+the time to first token. Writing a prefix to the cache costs 25% more than
+input tokens, once.
+
+`CachingAnthropicModel` marks, in the order Anthropic reads a request:
+
+1. the last tool definition, caching the tools;
+2. the system prompt, caching tools and system prompt;
+3. the end of the earlier turns, caching the history for every request of this turn;
+4. the end of the last message, caching this request for the turn's next one
+   (after a tool call).
+
+That is the API's limit of four breakpoints. A prefix shorter than the
+model's minimum (1024 tokens, 2048 for Haiku models) isn't cached and its
+marker is ignored. The tokens each response read from and wrote to the cache
+are in its usage (`cache_read_tokens`, `cache_write_tokens`).
+
+pydantic-ai has no public hook for these markers, so `CachingAnthropicModel`
+overrides two private `AnthropicModel` methods. pyproject.toml pins
+pydantic-ai to the minor versions they were checked against, and importing
+this module fails if the methods are gone or their signatures changed.
+
+    python -m benchmarks.check_prompt_cache   # check where the markers go, offline
+"""
+
+import inspect
+import os
+from functools import cached_property
+from typing import Any, Callable, Dict, Optional, Union
+
+from pydantic_ai.models import Model
+from pydantic_ai.models.anthropic import AnthropicModel
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.profiles import DEFAULT_PROFILE, ModelProfile, ModelProfileSpec
+from pydantic_ai.profiles.anthropic import anthropic_model_profile
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+# Content blocks the API doesn't accept a breakpoint on
+UNMARKABLE_BLOCKS = {"thinking", "redacted_thinking"}
+
+
+def mark_tools(tools: list[Dict[str, Any]]) -> list[Dict[str, Any]]:
+    """`tools` with a breakpoint on the last one."""
+    if not tools:
+        return tools
+    return [*tools[:-1], {**tools[-1], "cache_control": CACHE_CONTROL}]
+
+
+def mark_system(system: str) -> Union[str, list[Dict[str, Any]]]:
+    """The system prompt as a text block with a breakpoint (a plain string can't have one)."""
+    if not system:
+        return system
+    return [{"type": "text", "text": system, "cache_control": CACHE_CONTROL}]
+
+
+def _blocks(message: Dict[str, Any]) -> list[Dict[str, Any]]:
+    content = message["content"]
+    return [{"type": "text", "text": content}] if isinstance(content, str) else list(content)
+
+
+def turn_start(messages: list[Dict[str, Any]]) -> int:
+    """Index of the message opening the current turn: the last user message that isn't only tool results."""
+    for i in range(len(messages) - 1, -1, -1):
+        message = messages[i]
+        if message["role"] == "user" and any(b.get("type") != "tool_result" for b in _blocks(message)):
+            return i
+    return 0
+
+
+def _mark_last_block(message: Dict[str, Any]) -> Dict[str, Any]:
+    blocks = _blocks(message)
+    for i in range(len(blocks) - 1, -1, -1):
+        block = blocks[i]
+        if block.get("type") in UNMARKABLE_BLOCKS or (block.get("type") == "text" and not block.get("text")):
+            continue
+        blocks[i] = {**block, "cache_control": CACHE_CONTROL}
+        return {**message, "content": blocks}
+    return message
+
+
+def mark_messages(messages: list[Dict[str, Any]]) -> list[Dict[str, Any]]:
+    """`messages` with breakpoints at the end of the earlier turns and at the end of the last message."""
+    marked = list(messages)
+    ends = {len(marked) - 1, turn_start(marked) - 1}
+    for i in ends:
+        if i >= 0:
+            marked[i] = _mark_last_block(marked[i])
+    return marked
+
+
+# The private AnthropicModel methods overridden below: name -> (parameters, is a coroutine function)
+OVERRIDDEN_METHODS = {
+    "_get_tools": (["self", "model_request_parameters"], False),
+    "_map_message": (["self", "messages"], True),
+}
+
+
+def check_overridden_methods(cls: type = AnthropicModel) -> None:
+    """Raise ImportError if `cls` no longer has the methods `CachingAnthropicModel` overrides, as expected."""
+    for name, (parameters, is_async) in OVERRIDDEN_METHODS.items():
+        method = getattr(cls, name, None)
+        if (
+            method is None
+            or list(inspect.signature(method).parameters) != parameters
+            or inspect.iscoroutinefunction(method) != is_async
+        ):
+            raise ImportError(
+                f"{cls.__name__}.{name} is missing or has changed in this pydantic-ai version; "
+                "prompt_cache.CachingAnthropicModel needs updating (or install the version pinned in pyproject.toml)"
+            )
+
+
+check_overridden_methods()
+
+
+class CachingAnthropicModel(AnthropicModel):
+    """An `AnthropicModel` whose requests mark their tools, system prompt and history as cacheable."""
+
+    def _get_tools(self, model_request_parameters):
+        return mark_tools(super()._get_tools(model_request_parameters))
+
+    async def _map_message(self, messages):
+        system, anthropic_messages = await super()._map_message(messages)
+        return mark_system(system), mark_messages(anthropic_messages)
+
+
+class LazyModel(WrapperModel):
+    """
+    The model `build` returns, built on first use rather than up front.
+
+    `model_name`, `system` and, if given, `profile` are known without building
+    it, so an agent using it can be created, and replayed from a cassette (see
+    cassette.py), without the provider's API key.
+    """
+
+    def __init__(
+        self,
+        build: Callable[[], Model],
+        model_name: str,
+        system: str,
+        profile: Optional[ModelProfileSpec] = None,
+    ):
+        Model.__init__(self, profile=profile)
+        self.build = build
+        self._model_name = model_name
+        self._system = system
+
+    @cached_property
+    def wrapped(self) -> Model:
+        return self.build()
+
+    @property
+    def model_name(self) -> str:
+        return self._model_name
+
+    @property
+    def system(self) -> str:
+        return self._system
+
+    @cached_property
+    def profile(self) -> ModelProfile:
+        if self._profile is None:
+            return self.wrapped.profile
+        profile = self._profile(self._model_name) if callable(self._profile) else self._profile
+        return profile or DEFAULT_PROFILE
+
+    @property
+    def client(self) -> Any:
+        """The built model's SDK client, e.g. for `RateLimitedModel` to switch off its retries."""
+        return self.wrapped.client
+
+    @client.setter
+    def client(self, client: Any) -> None:
+        self.wrapped.client = client
+
+    def __repr__(self) -> str:
+        return f"LazyModel({self._system}:{self._model_name})"
+
+
+def anthropic_model(model_name: str, cache: Optional[bool] = None, **kwargs: Any) -> Model:
+    """
+    Anthropic's `model_name`, with prompt caching unless `cache` is false (by
+    default, unless ANTHROPIC_PROMPT_CACHE=0). Keyword arguments go to `AnthropicModel`.
+    The model is built, and ANTHROPIC_API_KEY read, on its first request.
+    """
+    if cache is None:
+        cache = os.getenv("ANTHROPIC_PROMPT_CACHE", "1") != "0"
+    model_class = CachingAnthropicModel if cache else AnthropicModel
+    return LazyModel(
+        lambda: model_class(model_name, **kwargs),
+        model_name,
+        "anthropic",
+        profile=kwargs.get("profile") or anthropic_model_profile,
+    )
@@ -0,0 +1,451 @@
+"""
+Client-side rate limits for the providers the chatbot calls: Anthropic (the
+model), Cohere (query embeddings) and Weaviate.
+
+One `RateLimiter`, `limiter`, is shared by the whole process. It keeps a
+`ProviderLimit` per provider, with token buckets for requests per minute and
+tokens per minute, set from ANTHROPIC_RPM, ANTHROPIC_TPM, COHERE_RPM,
+WEAVIATE_RPM, ... Calls wait for capacity instead of being rejected by the
+provider.
+
+When a provider answers 429 (or Anthropic's 529 "overloaded") anyway, the
+provider is paused, for as long as its retry-after header says or else for an
+exponentially growing delay, with jitter, and the call is retried. Every
+other call to that provider waits out the same pause, instead of each one
+retrying on its own schedule. Other transient failures (5xx, timeouts,
+dropped connections) are retried with backoff, for that call only.
+
+The limiter is the one layer that retries: `RateLimitedModel` turns off the
+provider SDK's own retries, and the batch runner doesn't retry what the
+limiter gave up on, so a throttled request is sent at most `retries + 1` times.
+
+Waiting calls are served in lane order, then arrival order: calls made inside
+`with lane(BATCH):` (batch_runner.py runs its jobs there) go after
+interactive chat turns, the default lane. Wait times, queue depths and 429s
+go to `telemetry.metrics`.
+
+    model = rate_limited("anthropic:claude-3-5-haiku-latest")  # every model request is limited
+    response = limiter.call(("weaviate",), lambda: col.query.fetch_objects(limit=5))
+"""
+
+import asyncio
+import contextlib
+import itertools
+import os
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, TypeVar
+
+import httpx
+from pydantic_ai.models import Model
+from pydantic_ai.models.wrapper import WrapperModel
+
+from chat_memory import estimate_message_tokens
+from telemetry import metrics
+
+T = TypeVar("T")
+
+INTERACTIVE = 0
+BATCH = 1
+LANE_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+THROTTLED_STATUS = {429, 529}
+TRANSIENT_STATUS = {408, 409, 500, 502, 503, 504}
+
+# Errors without a status code (e.g. Weaviate's gRPC errors) say so in the message
+THROTTLED_MESSAGE_RE = re.compile(r"\bRESOURCE_EXHAUSTED\b|\b429\b\W{0,3}Too Many Requests", re.IGNORECASE)
+
+DEPTH_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Longest sleep between checks, so a waiter notices capacity freed by a cancelled call
+MAX_SLEEP = 0.25
+
+_lane: ContextVar[int] = ContextVar("rate_limit_lane", default=INTERACTIVE)
+
+
+@contextlib.contextmanager
+def lane(priority: int):
+    """Run the calls made inside the block (and in tasks started there) in `priority`'s lane."""
+    token = _lane.set(priority)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute` tokens per minute, holding
+    at most `burst`. Not locked: `ProviderLimit` guards its buckets.
+    """
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60
+        self.capacity = burst if burst is not None else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (a full bucket is enough for any amount)."""
+        return max(0.0, min(amount, self.capacity) - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        """Take `amount` tokens, or return them if negative. The bucket may go into debt."""
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """The delay asked for by the retry-after header of the response behind `error`, if any."""
+    while error is not None:
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        if headers is not None:
+            for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+                try:
+                    return float(headers[header]) * scale
+                except (KeyError, TypeError, ValueError):
+                    continue  # missing, or an HTTP date
+        error = error.__cause__
+    return None
+
+
+def _status(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _grpc_code(error: BaseException) -> Optional[str]:
+    code = getattr(error, "code", None)
+    if not callable(code):
+        return None
+    try:
+        return getattr(code(), "name", None)
+    except Exception:
+        return None
+
+
+def is_throttled(error: BaseException) -> bool:
+    """Whether `error` is a provider's "too many requests" or "overloaded" answer."""
+    while error is not None:
+        status = _status(error)
+        if status is not None:
+            return status in THROTTLED_STATUS
+        if _grpc_code(error) == "RESOURCE_EXHAUSTED" or THROTTLED_MESSAGE_RE.search(str(error)):
+            return True
+        error = error.__cause__
+    return False
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether `error` is a failure other than throttling that may pass: a 5xx, a timeout or a dropped connection."""
+    while error is not None:
+        status = _status(error)
+        if status is not None:
+            return status in TRANSIENT_STATUS
+        if _grpc_code(error) in ("UNAVAILABLE", "DEADLINE_EXCEEDED"):
+            return True
+        if isinstance(error, (httpx.TransportError, ConnectionError, asyncio.TimeoutError)):
+            return True
+        error = error.__cause__
+    return False
+
+
+class ProviderLimit:
+    """
+    Requests-per-minute and tokens-per-minute buckets for one provider, shared
+    by every thread and event loop in the process.
+
+    Without `rpm` or `tpm` that side is unlimited, but 429s still pause the
+    provider. Buckets hold `burst_seconds` worth of capacity. After a 429 the
+    provider is paused for its retry-after delay or for `backoff * 2**n`
+    seconds (n counting consecutive 429s, at most `max_backoff`), plus jitter.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        burst_seconds: float = 10.0,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+    ):
+        self.name = name
+        self.requests = TokenBucket(rpm, max(1.0, rpm / 60 * burst_seconds)) if rpm else None
+        self.tokens = TokenBucket(tpm, tpm / 60 * burst_seconds) if tpm else None
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._waiting: list[tuple[int, int, float]] = []  # (lane, arrival, tokens)
+        self._arrivals = itertools.count()
+        self._paused_until = 0.0
+        self._consecutive_throttles = 0
+        self.throttles = 0
+        self.waited = 0.0
+
+    def _needs(self, requests: float, tokens: float) -> list[tuple[TokenBucket, float]]:
+        needs = [(self.requests, requests), (self.tokens, tokens)]
+        return [(bucket, amount) for bucket, amount in needs if bucket is not None]
+
+    def _try_take(self, ticket: tuple[int, int, float]) -> float:
+        """Take capacity for `ticket` and return 0, or return how long to sleep before trying again."""
+        now = time.monotonic()
+        with self._lock:
+            if now < self._paused_until:
+                return min(self._paused_until - now, MAX_SLEEP)
+            for bucket, _ in self._needs(0, 0):
+                bucket.refill(now)
+            ahead = [t for t in self._waiting if t <= ticket]
+            needs = self._needs(len(ahead), sum(t[2] for t in ahead))
+            if len(ahead) == 1:
+                ready = all(bucket.wait_time(amount) == 0 for bucket, amount in needs)
+            else:
+                # Only with enough capacity for every waiter ahead too, so nobody is overtaken
+                ready = all(bucket.tokens >= amount for bucket, amount in needs)
+            if ready:
+                for bucket, amount in self._needs(1, ticket[2]):
+                    bucket.take(amount)
+                return 0.0
+            return min(max([bucket.wait_time(amount) for bucket, amount in needs] + [0.001]), MAX_SLEEP)
+
+    def _enqueue(self, tokens: float) -> tuple[int, int, float]:
+        ticket = (_lane.get(), next(self._arrivals), float(tokens))
+        with self._lock:
+            depth = len(self._waiting)
+            self._waiting.append(ticket)
+        metrics.observe("rate_limit_queue_depth", depth, DEPTH_BUCKETS, provider=self.name)
+        return ticket
+
+    def _dequeue(self, ticket: tuple[int, int, float], start: float) -> None:
+        with self._lock:
+            self._waiting.remove(ticket)
+        waited = time.monotonic() - start
+        self.waited += waited
+        metrics.observe(
+            "rate_limit_wait_seconds", waited, provider=self.name, lane=LANE_NAMES.get(ticket[0], "other")
+        )
+
+    async def acquire(self, tokens: float = 0) -> None:
+        """Wait for one request and `tokens` tokens, after the waiters ahead in this lane or a higher one."""
+        start = time.monotonic()
+        ticket = self._enqueue(tokens)
+        try:
+            while (delay := self._try_take(ticket)) > 0:
+                await asyncio.sleep(delay)
+        finally:
+            self._dequeue(ticket, start)
+
+    def acquire_blocking(self, tokens: float = 0) -> None:
+        """`acquire`, for synchronous code (e.g. tools run in a worker thread)."""
+        start = time.monotonic()
+        ticket = self._enqueue(tokens)
+        try:
+            while (delay := self._try_take(ticket)) > 0:
+                time.sleep(delay)
+        finally:
+            self._dequeue(ticket, start)
+
+    def settle(self, estimated: float, actual: float) -> None:
+        """Correct the tokens taken for a request from the estimate to the actual count."""
+        if self.tokens is not None and actual:
+            with self._lock:
+                self.tokens.take(actual - estimated)
+
+    def throttled(self, error: BaseException) -> float:
+        """Pause the provider after a 429 and return the pause."""
+        with self._lock:
+            self._consecutive_throttles += 1
+            self.throttles += 1
+            delay = retry_after(error)
+            if delay is not None:
+                # A little jitter, so the waiters don't all retry at the same instant
+                delay *= random.uniform(1.0, 1.2)
+            else:
+                delay = self.backoff * 2 ** (self._consecutive_throttles - 1)
+                delay = min(self.max_backoff, delay) * random.uniform(0.5, 1.5)
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            # Start again from empty buckets rather than with a burst
+            for bucket, _ in self._needs(0, 0):
+                bucket.tokens = min(bucket.tokens, 0.0)
+        metrics.inc("rate_limit_throttled_total", provider=self.name)
+        return delay
+
+    def succeeded(self) -> None:
+        self._consecutive_throttles = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lanes = [LANE_NAMES.get(t[0], "other") for t in self._waiting]
+            return {
+                "rpm": self.requests.rate * 60 if self.requests else None,
+                "tpm": self.tokens.rate * 60 if self.tokens else None,
+                "waiting": {name: lanes.count(name) for name in LANE_NAMES.values()},
+                "paused_for": max(0.0, self._paused_until - time.monotonic()),
+                "throttles": self.throttles,
+                "waited_seconds": self.waited,
+            }
+
+
+class RateLimiter:
+    """
+    The `ProviderLimit` for each provider, and calls that wait for them and retry on 429s.
+
+    A provider without a configured limit gets an unlimited one on first use.
+    A call is tried up to `retries + 1` times: after a 429, once the provider's
+    pause is over; after another transient error, `backoff * 2**n` seconds
+    later (with jitter).
+    """
+
+    def __init__(self, retries: int = 4, backoff: float = 0.5):
+        self.retries = retries
+        self.backoff = backoff
+        self._providers: Dict[str, ProviderLimit] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, providers: Iterable[str] = ("anthropic", "cohere", "weaviate")) -> "RateLimiter":
+        """Limits from <PROVIDER>_RPM and <PROVIDER>_TPM, e.g. ANTHROPIC_RPM=50."""
+        limiter = cls()
+        for name in providers:
+            rpm = os.getenv(f"{name.upper()}_RPM")
+            tpm = os.getenv(f"{name.upper()}_TPM")
+            if rpm or tpm:
+                limiter.configure(name, rpm=float(rpm) if rpm else None, tpm=float(tpm) if tpm else None)
+        return limiter
+
+    def configure(self, name: str, **limits: Any) -> ProviderLimit:
+        """Replace the limits for provider `name` (see `ProviderLimit` for the options)."""
+        with self._lock:
+            self._providers[name] = ProviderLimit(name, **limits)
+            return self._providers[name]
+
+    def provider(self, name: str) -> ProviderLimit:
+        with self._lock:
+            if name not in self._providers:
+                self._providers[name] = ProviderLimit(name)
+            return self._providers[name]
+
+    def _retry_delay(self, names: tuple[str, ...], error: BaseException, attempt: int) -> Optional[float]:
+        """How long to wait before retrying a call that raised `error`, or None to give up."""
+        if attempt == self.retries:
+            return None
+        if is_throttled(error):
+            # The error rarely says which provider behind a call it came from, so all of them pause;
+            # the next attempt waits for the pause when it acquires
+            for name in names:
+                self.provider(name).throttled(error)
+            return 0.0
+        if is_transient(error):
+            return self.backoff * 2**attempt * random.uniform(0.5, 1.5)
+        return None
+
+    async def call_async(self, names: tuple[str, ...], call: Callable[[], Awaitable[T]], tokens: float = 0) -> T:
+        """Await `call()` once every provider in `names` has capacity; retry it after 429s and transient errors."""
+        for attempt in range(self.retries + 1):
+            for name in names:
+                await self.provider(name).acquire(tokens)
+            try:
+                result = await call()
+            except Exception as e:
+                delay = self._retry_delay(names, e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            for name in names:
+                self.provider(name).succeeded()
+            return result
+        raise AssertionError("unreachable")
+
+    def call(self, names: tuple[str, ...], call: Callable[[], T], tokens: float = 0) -> T:
+        """`call_async`, for synchronous code."""
+        for attempt in range(self.retries + 1):
+            for name in names:
+                self.provider(name).acquire_blocking(tokens)
+            try:
+                result = call()
+            except Exception as e:
+                delay = self._retry_delay(names, e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            for name in names:
+                self.provider(name).succeeded()
+            return result
+        raise AssertionError("unreachable")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            providers = dict(self._providers)
+        return {name: limit.stats() for name, limit in providers.items()}
+
+
+# Shared by the model, the Weaviate tools and the Cohere embedder
+limiter = RateLimiter.from_env()
+
+
+class RateLimitedModel(WrapperModel):
+    """
+    A model whose requests each wait for the limits of its provider, and are
+    retried after 429s and transient errors. Input tokens are estimated up
+    front and corrected with the usage reported by the response.
+
+    The wrapped model's SDK client (Anthropic, OpenAI, ...) is switched to no
+    retries of its own before the first request, so the limiter's are the only ones.
+    """
+
+    def __init__(
+        self, wrapped: Any, rate_limiter: Optional[RateLimiter] = None, provider: Optional[str] = None
+    ):
+        super().__init__(wrapped)
+        self.limiter = rate_limiter if rate_limiter is not None else limiter
+        self.provider_name = provider or self.wrapped.system
+        self._sdk_retries_off = False
+
+    def _switch_off_sdk_retries(self) -> None:
+        # Not in __init__: that would build a model built lazily (see prompt_cache.LazyModel)
+        if self._sdk_retries_off:
+            return
+        self._sdk_retries_off = True
+        client = getattr(self.wrapped, "client", None)
+        if hasattr(client, "with_options"):
+            self.wrapped.client = client.with_options(max_retries=0)
+
+    async def request(self, messages, *args: Any, **kwargs: Any):
+        self._switch_off_sdk_retries()
+        estimate = estimate_message_tokens(messages)
+        response = await self.limiter.call_async(
+            (self.provider_name,), lambda: self.wrapped.request(messages, *args, **kwargs), estimate
+        )
+        self.limiter.provider(self.provider_name).settle(estimate, response.usage.total_tokens)
+        return response
+
+    @contextlib.asynccontextmanager
+    async def request_stream(self, messages, *args: Any, **kwargs: Any):
+        self._switch_off_sdk_retries()
+        estimate = estimate_message_tokens(messages)
+        async with contextlib.AsyncExitStack() as stack:
+            # A 429 comes back when the stream is opened, so only opening it is retried
+            stream = await self.limiter.call_async(
+                (self.provider_name,),
+                lambda: stack.enter_async_context(self.wrapped.request_stream(messages, *args, **kwargs)),
+                estimate,
+            )
+            yield stream
+        self.limiter.provider(self.provider_name).settle(estimate, stream.usage().total_tokens)
+
+
+def rate_limited(model: Any, rate_limiter: Optional[RateLimiter] = None) -> Model:
+    """`model` (a Model or a name like "anthropic:...") behind `rate_limiter`; unchanged if it already is."""
+    if isinstance(model, RateLimitedModel):
+        return model
+    return RateLimitedModel(model, rate_limiter)
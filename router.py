@@ -0,0 +1,284 @@
+"""
+Route each chatbot turn before it reaches the agent.
+
+Some turns don't need the model at all: "hi", "thanks", or "What's the
+weather?", which the system prompt only has the model refuse, at the cost of a
+full round trip. And doc questions almost always start with the same search.
+
+`TurnRouter` scores a message locally, with no network call: its hashed n-gram
+embedding (see search_cache.py) is compared with every example message and
+every route's centroid in a single NumPy matrix-vector product, and checked
+against a list of Weaviate terms. Then:
+
+- "greeting", "thanks", "goodbye", "off_topic": answered with a canned reply.
+- "docs": the doc search runs first, and its results go into the first model
+  request, so the model can fetch pages or answer straight away. Not on a
+  follow-up turn: "and for tenants?" means something only with the history,
+  so searching for the message alone would mostly find the wrong pages.
+- "agent": anything else runs as usual.
+
+Canned replies are only used for short messages that score clearly on one
+route and contain no Weaviate term. When in doubt, the full agent runs.
+"""
+
+import json
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+import numpy as np
+from pydantic_ai.messages import ModelMessage
+
+from search_cache import ngram_embedding, normalize_query
+from telemetry import metrics
+
+log = logging.getLogger(__name__)
+
+ROUTE_EXAMPLES: Dict[str, list[str]] = {
+    "greeting": [
+        "hi", "hello", "hey", "hey there", "hi there", "hello there", "good morning",
+        "good afternoon", "good evening", "how are you", "hello how are you", "hiya",
+    ],
+    "thanks": [
+        "thanks", "thank you", "thanks a lot", "thank you so much", "many thanks", "ok thanks",
+        "great thanks", "cheers", "thx", "perfect thank you",
+    ],
+    "goodbye": ["bye", "goodbye", "bye bye", "see you", "see you later", "have a nice day", "good night"],
+    "off_topic": [
+        "what's the weather", "what is the weather like today", "will it rain tomorrow",
+        "tell me a joke", "what's the news today", "who won the football match",
+        "give me a recipe for pancakes", "what is the capital of france", "write me a poem",
+        "what time is it", "what is the stock price of apple", "how tall is mount everest",
+        "recommend a movie", "what should i eat for dinner", "what country is this city in",
+    ],
+    "docs": [
+        "how do collection aliases work", "how do i create a collection",
+        "how to configure product quantization", "hybrid search with bm25 and vectors",
+        "how do i back up weaviate", "connect to weaviate cloud with an api key",
+        "multi tenancy and tenants", "batch import objects", "hnsw vector index settings",
+        "set the replication factor", "which distance metric should i use",
+        "filter objects by property", "near text query example", "generative search and rag",
+        "named vectors", "configure the vectorizer module",
+    ],
+}
+
+# Any of these in a message, singular or plural (see `singular_forms`), rules
+# out a canned reply and makes it a doc question
+DOC_TERMS = frozenset(
+    """
+    weaviate collection alias schema vector vectorizer vectorize embedding hnsw flat dynamic
+    quantization quantize quantized pq bq sq rq bm25 hybrid neartext nearvector near_text
+    near_vector tenant multitenancy replication shard sharding backup batch import filter
+    property reference crossref generative rag rerank reranker module cluster node index
+    indices indexing grpc graphql uuid object wcd rbac database client python typescript
+    docker kubernetes helm cloud sandbox pricing
+    """.split()
+)
+
+CANNED_REPLIES = {
+    "greeting": "Hi! I'm the Weaviate support assistant. What would you like to know about Weaviate?",
+    "thanks": "You're welcome! Let me know if you have any other Weaviate questions.",
+    "goodbye": "Goodbye, and good luck with your Weaviate project!",
+    "off_topic": (
+        "I'm a Weaviate support assistant, so I can only help with Weaviate questions. "
+        "Is there anything about Weaviate I can help you with?"
+    ),
+}
+
+SEARCH_CONTEXT = (
+    "Documentation search results for this question (tool_search_weaviate_docs has already been "
+    "run with the question as the query; search again only if these don't fit):\n{results}"
+)
+
+
+def singular_forms(word: str) -> list[str]:
+    """`word` and the singulars it may be a plural of: "properties" -> "property", "aliases" -> "alias"."""
+    forms = [word]
+    if word.endswith("ies"):
+        forms.append(word[:-3] + "y")
+    if word.endswith("es"):
+        forms.append(word[:-2])
+    if word.endswith("s"):
+        forms.append(word[:-1])
+    return forms
+
+
+@dataclass
+class RouteDecision:
+    route: str
+    scores: Dict[str, float]
+    doc_terms: list[str]
+    seconds: float
+
+    @property
+    def reply(self) -> Optional[str]:
+        """The canned reply for this route, if it has one."""
+        return CANNED_REPLIES.get(self.route)
+
+
+class TurnRouter:
+    """
+    Local classifier for incoming messages; see the module docstring for the routes.
+
+    A route's score is the mean of the message's cosine similarity to the
+    route's centroid and to its closest example. A message gets a canned reply
+    when it has at most `max_canned_words` words, its best route scores at
+    least `canned_threshold` and beats every other route by `margin`. It is a
+    doc question if it contains a Weaviate term, or if "docs" scores at least
+    `docs_threshold` with the same margin.
+
+    The time saved is reported against the mean model request time recorded
+    by telemetry.py, or `model_request_seconds` until there is one.
+    """
+
+    def __init__(
+        self,
+        examples: Dict[str, list[str]] = ROUTE_EXAMPLES,
+        doc_terms: frozenset = DOC_TERMS,
+        canned_threshold: float = 0.55,
+        docs_threshold: float = 0.45,
+        margin: float = 0.15,
+        max_canned_words: int = 8,
+        model_request_seconds: float = 1.5,
+        embed: Callable[[str], np.ndarray] = ngram_embedding,
+    ):
+        self.labels = list(examples)
+        self.doc_terms = doc_terms
+        self.canned_threshold = canned_threshold
+        self.docs_threshold = docs_threshold
+        self.margin = margin
+        self.max_canned_words = max_canned_words
+        self.model_request_seconds = model_request_seconds
+        self._embed = embed
+        vectors = [np.stack([embed(normalize_query(e)) for e in examples[label]]) for label in self.labels]
+        centroids = np.stack([v.mean(axis=0) for v in vectors])
+        centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+        # Examples first, grouped by route, then one centroid per route
+        self._matrix = np.concatenate(vectors + [centroids])
+        self._starts = np.cumsum([0] + [len(v) for v in vectors[:-1]])
+        self._n_examples = sum(len(v) for v in vectors)
+        self.routes: Counter = Counter()
+        self.saved_seconds = 0.0
+
+    def route(self, message: str) -> RouteDecision:
+        start = time.perf_counter()
+        text = normalize_query(message)
+        words = text.split()
+        terms = [w for w in words if any(form in self.doc_terms for form in singular_forms(w))]
+        similarities = self._matrix @ self._embed(text)
+        nearest = np.maximum.reduceat(similarities[: self._n_examples], self._starts)
+        scores = (nearest + similarities[self._n_examples :]) / 2
+        order = np.argsort(scores)[::-1]
+        best, best_score = self.labels[order[0]], float(scores[order[0]])
+        runner_up = float(scores[order[1]]) if len(order) > 1 else 0.0
+
+        if terms:
+            route = "docs"
+        elif best == "docs" and best_score >= self.docs_threshold and best_score - runner_up >= self.margin:
+            route = "docs"
+        elif (
+            best in CANNED_REPLIES
+            and len(words) <= self.max_canned_words
+            and best_score >= self.canned_threshold
+            and best_score - runner_up >= self.margin
+        ):
+            route = best
+        else:
+            route = "agent"
+        self.routes[route] += 1
+        metrics.inc("router_turns_total", route=route)
+        return RouteDecision(
+            route,
+            {label: round(float(s), 3) for label, s in zip(self.labels, scores)},
+            terms,
+            time.perf_counter() - start,
+        )
+
+    def request_seconds(self) -> float:
+        """Estimated time of one model request."""
+        mean = metrics.mean("model_request_duration_seconds")
+        return mean if mean is not None else self.model_request_seconds
+
+    def record_saved(self, decision: RouteDecision, seconds: float) -> None:
+        self.saved_seconds += max(seconds, 0.0)
+        metrics.inc("router_saved_seconds_total", max(seconds, 0.0), route=decision.route)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"routes": dict(self.routes), "saved_seconds": round(self.saved_seconds, 3)}
+
+
+@dataclass
+class PreparedTurn:
+    """
+    What to do with a message: reply with `reply`, or run the agent on `prompt`.
+
+    With a reply, `messages` (if any) go into the conversation memory in place of a run's.
+    """
+
+    decision: Optional[RouteDecision]
+    prompt: Union[str, list[str]]
+    reply: Optional[str] = None
+    search_results: Optional[list[Dict[str, Any]]] = None
+    messages: list[ModelMessage] = field(default_factory=list)
+
+
+async def prepare_turn(
+    router: TurnRouter,
+    message: str,
+    search: Callable[[str], Awaitable[list[Dict[str, Any]]]],
+    follow_up: bool = False,
+) -> PreparedTurn:
+    """
+    Route `message` and, for a doc question, run `search` for it up front.
+
+    The search results are added to the prompt as a second part; the question
+    itself stays the first part. If the search fails, or the message is a
+    `follow_up` in a conversation, the agent runs on the message as usual.
+    """
+    decision = router.route(message)
+    request_seconds = router.request_seconds()
+    if decision.reply is not None:
+        router.record_saved(decision, request_seconds)
+        log.info(
+            "Routed to %s in %.2fms (scores %s): canned reply, ~%.2fs model request saved",
+            decision.route,
+            decision.seconds * 1000,
+            decision.scores,
+            request_seconds,
+        )
+        return PreparedTurn(decision, message, reply=decision.reply)
+
+    if decision.route != "docs":
+        log.info("Routed to agent in %.2fms (scores %s)", decision.seconds * 1000, decision.scores)
+        return PreparedTurn(decision, message)
+    if follow_up:
+        # The message may only make sense with the history; let the model write the query
+        log.info(
+            "Routed to docs in %.2fms (terms %s): follow-up, no search up front",
+            decision.seconds * 1000,
+            decision.doc_terms,
+        )
+        return PreparedTurn(decision, message)
+
+    start = time.perf_counter()
+    try:
+        results = await search(message)
+    except Exception:
+        log.warning("Pre-run doc search failed; running the agent without it", exc_info=True)
+        return PreparedTurn(decision, message)
+    search_seconds = time.perf_counter() - start
+    # The model would otherwise spend its first request deciding to make this search
+    router.record_saved(decision, request_seconds - search_seconds)
+    log.info(
+        "Routed to docs in %.2fms (terms %s, scores %s): pre-ran search in %.2fs, "
+        "~%.2fs model request saved",
+        decision.seconds * 1000,
+        decision.doc_terms,
+        decision.scores,
+        search_seconds,
+        request_seconds - search_seconds,
+    )
+    prompt = [message, SEARCH_CONTEXT.format(results=json.dumps(results, indent=1))]
+    return PreparedTurn(decision, prompt, search_results=results)
@@ -0,0 +1,222 @@
+"""
+Result cache for `search_weaviate_docs`, keyed on query similarity.
+
+Users ask the same things in slightly different words. An exact match on the
+normalised query is served straight from a dict; otherwise the query is
+embedded locally and compared against the cached query vectors in one NumPy
+matrix-vector product. The local embedding measures shared words and
+spelling, not meaning, so queries that look alike can ask different things
+("enable async replication" / "disable async replication"). A similar query
+therefore only matches if every word that differs is a filler word ("please",
+"the", "does", ...).
+"""
+
+import hashlib
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+NGRAM_DIM = 1024
+
+# Words that don't change what a question asks; a reworded query may differ only in these
+FILLER_WORDS = frozenset(
+    """
+    a an the is are do does did can could would should i we you my our me us please pls
+    thanks thank hi hello hey ok so just exactly again actually really
+    """.split()
+)
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return _SPACE_RE.sub(" ", _PUNCTUATION_RE.sub(" ", query.lower())).strip()
+
+
+def ngram_embedding(text: str, dim: int = NGRAM_DIM) -> np.ndarray:
+    """
+    Cheap local embedding: hashed word and character-trigram counts, unit length.
+
+    Good at recognising rewordings of the same question, with no network call,
+    but it scores spelling overlap, not meaning: see `same_question`.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    words = text.split()
+    grams = words + [w[i : i + 3] for w in words for i in range(max(1, len(w) - 2))]
+    for gram in grams:
+        vector[int(hashlib.blake2b(gram.encode(), digest_size=4).hexdigest(), 16) % dim] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def same_question(query: str, other: str) -> bool:
+    """Whether normalised queries `query` and `other` differ in filler words only."""
+    return set(query.split()) ^ set(other.split()) <= FILLER_WORDS
+
+
+class QueryIndex:
+    """
+    Fixed-capacity slots of normalised queries with their vectors and values.
+
+    `find` returns the slot of the same query, else of the most similar one
+    whose cosine similarity is at least `threshold` (no similarity lookup when
+    above 1) and that passes `same_question`. Entries older than `ttl` seconds
+    are skipped. When full, `insert` evicts the entry stored first
+    (`eviction="fifo"`) or used least recently (`eviction="lru"`). Times are
+    whatever clock the caller passes in. Not thread-safe: callers hold their lock.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        threshold: float,
+        ttl: float,
+        eviction: str = "lru",
+        embed: Callable[[str], np.ndarray] = ngram_embedding,
+    ):
+        if eviction not in ("fifo", "lru"):
+            raise ValueError(f"Unknown eviction policy: {eviction!r}")
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self.eviction = eviction
+        self._embed = embed
+        self._vectors: Optional[np.ndarray] = None
+        self._stored_at = np.full(capacity, -np.inf)
+        self._last_used = np.full(capacity, -np.inf)
+        self.keys: list[Optional[str]] = [None] * capacity
+        self.values: list[Any] = [None] * capacity
+        self.slots: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def find(self, key: str, now: float) -> tuple[Optional[int], float]:
+        """The slot matching normalised query `key` and its similarity, or (None, 0.0)."""
+        slot = self.slots.get(key)
+        if slot is not None and now - self._stored_at[slot] <= self.ttl:
+            return slot, 1.0
+        if self._vectors is None or self.threshold > 1.0:
+            return None, 0.0
+        similarities = self._vectors @ self._embed(key)
+        similarities[now - self._stored_at > self.ttl] = -np.inf
+        # Best candidates first; most are rejected on similarity alone
+        for slot in np.argsort(similarities)[::-1][:8]:
+            if similarities[slot] < self.threshold:
+                break
+            if same_question(key, self.keys[slot]):
+                return int(slot), float(similarities[slot])
+        return None, 0.0
+
+    def touch(self, slot: int, now: float) -> None:
+        self._last_used[slot] = now
+
+    def insert(self, key: str, value: Any, stored_at: float, now: float) -> list[str]:
+        """Store `value` under normalised query `key`. Return the keys evicted to make room."""
+        vector = self._embed(key)
+        if self._vectors is None:
+            self._vectors = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+        evicted: list[str] = []
+        slot = self.slots.get(key)
+        if slot is None and len(self.slots) < self.capacity:
+            slot = self.keys.index(None)
+        elif slot is None:
+            slot = int(np.argmin(self._stored_at if self.eviction == "fifo" else self._last_used))
+            evicted = self.remove([slot])
+        self._vectors[slot] = vector
+        self._stored_at[slot] = stored_at
+        self._last_used[slot] = now
+        self.keys[slot] = key
+        self.values[slot] = value
+        self.slots[key] = slot
+        return evicted
+
+    def remove(self, slots: list[int]) -> list[str]:
+        """Empty `slots`; return their keys."""
+        keys = [self.keys[slot] for slot in slots]
+        for slot, key in zip(slots, keys):
+            del self.slots[key]
+            self._stored_at[slot] = -np.inf
+            self._last_used[slot] = -np.inf
+            self.keys[slot] = None
+            self.values[slot] = None
+        return keys
+
+    def clear(self) -> None:
+        self._vectors = None
+        self._stored_at[:] = -np.inf
+        self._last_used[:] = -np.inf
+        self.keys = [None] * self.capacity
+        self.values = [None] * self.capacity
+        self.slots.clear()
+
+
+class SearchCache:
+    """
+    Two-level cache of search results.
+
+    - Exact: the normalised query string.
+    - Semantic: the most similar cached query with cosine similarity >= `threshold`
+      that differs only in filler words.
+
+    At most `capacity` queries are kept. When full, `eviction="fifo"` overwrites
+    the oldest entry and `eviction="lru"` the least recently used one.
+    Entries older than `ttl` seconds are ignored.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 256,
+        threshold: float = 0.9,
+        ttl: float = 60 * 60,
+        eviction: str = "fifo",
+        embed: Callable[[str], np.ndarray] = ngram_embedding,
+    ):
+        self._index = QueryIndex(capacity, threshold, ttl, eviction, embed)
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, query: str) -> Optional[Any]:
+        key = normalize_query(query)
+        now = time.monotonic()
+        with self._lock:
+            slot, similarity = self._index.find(key, now)
+            if slot is None:
+                self.misses += 1
+                return None
+            if similarity >= 1.0:
+                self.exact_hits += 1
+            else:
+                self.semantic_hits += 1
+            self._index.touch(slot, now)
+            return self._index.values[slot]
+
+    def put(self, query: str, results: Any) -> None:
+        key = normalize_query(query)
+        now = time.monotonic()
+        with self._lock:
+            self.evictions += len(self._index.insert(key, results, now, now))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._index.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._index),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            }
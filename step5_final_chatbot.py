@@ -8,19 +8,114 @@
 # - Real Weaviate integration (Step 4)
 # Plus: Smart escalation to human support when needed!
 
-from pydantic_ai import Agent, RunContext
-from tools import search_weaviate_docs, fetch_weaviate_docs_page
-from typing import Literal
-from random import randint
+from dataclasses import dataclass, field
+from pydantic_ai import Agent, ModelRetry, RunContext
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    SystemPromptPart,
+    TextPart,
+    ToolCallPart,
+    UserPromptPart,
+)
+from answer_cache import AnswerCache, AnswerStore, cited_paths
+from cassette import Cassette, use_cassette
+from chat_memory import ConversationMemory, outline_turns
+from compression import DocCompressor
+from escalation import EscalationQueue, LocalTicketBackend
+from page_sections import SectionNotFoundError
+from prompt_cache import anthropic_model
+from rate_limit import rate_limited
+from router import PreparedTurn, RouteDecision, TurnRouter, prepare_turn
+from search_cache import normalize_query
+from streaming import stream_turn
+from telemetry import metrics as telemetry_metrics, setup_telemetry, traced_tool
+from tool_memo import ToolMemo, memoized_tool
+from tools import (
+    PageNotFoundError,
+    path_index,
+    search_weaviate_docs_async,
+    search_weaviate_docs_multi_async,
+    fetch_resolved_doc_page_async,
+    fetch_weaviate_docs_pages_async,
+    fetch_weaviate_docs_page_section_async,
+    fetch_weaviate_docs_referenced_files_async,
+    resolve_doc_path_async,
+)
+from typing import Any, Dict, Literal, Optional
+import argparse
+import asyncio
+import contextlib
+import functools
+import logging
+import os
+import time
+import uuid
 import dotenv
 
 dotenv.load_dotenv(override=True)
 
-# Create our support agent - same pattern as Steps 2-3, but now with 3 tools
+# Tool activity is logged, not printed: run with --verbose to see it
+log = logging.getLogger("chatbot")
+
+
+@dataclass
+class ChatDeps:
+    """
+    Per-run state for the tools. Pass a new one to every run.
+
+    `session_id` identifies the conversation (keep it across its turns), so
+    that a repeated escalation isn't filed twice.
+
+    `memo` remembers this run's doc tool calls, so a repeated search or fetch
+    returns a short pointer to the earlier result instead of running again.
+
+    `page_budget_tokens` caps each fetched page at the passages most relevant
+    to the question; raise it for longer answers.
+    """
+
+    session_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    memo: ToolMemo = field(default_factory=ToolMemo)
+    page_budget_tokens: int = 1500
+
+
+# Create our support agent - same pattern as Steps 2-3, but now with more tools.
+# Its model requests wait for the process-wide Anthropic limits and are retried
+# after 429s (set ANTHROPIC_RPM / ANTHROPIC_TPM, see rate_limit.py). The tools,
+# system prompt and history are marked for Anthropic's prompt cache (see prompt_cache.py)
 chatbot_agent = Agent(
-    model="anthropic:claude-3-5-haiku-latest",
+    model=rate_limited(anthropic_model("claude-3-5-haiku-latest")),
+    deps_type=ChatDeps,
+)
+
+# Greetings and off-topic questions are answered without the model, and doc
+# questions get their first search run before the model is asked (see router.py)
+router = TurnRouter()
+
+
+# Answers to standalone doc questions are reused for the same question until a
+# page they cite changes: its last update time in DocCatalog, from the path
+# index, is checked on every hit (see answer_cache.py). Set ANSWER_CACHE_DB to keep them on disk.
+answer_cache = AnswerCache(
+    store=AnswerStore(os.getenv("ANSWER_CACHE_DB")) if os.getenv("ANSWER_CACHE_DB") else None,
+    fingerprint=path_index.version,
 )
 
+# Escalations are queued on disk and filed by a background worker, so the tool
+# returns a ticket ID at once (see escalation.py). Swap LocalTicketBackend for
+# your ticketing system (Zendesk, Jira, GitHub Issues, Linear, ...).
+escalations = EscalationQueue(
+    os.getenv("ESCALATION_QUEUE_DB", ".cache/escalations.sqlite"),
+    submit=LocalTicketBackend().submit,
+)
+
+# Fetched pages are trimmed to the passages most relevant to the question
+# before they go into the model's context, within each run's
+# `ChatDeps.page_budget_tokens`. Tokens before and after are counted in the
+# `doc_tokens_total` metric.
+doc_compressor = DocCompressor()
+
 
 @chatbot_agent.system_prompt
 def set_system_prompt() -> str:
@@ -52,33 +147,160 @@ def set_system_prompt() -> str:
     """
 
 
+def retry_with_suggestions(func):
+    """
+    Hand a wrong page path back to the model, with the closest valid paths, or
+    a wrong section number, with the page's section count, instead of failing the run.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await func(*args, **kwargs)
+        except (PageNotFoundError, SectionNotFoundError) as error:
+            raise ModelRetry(str(error)) from error
+
+    return wrapper
+
+
 # Tool 1: Search for relevant documentation
 # Same as Step 4, but now part of a larger system
+# The doc tools are `async def`: when the model asks for several tools in one
+# response, Pydantic AI runs them concurrently on the event loop
 @chatbot_agent.tool
-def tool_search_weaviate_docs(ctx: RunContext[None], query: str) -> str:
+@traced_tool
+@memoized_tool(key=lambda query: normalize_query(query))
+async def tool_search_weaviate_docs(ctx: RunContext[ChatDeps], query: str) -> str:
     """
     Search Weaviate docs based on semantic similarity to the query.
 
     Returns a list of relevant document paths and summaries.
     Use this first to find potentially relevant documentation.
+    To try several phrasings, use tool_search_weaviate_docs_multi instead of calling this repeatedly.
+    """
+    log.info(">> TOOL USED: Searching Weaviate docs. Query: '%s'", query)
+    response = await search_weaviate_docs_async(query)
+    return response
+
+
+# Tool 1b: Search for several phrasings at once
+# One tool call instead of a model round trip per rephrased search
+@chatbot_agent.tool
+@traced_tool
+@memoized_tool(key=lambda queries: tuple(sorted({normalize_query(q) for q in queries})))
+async def tool_search_weaviate_docs_multi(ctx: RunContext[ChatDeps], queries: list[str]) -> str:
+    """
+    Search Weaviate docs for several phrasings of the question at once (e.g. 2-4 rephrasings or synonyms).
+
+    Each query is searched by meaning and by keywords, all at the same time, and
+    the results are merged into one ranked list of document paths and summaries.
+    Prefer this over several tool_search_weaviate_docs calls.
     """
-    print(f">> TOOL USED: Searching Weaviate docs. Query: '{query}'")
-    response = search_weaviate_docs(query)
+    log.info(">> TOOL USED: Searching Weaviate docs for %d queries: %s", len(queries), queries)
+    response = await search_weaviate_docs_multi_async(queries)
     return response
 
 
 # Tool 2: Fetch full document content
 # The agent often chains these: search → fetch → answer
 @chatbot_agent.tool
-def tool_fetch_weaviate_docs_page(ctx: RunContext[None], path: str) -> str:
+@traced_tool
+@retry_with_suggestions
+@memoized_tool()
+async def tool_fetch_weaviate_docs_page(
+    ctx: RunContext[ChatDeps], path: str, query: Optional[str] = None
+) -> Dict[str, Any]:
     """
-    Fetch the full content of a specific Weaviate documentation page.
+    Fetch the relevant content of a specific Weaviate documentation page.
 
-    Returns the complete document content including referenced files.
+    Returns "path" (the page fetched) and "content": the passages of the page (including
+    referenced files) most relevant to `query`, or to the user's question if no query is
+    given. Skipped text is shown as [...]. If no page has the given path but one clearly
+    matches, that page is fetched and "corrected_from" holds the path given.
     Use this after searching to get detailed information.
+    For the complete text of a long page, use tool_fetch_weaviate_docs_page_section.
     """
-    print(f">> TOOL USED: Fetching Weaviate docs page. Path: '{path}'")
-    response = fetch_weaviate_docs_page(path)
+    log.info(">> TOOL USED: Fetching Weaviate docs page. Path: '%s'", path)
+    fetched = await resolve_doc_path_async(path)
+    response = await fetch_resolved_doc_page_async(fetched)
+    result = doc_compressor.compress(
+        response, query or user_question(ctx) or fetched, page_budget(ctx)
+    )
+    log.info(
+        "   Compressed %d -> %d tokens (%d/%d passages)",
+        result.original_tokens,
+        result.compressed_tokens,
+        result.passages_kept,
+        result.passages_total,
+    )
+    page = {"path": fetched, "content": result.text}
+    if fetched != path:
+        page["corrected_from"] = path
+    return page
+
+
+# Tool 2b: Fetch several pages at once
+# One round trip to Weaviate instead of one per page
+@chatbot_agent.tool
+@traced_tool
+@memoized_tool()
+async def tool_fetch_weaviate_docs_pages(
+    ctx: RunContext[ChatDeps], paths: list[str]
+) -> Dict[str, Any]:
+    """
+    Fetch the relevant content of several Weaviate documentation pages at once.
+
+    Returns "pages" (path -> passages relevant to the user's question) and "not_found" (paths that don't exist).
+    Prefer this over repeated single-page fetches when several search results look relevant.
+    """
+    log.info(">> TOOL USED: Fetching %d Weaviate docs pages. Paths: %s", len(paths), paths)
+    response = await fetch_weaviate_docs_pages_async(paths)
+    for path, page in response["pages"].items():
+        response["pages"][path] = doc_compressor.compress(
+            page, user_question(ctx) or path, page_budget(ctx)
+        ).text
+    return response
+
+
+# Tool 2c: Fetch one section of a page
+# Long pages are tens of kilobytes - sending only the relevant part saves tokens and time
+@chatbot_agent.tool
+@traced_tool
+@retry_with_suggestions
+@memoized_tool()
+async def tool_fetch_weaviate_docs_page_section(
+    ctx: RunContext[ChatDeps], path: str, section: Optional[int] = None, offset: int = 0
+) -> Dict[str, Any]:
+    """
+    Fetch part of a Weaviate documentation page.
+
+    Returns the page's table of contents plus up to 4000 characters of text:
+    from the given section number, or from the start of the page if no section is given.
+    To keep reading, call again with offset set to the returned next_offset.
+    Referenced files are not included; use tool_fetch_weaviate_docs_referenced_files for those.
+    """
+    log.info(
+        ">> TOOL USED: Fetching Weaviate docs page section. Path: '%s', section: %s, offset: %d",
+        path,
+        section,
+        offset,
+    )
+    response = await fetch_weaviate_docs_page_section_async(path, section, offset)
+    return response
+
+
+@chatbot_agent.tool
+@traced_tool
+@retry_with_suggestions
+@memoized_tool()
+async def tool_fetch_weaviate_docs_referenced_files(
+    ctx: RunContext[ChatDeps], path: str
+) -> list[Any]:
+    """
+    Fetch the files referenced by a Weaviate documentation page, such as code examples.
+    """
+    log.info(">> TOOL USED: Fetching referenced files. Path: '%s'", path)
+    response = await fetch_weaviate_docs_referenced_files_async(path)
     return response
 
 
@@ -86,8 +308,9 @@ def tool_fetch_weaviate_docs_page(ctx: RunContext[None], path: str) -> str:
 # NEW! This is the production pattern: agents should know when they need help
 # Notice the detailed docstring - this guides the agent's decision-making
 @chatbot_agent.tool
+@traced_tool
 def contact_human_support(
-    ctx: RunContext[None],
+    ctx: RunContext[ChatDeps],
     title: str,
     description: str,
     issue_type: str,
@@ -107,56 +330,250 @@ def contact_human_support(
     - User needs feature that doesn't exist
     - For non-technical issues
 
-    Then, tell the user that you have escalated the issue to human support. Give them the issue number.
+    Then, tell the user that you have escalated the issue to human support. Give them the ticket ID.
     """
-    print(f">> TOOL USED: Contacting human support")
-    print(f"   To department: {department}")
-    print(f"   Title: {title}")
-    print(f"   Type: {issue_type}")
-    print(f"   Description: {description[:100]}...")
-
-    # Production note: Replace this with actual ticketing system integration
-    # Could be: Zendesk, Jira, GitHub Issues, Linear, etc.
-    issue_number = randint(10000, 99999)
-    return f"Successfully filed GitHub issue #{issue_number}: '{title}' (type: {issue_type})"
+    log.info(">> TOOL USED: Contacting human support")
+    log.info("   To department: %s", department)
+    log.info("   Title: %s", title)
+    log.info("   Type: %s", issue_type)
+    log.info("   Description: %s...", description[:100])
 
+    # Queued, not filed yet: the ticketing call happens in the background
+    ticket = escalations.enqueue(ctx.deps.session_id, title, description, issue_type, department)
+    if ticket.duplicate:
+        return f"Already escalated earlier in this conversation as ticket {ticket.id}: '{ticket.title}'"
+    return f"Escalated to human support as ticket {ticket.id}: '{title}' (type: {issue_type})"
 
-# ============================================================================
-# Interactive Chat Loop
-# ============================================================================
-# This is a simple REPL (Read-Eval-Print Loop) for the chatbot
-# In production, this would be replaced by a web interface, Slack bot, etc.
 
-print("=" * 80)
-print("WEAVIATE SUPPORT CHATBOT")
-print("=" * 80)
-print("Ask questions about Weaviate! (Type 'quit' or 'exit' to stop)")
-print("=" * 80)
-print()
+def page_budget(ctx: RunContext[ChatDeps]) -> Optional[int]:
+    """The run's page budget; None (the compressor's default) for a run without `ChatDeps`."""
+    return getattr(ctx.deps, "page_budget_tokens", None)
 
-# Demo tip: Try these questions to showcase different behaviors:
-# 1. "How do collection aliases work?" → Uses search + fetch tools
-# 2. "I'm getting a 404 error" → May escalate to human support
-# 3. "What's the weather?" → Should refuse (out of scope)
 
-while True:
-    user_input = input("\nYou: ").strip()
+def user_question(ctx: RunContext[ChatDeps]) -> str:
+    """The user's question, without the search results the router may have added to the prompt."""
+    if ctx.prompt is None or isinstance(ctx.prompt, str):
+        return ctx.prompt or ""
+    return next((part for part in ctx.prompt if isinstance(part, str)), "")
 
-    # Exit conditions
-    if user_input.lower() in ["quit", "exit", "q"]:
-        print("\nGoodbye! 👋")
-        break
 
-    # Skip empty inputs
-    if not user_input:
-        continue
+async def route_turn(
+    message: str, deps: ChatDeps, history: Optional[list[ModelMessage]] = None
+) -> PreparedTurn:
+    """
+    Answer `message` from the answer cache if it opens a conversation, else
+    route it (see router.py). A search run up front is recorded in the run's
+    memo, so the model repeating it gets a pointer to the results instead.
+    Follow-ups (turns with `history`) get no search up front.
+    """
+    if not history:
+        start = time.perf_counter()
+        cached = answer_cache.get(message)
+        if cached is not None:
+            decision = RouteDecision(
+                "cached", {"similarity": round(cached.similarity, 3)}, [], time.perf_counter() - start
+            )
+            saved = telemetry_metrics.mean("agent_run_duration_seconds")
+            log.info(
+                "Answered from the answer cache in %.2fms (similarity %.3f, cites %s)%s",
+                decision.seconds * 1000,
+                cached.similarity,
+                cached.paths,
+                f", ~{saved:.2f}s agent run saved" if saved else "",
+            )
+            return PreparedTurn(
+                decision, message, reply=cached.answer, messages=answered_exchange(message, cached.answer)
+            )
+    prepared = await prepare_turn(router, message, search_weaviate_docs_async, follow_up=bool(history))
+    if prepared.search_results is not None:
+        deps.memo.remember("tool_search_weaviate_docs", normalize_query(message), prepared.search_results)
+    return prepared
+
+
+def answered_exchange(question: str, answer: str) -> list[ModelMessage]:
+    """The messages of a conversation's first turn answered without the agent, for its memory."""
+    return [
+        ModelRequest(parts=[SystemPromptPart(set_system_prompt()), UserPromptPart(question)]),
+        ModelResponse(parts=[TextPart(answer)]),
+    ]
+
+
+def remember_answer(message: str, history: list[ModelMessage], result) -> None:
+    """
+    Cache the answer to a conversation's first question, if it is based on doc
+    pages the agent read and the turn wasn't escalated to human support.
+    """
+    if history:
+        return
+    messages = result.new_messages()
+    escalated = any(
+        isinstance(part, ToolCallPart) and part.tool_name == "contact_human_support"
+        for msg in messages
+        for part in msg.parts
+    )
+    paths = cited_paths(messages)
+    if paths and not escalated:
+        answer_cache.put(message, result.output, paths)
 
-    print(f"\n{'=' * 80}")
-    print("Agent is thinking...")
-    print(f"{'=' * 80}\n")
 
-    # Run the agent - it will decide which tools (if any) to use!
-    # Watch the ">> TOOL USED" messages to see its decision-making
-    model_response = chatbot_agent.run_sync(user_prompt=user_input)
+# ============================================================================
+# Interactive Chat Loop
+# ============================================================================
+# This is a simple REPL (Read-Eval-Print Loop) for the chatbot
+# In production, this would be replaced by a web interface, Slack bot, etc.
 
-    print(f"\nAgent: {model_response.output}\n")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Weaviate support chatbot")
+    parser.add_argument(
+        "--no-stream",
+        action="store_true",
+        help="wait for the complete answer instead of streaming it",
+    )
+    parser.add_argument(
+        "--history-budget",
+        type=int,
+        default=8000,
+        help="approximate token budget for the conversation history sent with each turn",
+    )
+    parser.add_argument(
+        "--no-router",
+        action="store_true",
+        help="send every message to the model, even greetings and off-topic questions",
+    )
+    parser.add_argument("--verbose", action="store_true", help="log tool activity and routing decisions")
+    parser.add_argument(
+        "--metrics",
+        metavar="FILE",
+        help="write latency and token metrics to FILE on exit (JSON for .json, else Prometheus text)",
+    )
+    cassette_mode = parser.add_mutually_exclusive_group()
+    cassette_mode.add_argument(
+        "--record", metavar="CASSETTE", help="record the model and Weaviate responses to CASSETTE (see cassette.py)"
+    )
+    cassette_mode.add_argument(
+        "--replay", metavar="CASSETTE", help="answer from CASSETTE, offline, instead of the model and Weaviate"
+    )
+    parser.add_argument(
+        "--replay-latency",
+        type=float,
+        help="replaying, wait this multiple of each response's recorded time (default: no wait)",
+    )
+    args = parser.parse_args()
+
+    if args.verbose:
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # Spans for runs, model requests, tool calls and Weaviate queries (see telemetry.py)
+    metrics = setup_telemetry()
+
+    # The conversation so far is sent with every turn, so follow-up questions keep
+    # their context. Over budget, old page text is trimmed, then old turns summarized.
+    memory = ConversationMemory(budget_tokens=args.history_budget, summarize=outline_turns)
+    session_id = uuid.uuid4().hex
+
+    # Record the session to a cassette, or replay a recorded one offline
+    session = contextlib.ExitStack()
+    if args.record or args.replay:
+        mode = "record" if args.record else "replay"
+        cassette = session.enter_context(Cassette(args.record or args.replay, mode, args.replay_latency))
+        session.enter_context(use_cassette(cassette, chatbot_agent))
+
+    # File any escalations an earlier session left queued
+    escalations.start()
+
+    # One event loop for the whole session, so the async Weaviate client is reused
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    print("=" * 80)
+    print("WEAVIATE SUPPORT CHATBOT")
+    print("=" * 80)
+    print("Ask questions about Weaviate! (Type 'quit' or 'exit' to stop, 'reset' to start over)")
+    print("=" * 80)
+    print()
+
+    # Demo tip: Try these questions to showcase different behaviors:
+    # 1. "How do collection aliases work?" → Uses search + fetch tools
+    # 2. "I'm getting a 404 error" → May escalate to human support
+    # 3. "What's the weather?" → Refused straight away by the router (out of scope)
+
+    while True:
+        try:
+            user_input = input("\nYou: ").strip()
+        except EOFError:  # the end of questions piped in, e.g. to replay a session
+            user_input = "quit"
+
+        # Exit conditions
+        if user_input.lower() in ["quit", "exit", "q"]:
+            if args.metrics:
+                metrics.write(args.metrics)
+                print(f"\nMetrics written to {args.metrics}")
+            # Give queued escalations a moment to be filed; the rest are filed next time
+            escalations.close()
+            session.close()
+            print("\nGoodbye! 👋")
+            break
+
+        # Skip empty inputs
+        if not user_input:
+            continue
+
+        if user_input.lower() == "reset":
+            memory.clear()
+            print("Conversation history cleared.")
+            continue
+
+        print(f"\n{'=' * 80}")
+        print("Agent is thinking...")
+        print(f"{'=' * 80}\n")
+
+        deps = ChatDeps(session_id=session_id)
+        prompt = user_input
+        history = memory.history()
+        start = time.perf_counter()
+        if not args.no_router:
+            prepared = loop.run_until_complete(route_turn(user_input, deps, history))
+            if prepared.reply is not None:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                if prepared.messages:
+                    memory.add_messages(prepared.messages)
+                print(f"Agent: {prepared.reply}")
+                print(f"\n[{prepared.decision.route}, answered without the model in {elapsed_ms:.1f}ms]")
+                continue
+            prompt = prepared.prompt
+
+        # Run the agent - it will decide which tools (if any) to use!
+        # Watch the tool calls (or, with --verbose, the ">> TOOL USED" logs) to see its decision-making
+        if args.no_stream:
+            model_response = chatbot_agent.run_sync(
+                user_prompt=prompt, message_history=history, deps=deps
+            )
+            print(f"\nAgent: {model_response.output}")
+            summary = f"total {time.perf_counter() - start:.2f}s"
+        else:
+            # Streaming: print the answer as it is generated, with tool calls inline
+            print("Agent: ", end="", flush=True)
+            model_response, timing = loop.run_until_complete(
+                stream_turn(
+                    chatbot_agent,
+                    prompt,
+                    write=lambda text: print(text, end="", flush=True),
+                    message_history=history,
+                    deps=deps,
+                )
+            )
+            print()
+            summary = timing.summary()
+
+        # Remember this turn, and show how big the prompt is getting
+        turn = memory.add_turn(model_response)
+        remember_answer(user_input, history, model_response)
+        repeated = f", {deps.memo.total_hits} repeated tool calls skipped" if deps.memo.total_hits else ""
+        cached = (
+            f" ({turn.cache_read_tokens} read from cache, {turn.cache_write_tokens} written)"
+            if turn.cache_read_tokens or turn.cache_write_tokens
+            else ""
+        )
+        print(
+            f"\n[{summary}, history ~{turn.history_tokens} tokens, "
+            f"prompt {turn.prompt_tokens} tokens{cached} over {turn.requests} requests{repeated}]"
+        )
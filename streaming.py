@@ -0,0 +1,78 @@
+"""
+Stream an agent turn to the console as it happens.
+
+Text deltas are written as soon as the model produces them, and tool calls
+show up inline when they start and finish. Each turn is timed: time to first
+token (the first text the user sees) and total turn time.
+"""
+
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, Sequence, Union
+
+from pydantic_ai import Agent, AgentRunResultEvent
+from pydantic_ai.messages import (
+    FunctionToolCallEvent,
+    FunctionToolResultEvent,
+    PartDeltaEvent,
+    PartStartEvent,
+    TextPart,
+    TextPartDelta,
+)
+
+
+@dataclass
+class TurnTiming:
+    time_to_first_token: Optional[float] = None
+    total: float = 0.0
+    tool_calls: list[tuple[str, float]] = field(default_factory=list)
+
+    def summary(self) -> str:
+        ttft = f"{self.time_to_first_token:.2f}s" if self.time_to_first_token is not None else "n/a"
+        return f"first token {ttft}, total {self.total:.2f}s, {len(self.tool_calls)} tool calls"
+
+
+async def stream_turn(
+    agent: Agent,
+    user_prompt: Union[str, Sequence[str]],
+    write: Callable[[str], Any] = sys.stdout.write,
+    write_tool: Optional[Callable[[str], Any]] = None,
+    **run_kwargs,
+):
+    """
+    Run `agent` on `user_prompt`, writing text and tool events with `write` as they arrive.
+
+    Tool events go to `write_tool` instead, if given.
+    Extra keyword arguments go to `agent.run_stream_events`.
+    Return the run result and its `TurnTiming`.
+    """
+    timing = TurnTiming()
+    tool_starts: dict[str, tuple[str, float]] = {}
+    result = None
+    write_tool = write_tool or write
+    start = time.perf_counter()
+
+    def text(content: str) -> None:
+        if content and timing.time_to_first_token is None:
+            timing.time_to_first_token = time.perf_counter() - start
+        write(content)
+
+    async for event in agent.run_stream_events(user_prompt, **run_kwargs):
+        if isinstance(event, PartStartEvent) and isinstance(event.part, TextPart):
+            text(event.part.content)
+        elif isinstance(event, PartDeltaEvent) and isinstance(event.delta, TextPartDelta):
+            text(event.delta.content_delta)
+        elif isinstance(event, FunctionToolCallEvent):
+            tool_starts[event.part.tool_call_id] = (event.part.tool_name, time.perf_counter())
+            write_tool(f"\n  [tool] {event.part.tool_name}({event.part.args_as_json_str()})\n")
+        elif isinstance(event, FunctionToolResultEvent):
+            name, started = tool_starts.pop(event.tool_call_id, (event.result.tool_name, start))
+            elapsed = time.perf_counter() - started
+            timing.tool_calls.append((name, elapsed))
+            size = len(str(getattr(event.result, "content", "")))
+            write_tool(f"  [done] {name} in {elapsed * 1000:.0f}ms ({size} chars)\n")
+        elif isinstance(event, AgentRunResultEvent):
+            result = event.result
+    timing.total = time.perf_counter() - start
+    return result, timing
@@ -0,0 +1,297 @@
+"""
+Tracing and metrics for the chatbot, built on OpenTelemetry.
+
+Call `setup_telemetry()` once at startup. Every agent run, model request and
+tool call then becomes a span (through Pydantic AI's built-in instrumentation),
+as does every Weaviate query made by tools.py. Spans carry the tool name, the
+size of the tool's arguments and result, the query latency and the token usage.
+
+Finished spans are also folded into `metrics`, a small local registry of
+latency histograms and counters that can be written as JSON or in the
+Prometheus text format. With OTEL_EXPORTER_OTLP_ENDPOINT set, spans and
+metrics are exported over OTLP as well.
+
+Without `setup_telemetry()`, the spans are no-ops.
+"""
+
+import contextlib
+import functools
+import inspect
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from opentelemetry import trace
+
+tracer = trace.get_tracer("weaviate-workshop")
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CHARS_BUCKETS = (100, 300, 1000, 3000, 10000, 30000, 100000)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Metrics:
+    """
+    Thread-safe counters and histograms, keyed by name and label values.
+
+    Values are mirrored to OpenTelemetry instruments when a meter is set.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[tuple, float]] = {}
+        self.histograms: Dict[str, Dict[tuple, Histogram]] = {}
+        self.meter = None
+        self._instruments: Dict[str, Any] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+        if self.meter is not None:
+            self._instrument(name, self.meter.create_counter).add(value, labels)
+
+    def observe(self, name: str, value: float, buckets: tuple = SECONDS_BUCKETS, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            series.setdefault(key, Histogram(buckets)).observe(value)
+        if self.meter is not None:
+            self._instrument(name, self.meter.create_histogram).record(value, labels)
+
+    def _instrument(self, name: str, create: Callable):
+        if name not in self._instruments:
+            self._instruments[name] = create(name)
+        return self._instruments[name]
+
+    def mean(self, name: str) -> Optional[float]:
+        """Mean of histogram `name` across all its label values, or None if empty."""
+        with self._lock:
+            series = self.histograms.get(name, {}).values()
+            count = sum(h.count for h in series)
+            return sum(h.sum for h in series) / count if count else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "counters": {
+                    name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                    for name, series in self.counters.items()
+                },
+                "histograms": {
+                    name: [
+                        {
+                            "labels": dict(key),
+                            "count": h.count,
+                            "sum": h.sum,
+                            "mean": h.sum / h.count if h.count else 0.0,
+                            "buckets": dict(zip([*map(str, h.buckets), "+Inf"], h.counts)),
+                        }
+                        for key, h in series.items()
+                    ]
+                    for name, series in self.histograms.items()
+                },
+            }
+
+    def to_prometheus(self) -> str:
+        """The registry in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_labels(key)} {value}")
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, h in series.items():
+                    cumulative = 0
+                    for bound, count in zip([*map(str, h.buckets), "+Inf"], h.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(key + (('le', bound),))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(key)} {h.sum}")
+                    lines.append(f"{name}_count{_labels(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """Write the registry to `path`: JSON for a .json file, Prometheus text otherwise."""
+        text = json.dumps(self.to_dict(), indent=2) if path.endswith(".json") else self.to_prometheus()
+        with open(path, "w") as f:
+            f.write(text)
+
+
+def _labels(key: tuple) -> str:
+    if not key:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in key)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(key, escaped)) + "}"
+
+
+metrics = Metrics()
+
+
+def _record_span(span) -> None:
+    """Fold a finished span into `metrics`."""
+    attributes = span.attributes or {}
+    seconds = (span.end_time - span.start_time) / 1e9
+    if attributes.get("db.system") == "weaviate":
+        operation = str(attributes.get("db.operation.name"))
+        metrics.observe("weaviate_query_duration_seconds", seconds, operation=operation)
+    elif "gen_ai.tool.name" in attributes:
+        tool = str(attributes["gen_ai.tool.name"])
+        metrics.observe("tool_call_duration_seconds", seconds, tool=tool)
+        if "tool.result_chars" in attributes:
+            metrics.observe("tool_result_chars", attributes["tool.result_chars"], CHARS_BUCKETS, tool=tool)
+        if "tool.arguments_chars" in attributes:
+            metrics.observe("tool_arguments_chars", attributes["tool.arguments_chars"], CHARS_BUCKETS, tool=tool)
+    elif attributes.get("gen_ai.operation.name") == "chat":
+        model = str(attributes.get("gen_ai.request.model"))
+        metrics.observe("model_request_duration_seconds", seconds, model=model)
+        for kind in ("input", "output"):
+            tokens = attributes.get(f"gen_ai.usage.{kind}_tokens")
+            if tokens:
+                metrics.inc("model_tokens_total", tokens, model=model, type=kind)
+        # Anthropic reports the input tokens read from and written to its prompt cache as usage details
+        cache_details = (("cache_read", "cache_read_input_tokens"), ("cache_write", "cache_creation_input_tokens"))
+        for kind, detail in cache_details:
+            tokens = attributes.get(f"gen_ai.usage.details.{detail}")
+            if tokens:
+                metrics.inc("model_tokens_total", tokens, model=model, type=kind)
+    elif "gen_ai.agent.name" in attributes:
+        metrics.observe("agent_run_duration_seconds", seconds, agent=str(attributes["gen_ai.agent.name"]))
+
+
+def setup_telemetry(service_name: str = "weaviate-support-chatbot", otlp: Optional[bool] = None) -> Metrics:
+    """
+    Install tracer and meter providers and instrument every Pydantic AI agent.
+
+    Spans and metrics go to OTLP when `otlp` is true (by default, when
+    OTEL_EXPORTER_OTLP_ENDPOINT is set). Return the local `metrics` registry.
+    """
+    from opentelemetry import metrics as otel_metrics
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import SpanProcessor, TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from pydantic_ai import Agent
+    from pydantic_ai.models.instrumented import InstrumentationSettings
+
+    class MetricsSpanProcessor(SpanProcessor):
+        def on_end(self, span) -> None:
+            _record_span(span)
+
+    if otlp is None:
+        otlp = bool(os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"))
+    resource = Resource.create({"service.name": service_name})
+    tracer_provider = TracerProvider(resource=resource)
+    tracer_provider.add_span_processor(MetricsSpanProcessor())
+    readers = []
+    if otlp:
+        from opentelemetry.exporter.otlp.proto.http.metric_exporter import OTLPMetricExporter
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        tracer_provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        readers.append(PeriodicExportingMetricReader(OTLPMetricExporter()))
+    meter_provider = MeterProvider(metric_readers=readers, resource=resource)
+
+    trace.set_tracer_provider(tracer_provider)
+    otel_metrics.set_meter_provider(meter_provider)
+    metrics.meter = meter_provider.get_meter("weaviate-workshop") if otlp else None
+    # Message contents stay out of the spans; only sizes and counts are recorded
+    Agent.instrument_all(
+        InstrumentationSettings(
+            tracer_provider=tracer_provider, meter_provider=meter_provider, include_content=False
+        )
+    )
+    return metrics
+
+
+def response_bytes(response) -> int:
+    """
+    Approximate payload size of a Weaviate query response: the returned
+    properties as JSON, plus 4 bytes per vector dimension.
+    """
+    size = 0
+    for o in response.objects:
+        size += len(json.dumps(o.properties, default=str).encode("utf-8"))
+        for vector in (getattr(o, "vector", None) or {}).values():
+            size += 4 * len(vector)
+    return size
+
+
+@contextlib.contextmanager
+def weaviate_span(operation: str, collection: str, **attributes: Any):
+    """
+    Span around one Weaviate query. Set "db.response.returned_rows" and
+    "db.response.bytes" on it when done.
+    """
+    with tracer.start_as_current_span(
+        f"weaviate {operation}",
+        attributes={
+            "db.system": "weaviate",
+            "db.operation.name": operation,
+            "db.collection.name": collection,
+            **attributes,
+        },
+    ) as span:
+        yield span
+
+
+def traced_tool(func: Callable) -> Callable:
+    """
+    Record the size of a tool's arguments and result on its span.
+
+    Apply under the agent's `tool` decorator; the first parameter (the RunContext) is not counted.
+    """
+    signature = inspect.signature(func)
+
+    def annotate(args, kwargs, result) -> None:
+        span = trace.get_current_span()
+        if not span.is_recording():
+            return
+        bound = signature.bind(*args, **kwargs).arguments
+        tool_args = {k: v for i, (k, v) in enumerate(bound.items()) if i > 0}
+        text = result if isinstance(result, str) else json.dumps(result, default=str)
+        span.set_attribute("tool.arguments_chars", len(json.dumps(tool_args, default=str)))
+        span.set_attribute("tool.result_chars", len(text))
+
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            result = await func(*args, **kwargs)
+            annotate(args, kwargs, result)
+            return result
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        result = func(*args, **kwargs)
+        annotate(args, kwargs, result)
+        return result
+
+    return wrapper
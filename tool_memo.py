@@ -0,0 +1,122 @@
+"""
+Run-scoped memoization of tool calls.
+
+Within one agent run, models often repeat a search with the same (or a
+trivially reworded) query, or fetch a page they already have. The earlier
+result is still in the conversation, so repeating the call only costs a round
+trip and duplicate tokens.
+
+A `ToolMemo` lives in the run's deps (a new one per run), and tools opt in with
+`@memoized_tool`. A repeated call returns a short stub pointing back at the
+earlier result, or the cached result itself with `stub=False`. Identical calls
+made in parallel share one execution.
+
+    @agent.tool
+    @memoized_tool(key=lambda query: normalize_query(query))
+    async def tool_search(ctx: RunContext[ChatDeps], query: str) -> ...
+"""
+
+import asyncio
+import functools
+import inspect
+import json
+from collections import Counter
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+
+class ToolMemo:
+    """
+    Results of the memoized tool calls made so far in one run.
+
+    Tools named in `disabled` always run, even if decorated.
+    """
+
+    def __init__(self, disabled: Iterable[str] = ()):
+        self.disabled = set(disabled)
+        self.calls = 0
+        self.hits: Counter = Counter()
+        self._results: Dict[tuple, asyncio.Future] = {}
+
+    @property
+    def total_hits(self) -> int:
+        return sum(self.hits.values())
+
+    def remember(self, name: str, key: Hashable, result: Any) -> None:
+        """
+        Record a call made outside the agent, e.g. a search run before the model
+        was asked, so a matching tool call is treated as a repeat.
+
+        `key` must be what the tool's `key` function returns for the call.
+        """
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(result)
+        self._results[(name, key)] = future
+
+    def stats(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "hits": self.total_hits, "hits_by_tool": dict(self.hits)}
+
+
+def _default_key(**arguments) -> Hashable:
+    return json.dumps(arguments, sort_keys=True, default=str)
+
+
+def memoized_tool(
+    key: Optional[Callable[..., Hashable]] = None, stub: bool = True
+) -> Callable[[Callable], Callable]:
+    """
+    Deduplicate calls to an async tool within a run.
+
+    `key` receives the tool's arguments (without the RunContext) and returns
+    what counts as "the same call"; by default, all the arguments as given.
+    The memo is read from `ctx.deps.memo`; without one, the tool always runs.
+    """
+    make_key = key or _default_key
+
+    def decorate(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+        name = func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(ctx, *args, **kwargs):
+            memo: Optional[ToolMemo] = getattr(ctx.deps, "memo", None)
+            if memo is None or name in memo.disabled:
+                return await func(ctx, *args, **kwargs)
+            arguments = signature.bind(ctx, *args, **kwargs).arguments
+            arguments.pop(next(iter(signature.parameters)))
+            call_key = (name, make_key(**arguments))
+            memo.calls += 1
+
+            earlier = memo._results.get(call_key)
+            if earlier is not None:
+                try:
+                    result = await asyncio.shield(earlier)
+                except asyncio.CancelledError:
+                    if not earlier.cancelled():
+                        raise  # this call itself was cancelled
+                    # The earlier call failed; run this one instead
+                else:
+                    memo.hits[name] += 1
+                    return _stub(name, arguments) if stub else result
+
+            future = asyncio.get_running_loop().create_future()
+            memo._results[call_key] = future
+            try:
+                result = await func(ctx, *args, **kwargs)
+            except BaseException:
+                del memo._results[call_key]
+                future.cancel()
+                raise
+            future.set_result(result)
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+def _stub(name: str, arguments: Dict[str, Any]) -> str:
+    args = ", ".join(f"{k}={v!r}" for k, v in arguments.items())
+    return (
+        f"Already retrieved in this conversation turn: {name}({args}) returned the same result "
+        "earlier. Use that earlier result instead of calling the tool again."
+    )
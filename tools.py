@@ -1,15 +1,112 @@
+import asyncio
+import json
+import logging
 import random
+from concurrent.futures import ThreadPoolExecutor
 import weaviate
 from dotenv import load_dotenv
 import os
-from typing import Dict
-from weaviate.classes.query import Filter
+from typing import Any, Dict, Optional
+from weaviate.classes.query import Filter, MetadataQuery
+from client_manager import AsyncWeaviateClientManager, WeaviateClientManager
+from compression import STOPWORDS, TOKEN_RE
+from local_replica import LocalDocCatalog
+from page_cache import DiskPageStore, PageCache
+from page_sections import page_window
+from path_index import PathIndex
+from rate_limit import limiter
+from search_cache import SearchCache, normalize_query
+from telemetry import BYTES_BUCKETS, metrics, response_bytes, weaviate_span
 
 
 load_dotenv(override=True)
 
+log = logging.getLogger(__name__)
+
 COLLECTION_NAME = "DocCatalog"
 
+# Rate limits every query waits for (see rate_limit.py); near_text also has
+# the cluster embed the query with Cohere
+SEARCH_PROVIDERS = ("weaviate", "cohere")
+FETCH_PROVIDERS = ("weaviate",)
+
+# Searches return only what the results show; page text is fetched separately.
+# DOC_SEARCH_MAX_DISTANCE drops hits further than it from the query (cosine distance)
+SEARCH_PROPERTIES = ["path", "summary"]
+SEARCH_LIMIT = int(os.getenv("DOC_SEARCH_LIMIT", "5"))
+SEARCH_MAX_DISTANCE = (
+    float(os.getenv("DOC_SEARCH_MAX_DISTANCE")) if os.getenv("DOC_SEARCH_MAX_DISTANCE") else None
+)
+
+# Rank constant of reciprocal-rank fusion: a result at rank r scores 1 / (RRF_K + r)
+RRF_K = 60
+
+
+class PageNotFoundError(ValueError):
+    """No page has the requested path. `suggestions` are the closest valid paths."""
+
+    def __init__(self, path: str, suggestions: list[str] = ()):
+        message = f"No Weaviate docs page found with path: {path}"
+        if suggestions:
+            message += ". Closest valid paths: " + ", ".join(suggestions)
+        super().__init__(message)
+        self.path = path
+        self.suggestions = list(suggestions)
+
+
+def connect_to_doc_catalog() -> weaviate.WeaviateClient:
+    """Open a new connection to the Weaviate Cloud cluster holding the docs."""
+    return weaviate.connect_to_weaviate_cloud(
+        cluster_url=os.getenv("WEAVIATE_URL"),
+        auth_credentials=os.getenv("WEAVIATE_RO_KEY"),
+        headers={
+            "X-Cohere-Api-Key": os.getenv("COHERE_API_KEY"),
+        },
+    )
+
+
+async def connect_to_doc_catalog_async() -> weaviate.WeaviateAsyncClient:
+    """Open a new async connection to the Weaviate Cloud cluster holding the docs."""
+    client = weaviate.use_async_with_weaviate_cloud(
+        cluster_url=os.getenv("WEAVIATE_URL"),
+        auth_credentials=os.getenv("WEAVIATE_RO_KEY"),
+        headers={
+            "X-Cohere-Api-Key": os.getenv("COHERE_API_KEY"),
+        },
+    )
+    await client.connect()
+    return client
+
+
+# One client shared by every tool call in the process (see client_manager.py)
+client_manager = WeaviateClientManager(connect_to_doc_catalog)
+async_client_manager = AsyncWeaviateClientManager(connect_to_doc_catalog_async)
+
+# Fetched pages are cached in memory, and on disk if DOC_PAGE_CACHE_DIR is set
+page_cache = PageCache(
+    store=DiskPageStore(os.getenv("DOC_PAGE_CACHE_DIR"))
+    if os.getenv("DOC_PAGE_CACHE_DIR")
+    else None
+)
+
+# Optional local snapshot of DocCatalog (see local_replica.py). Searches of a
+# snapshot of the cluster still embed the query with Cohere.
+local_replica = (
+    LocalDocCatalog(os.getenv("DOC_REPLICA_DIR"))
+    if os.getenv("DOC_REPLICA_DIR")
+    else None
+)
+
+# Recent search results, reused for identical or reworded queries
+search_cache = SearchCache(threshold=float(os.getenv("DOC_SEARCH_CACHE_THRESHOLD", "0.9")))
+
+# Every valid page path, so a wrong one is corrected or rejected before any
+# round trip (see path_index.py), with its last update time, so answers citing
+# a changed page aren't reused. Reloaded in the background every DOC_PATH_INDEX_REFRESH seconds
+path_index = PathIndex(
+    lambda: list_doc_versions(), refresh_interval=float(os.getenv("DOC_PATH_INDEX_REFRESH", "3600"))
+)
+
 
 def get_weather_for_city(city: str) -> str:
     """Get weather for any city"""
@@ -32,28 +129,46 @@ def get_trending_news_for_city(city: str) -> str:
     """
 
 
-def search_weaviate_docs(query: str) -> list[Dict[str, str]]:
+def search_weaviate_docs(
+    query: str, limit: Optional[int] = None, max_distance: Optional[float] = None
+) -> list[Dict[str, Any]]:
     """
     Search Weaviate docs based on a similarity of the query to the overall document summary.
 
-    Return a list of dictionaries with the path and summary of the documents.
+    Return up to `limit` (default SEARCH_LIMIT) documents no further than
+    `max_distance` from the query, as dictionaries with their path, summary and distance.
     """
-    with weaviate.connect_to_weaviate_cloud(
-        cluster_url=os.getenv("WEAVIATE_URL"),
-        auth_credentials=os.getenv("WEAVIATE_RO_KEY"),
-        headers={
-            "X-Cohere-Api-Key": os.getenv("COHERE_API_KEY"),
-        },
-    ) as client:
-        col = client.collections.use("DocCatalog")
-        response = col.query.near_text(query=query, limit=5, target_vector="default")
-    print("Returned results:")
-    for o in response.objects:
-        print(o.properties["path"])
-    return [
-        {"path": o.properties["path"], "summary": o.properties["summary"]}
-        for o in response.objects
-    ]
+    limit, max_distance = _search_params(limit, max_distance)
+    cached = _cached_search(query, limit, max_distance)
+    if cached is not None:
+        return cached
+    response = local_replica.near_text(query, limit, max_distance) if local_replica else None
+    if response is None:
+        col = client_manager.get().collections.use(COLLECTION_NAME)
+        with weaviate_span("near_text", COLLECTION_NAME) as span:
+            response = limiter.call(
+                SEARCH_PROVIDERS,
+                lambda: col.query.near_text(**_near_text_args(query, limit, max_distance)),
+            )
+            _record_response(span, "near_text", response)
+    return _cache_search_results(query, limit, max_distance, response)
+
+
+def search_weaviate_docs_multi(
+    queries: list[str], limit: int = 5, keyword_variants: bool = True
+) -> list[Dict[str, Any]]:
+    """
+    Search Weaviate docs for several phrasings of a question at once.
+
+    Every query runs as a similarity search and, with `keyword_variants`, its
+    keywords as a BM25 search too. The searches run concurrently and their
+    results are merged by reciprocal-rank fusion into one list of up to `limit`
+    documents, each listed once. Return the path and summary of each.
+    """
+    searches = _multi_searches(queries, keyword_variants)
+    with ThreadPoolExecutor(max_workers=len(searches) or 1) as pool:
+        rankings = list(pool.map(lambda search: search[0](search[1]), searches))
+    return reciprocal_rank_fusion(rankings, limit)
 
 
 def fetch_weaviate_docs_page(path: str) -> str:
@@ -62,20 +177,429 @@ def fetch_weaviate_docs_page(path: str) -> str:
 
     Return the full content of the document page, including any referenced documents within.
     """
-    with weaviate.connect_to_weaviate_cloud(
-        cluster_url=os.getenv("WEAVIATE_URL"),
-        auth_credentials=os.getenv("WEAVIATE_RO_KEY"),
-        headers={
-            "X-Cohere-Api-Key": os.getenv("COHERE_API_KEY"),
-        },
-    ) as client:
-        col = client.collections.use("DocCatalog")
-        response = col.query.fetch_objects(
-            limit=1,
-            filters=Filter.by_property("path").equal(path),
-        )
+    fetched = _resolve_path(path)
+    return _format_page(fetched, _load_pages([fetched]), path)
+
+
+def fetch_weaviate_docs_pages(paths: list[str]) -> Dict[str, Any]:
+    """
+    Fetch several Weaviate docs pages by their paths, in a single query.
+
+    Return a dictionary with "pages" (path -> full page content, as returned by
+    `fetch_weaviate_docs_page`) and "not_found" (requested paths with no page).
+    Paths that were corrected are listed in "corrected" (requested -> fetched), and
+    the closest valid paths to those not found in "suggestions".
+    """
+    paths, corrected, unknown = _resolve_paths(paths)
+    return _format_pages(paths, _load_pages(paths), corrected, unknown)
+
+
+def fetch_weaviate_docs_page_section(
+    path: str, section: Optional[int] = None, offset: int = 0, limit: int = 4000
+) -> Dict[str, Any]:
+    """
+    Fetch part of a Weaviate docs page: its table of contents plus one window of text.
+
+    With `section`, return up to `limit` characters of that section starting at `offset`;
+    without it, of the whole page. Continue with `offset=next_offset` until it is None.
+    Referenced files are not included; fetch them with `fetch_weaviate_docs_referenced_files`.
+    """
+    path = _resolve_path(path)
+    return _format_section(path, _load_pages([path]), section, offset, limit)
+
+
+def fetch_weaviate_docs_referenced_files(path: str) -> list[Any]:
+    """
+    Fetch the files referenced by a Weaviate docs page (e.g. code examples).
+    """
+    path = _resolve_path(path)
+    return _page(path, _load_pages([path]))["referenced_files"]
+
+
+async def search_weaviate_docs_async(
+    query: str, limit: Optional[int] = None, max_distance: Optional[float] = None
+) -> list[Dict[str, Any]]:
+    """
+    Async version of `search_weaviate_docs`, using the Weaviate async client.
+
+    Return a list of dictionaries with the path, summary and distance of the documents.
+    """
+    limit, max_distance = _search_params(limit, max_distance)
+    cached = _cached_search(query, limit, max_distance)
+    if cached is not None:
+        return cached
+    response = None
+    if local_replica is not None:
+        # Embedding the query may be a blocking call to Cohere
+        response = await asyncio.to_thread(local_replica.near_text, query, limit, max_distance)
+    if response is None:
+        client = await async_client_manager.get()
+        col = client.collections.use(COLLECTION_NAME)
+        with weaviate_span("near_text", COLLECTION_NAME) as span:
+            response = await limiter.call_async(
+                SEARCH_PROVIDERS,
+                lambda: col.query.near_text(**_near_text_args(query, limit, max_distance)),
+            )
+            _record_response(span, "near_text", response)
+    return _cache_search_results(query, limit, max_distance, response)
+
+
+async def search_weaviate_docs_multi_async(
+    queries: list[str], limit: int = 5, keyword_variants: bool = True
+) -> list[Dict[str, Any]]:
+    """
+    Async version of `search_weaviate_docs_multi`, using the Weaviate async client.
+
+    Return the path and summary of up to `limit` documents, best first.
+    """
+    searches = _multi_searches(queries, keyword_variants, run_async=True)
+    rankings = await asyncio.gather(*(search(query) for search, query in searches))
+    return reciprocal_rank_fusion(rankings, limit)
+
+
+async def fetch_weaviate_docs_page_async(path: str) -> str:
+    """
+    Async version of `fetch_weaviate_docs_page`, using the Weaviate async client.
+
+    Return the full content of the document page, including any referenced documents within.
+    """
+    fetched = await resolve_doc_path_async(path)
+    return _format_page(fetched, await _load_pages_async([fetched]), path)
+
+
+async def fetch_resolved_doc_page_async(path: str) -> str:
+    """
+    The full content of the page at `path`, a path already checked with
+    `resolve_doc_path_async`, so it is not looked up in the path index again.
+    """
+    return _format_page(path, await _load_pages_async([path]))
+
+
+async def fetch_weaviate_docs_pages_async(paths: list[str]) -> Dict[str, Any]:
+    """
+    Async version of `fetch_weaviate_docs_pages`, using the Weaviate async client.
+
+    Return a dictionary with "pages" (path -> full page content) and "not_found",
+    plus "corrected" and "suggestions" as needed.
+    """
+    paths, corrected, unknown = await _resolve_paths_async(paths)
+    return _format_pages(paths, await _load_pages_async(paths), corrected, unknown)
+
+
+async def fetch_weaviate_docs_page_section_async(
+    path: str, section: Optional[int] = None, offset: int = 0, limit: int = 4000
+) -> Dict[str, Any]:
+    """
+    Async version of `fetch_weaviate_docs_page_section`.
+    """
+    path = await resolve_doc_path_async(path)
+    return _format_section(path, await _load_pages_async([path]), section, offset, limit)
+
+
+async def fetch_weaviate_docs_referenced_files_async(path: str) -> list[Any]:
+    """
+    Async version of `fetch_weaviate_docs_referenced_files`.
+    """
+    path = await resolve_doc_path_async(path)
+    return _page(path, await _load_pages_async([path]))["referenced_files"]
+
+
+async def resolve_doc_path_async(path: str) -> str:
+    """
+    The valid page path meant by `path`: itself, or its correction. Raise
+    `PageNotFoundError`, with the closest valid paths, if no page is clearly meant.
+
+    A valid path is a dict lookup; anything else is matched in a worker thread,
+    off the event loop.
+    """
+    # Checking membership also starts the index's first load
+    if path in path_index or not path_index.ready:
+        return path
+    return await asyncio.to_thread(_resolve_path, path)
+
+
+def list_doc_paths() -> list[str]:
+    """Every page path in DocCatalog, from the local replica if there is one."""
+    return list(list_doc_versions())
+
+
+def list_doc_versions() -> Dict[str, Optional[str]]:
+    """
+    Every page path in DocCatalog with its version: the time the page was last
+    updated, or None if unknown. From the local replica if there is one.
+    """
+    if local_replica is not None:
+        return local_replica.versions()
+    col = client_manager.get().collections.use(COLLECTION_NAME)
+
+    def load() -> Dict[str, Optional[str]]:
+        objects = col.iterator(return_properties=["path"], return_metadata=MetadataQuery(last_update_time=True))
+        return {o.properties["path"]: _version(o) for o in objects}
+
+    with weaviate_span("iterator", COLLECTION_NAME) as span:
+        versions = limiter.call(FETCH_PROVIDERS, load)
+        span.set_attribute("db.response.returned_rows", len(versions))
+    return versions
+
+
+def _version(o) -> Optional[str]:
+    updated = getattr(o.metadata, "last_update_time", None)
+    return str(updated) if updated is not None else None
+
+
+def keyword_query(query: str) -> str:
+    """The query's distinct words, without stopwords: the keyword variant searched with BM25."""
+    return " ".join(dict.fromkeys(t for t in TOKEN_RE.findall(query.lower()) if t not in STOPWORDS))
+
+
+def reciprocal_rank_fusion(rankings: list[list[Dict[str, Any]]], limit: int = 5) -> list[Dict[str, Any]]:
+    """
+    Merge ranked result lists into one, best first, each document (by path) once.
+
+    A document scores the sum of 1 / (RRF_K + rank) over the lists it is in, so
+    one found by several searches beats one that a single search ranked first.
+    """
+    scores: Dict[str, float] = {}
+    results: Dict[str, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking, start=1):
+            scores[result["path"]] = scores.get(result["path"], 0.0) + 1.0 / (RRF_K + rank)
+            results.setdefault(result["path"], result)
+    best = sorted(scores, key=scores.get, reverse=True)[:limit]
+    return [results[path] for path in best]
+
+
+def _multi_searches(queries: list[str], keyword_variants: bool, run_async: bool = False) -> list[tuple]:
+    """(search function, query) pairs to run for `queries`, without repeats."""
+    semantic = search_weaviate_docs_async if run_async else search_weaviate_docs
+    keyword = _keyword_search_async if run_async else _keyword_search
+    searches = {("semantic", normalize_query(q)): (semantic, q) for q in queries}
+    if keyword_variants:
+        for q in queries:
+            keywords = keyword_query(q)
+            if keywords:
+                searches.setdefault(("keyword", keywords), (keyword, keywords))
+    return list(searches.values())
+
+
+def _keyword_search(keywords: str) -> list[Dict[str, Any]]:
+    # No query embedding needed, so only Weaviate's limit applies
+    col = client_manager.get().collections.use(COLLECTION_NAME)
+    with weaviate_span("bm25", COLLECTION_NAME) as span:
+        response = limiter.call(FETCH_PROVIDERS, lambda: col.query.bm25(**_bm25_args(keywords)))
+        _record_response(span, "bm25", response)
+    return _format_search_results(response)
+
+
+async def _keyword_search_async(keywords: str) -> list[Dict[str, Any]]:
+    client = await async_client_manager.get()
+    col = client.collections.use(COLLECTION_NAME)
+    with weaviate_span("bm25", COLLECTION_NAME) as span:
+        response = await limiter.call_async(FETCH_PROVIDERS, lambda: col.query.bm25(**_bm25_args(keywords)))
+        _record_response(span, "bm25", response)
+    return _format_search_results(response)
+
+
+def _search_params(limit: Optional[int], max_distance: Optional[float]) -> tuple[int, Optional[float]]:
     return (
-        response.objects[0].properties["content"]
-        + "\n\n"
-        + str(response.objects[0].properties["referenced_files"])
+        SEARCH_LIMIT if limit is None else limit,
+        SEARCH_MAX_DISTANCE if max_distance is None else max_distance,
     )
+
+
+def _near_text_args(query: str, limit: int, max_distance: Optional[float]) -> Dict[str, Any]:
+    return {
+        "query": query,
+        "limit": limit,
+        "distance": max_distance,
+        "target_vector": "default",
+        "return_properties": SEARCH_PROPERTIES,
+        "return_metadata": MetadataQuery(distance=True),
+    }
+
+
+def _bm25_args(keywords: str) -> Dict[str, Any]:
+    return {
+        "query": keywords,
+        "limit": SEARCH_LIMIT,
+        "return_properties": SEARCH_PROPERTIES,
+        "return_metadata": MetadataQuery(score=True),
+    }
+
+
+def _record_response(span, operation: str, response) -> None:
+    """Note a query's returned rows and (approximate) payload size on its span and in the metrics."""
+    size = response_bytes(response)
+    span.set_attribute("db.response.returned_rows", len(response.objects))
+    span.set_attribute("db.response.bytes", size)
+    metrics.observe("weaviate_response_bytes", size, BYTES_BUCKETS, operation=operation)
+
+
+def _resolve_path(path: str) -> str:
+    """The valid path meant by `path`, checked against the path index without a round trip."""
+    match = path_index.resolve(path)
+    if match.path is None:
+        raise PageNotFoundError(path, match.suggestions)
+    if match.corrected:
+        log.info("Corrected page path %r to %r", path, match.path)
+    return match.path
+
+
+def _resolve_paths(paths: list[str]) -> tuple[list[str], Dict[str, str], Dict[str, list[str]]]:
+    """Valid paths to fetch, corrections (requested -> valid), and unknown paths with suggestions."""
+    resolved, corrected, unknown = [], {}, {}
+    for path in dict.fromkeys(paths):
+        match = path_index.resolve(path)
+        if match.path is None:
+            unknown[path] = match.suggestions
+            continue
+        if match.corrected:
+            corrected[path] = match.path
+        resolved.append(match.path)
+    return list(dict.fromkeys(resolved)), corrected, unknown
+
+
+async def _resolve_paths_async(
+    paths: list[str],
+) -> tuple[list[str], Dict[str, str], Dict[str, list[str]]]:
+    if all(path in path_index for path in paths) or not path_index.ready:
+        return list(dict.fromkeys(paths)), {}, {}
+    return await asyncio.to_thread(_resolve_paths, paths)
+
+
+def _load_pages(paths: list[str]) -> Dict[str, Dict[str, Any]]:
+    """Page properties by path, from the cache, the local replica, then Weaviate."""
+    pages, missing = _load_local_pages(paths)
+    if missing:
+        col = client_manager.get().collections.use(COLLECTION_NAME)
+        with weaviate_span("fetch_objects", COLLECTION_NAME) as span:
+            response = limiter.call(
+                FETCH_PROVIDERS,
+                lambda: col.query.fetch_objects(limit=len(missing), filters=_any_path_filter(missing)),
+            )
+            _record_response(span, "fetch_objects", response)
+        pages.update(_cache_pages(response))
+    return pages
+
+
+async def _load_pages_async(paths: list[str]) -> Dict[str, Dict[str, Any]]:
+    pages, missing = _load_local_pages(paths)
+    if missing:
+        client = await async_client_manager.get()
+        col = client.collections.use(COLLECTION_NAME)
+        with weaviate_span("fetch_objects", COLLECTION_NAME) as span:
+            response = await limiter.call_async(
+                FETCH_PROVIDERS,
+                lambda: col.query.fetch_objects(limit=len(missing), filters=_any_path_filter(missing)),
+            )
+            _record_response(span, "fetch_objects", response)
+        pages.update(_cache_pages(response))
+    return pages
+
+
+def _load_local_pages(paths: list[str]) -> tuple[Dict[str, Dict[str, Any]], list[str]]:
+    pages = {}
+    for path in paths:
+        cached = page_cache.get(path)
+        if cached is not None:
+            pages[path] = json.loads(cached)
+    missing = [path for path in paths if path not in pages]
+    if local_replica is not None and missing:
+        pages.update(_cache_pages(local_replica.fetch_paths(missing)))
+        missing = [path for path in paths if path not in pages]
+    return pages, missing
+
+
+def _any_path_filter(paths: list[str]):
+    return Filter.any_of([Filter.by_property("path").equal(path) for path in paths])
+
+
+def _format_search_results(response) -> list[Dict[str, Any]]:
+    if log.isEnabledFor(logging.INFO):
+        log.info("Returned results: %s", [o.properties["path"] for o in response.objects])
+    results = []
+    for o in response.objects:
+        result = {"path": o.properties["path"], "summary": o.properties["summary"]}
+        distance = getattr(o.metadata, "distance", None)
+        if distance is not None:
+            result["distance"] = round(distance, 3)
+        results.append(result)
+    return results
+
+
+def _cached_search(query: str, limit: int, max_distance: Optional[float]) -> Optional[list[Dict[str, Any]]]:
+    # The cache holds searches made with the default settings only
+    if (limit, max_distance) != (SEARCH_LIMIT, SEARCH_MAX_DISTANCE):
+        return None
+    return search_cache.get(query)
+
+
+def _cache_search_results(
+    query: str, limit: int, max_distance: Optional[float], response
+) -> list[Dict[str, Any]]:
+    results = _format_search_results(response)
+    if (limit, max_distance) == (SEARCH_LIMIT, SEARCH_MAX_DISTANCE):
+        search_cache.put(query, results)
+    return results
+
+
+def _cache_pages(response) -> Dict[str, Dict[str, Any]]:
+    pages = {}
+    for o in response.objects:
+        page = {
+            "content": o.properties["content"],
+            "referenced_files": o.properties["referenced_files"],
+        }
+        pages[o.properties["path"]] = page
+        page_cache.put(o.properties["path"], json.dumps(page, default=str))
+    return pages
+
+
+def _page(path: str, pages: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    if path not in pages:
+        raise PageNotFoundError(path, path_index.suggest(path))
+    return pages[path]
+
+
+def _page_text(page: Dict[str, Any]) -> str:
+    return page["content"] + "\n\n" + str(page["referenced_files"])
+
+
+def _format_page(path: str, pages: Dict[str, Dict[str, Any]], requested: Optional[str] = None) -> str:
+    text = _page_text(_page(path, pages))
+    if requested is not None and requested != path:
+        # Say so, or the model would take this page for the one it asked for
+        text = f"(No page has the path '{requested}'; this is the closest page, '{path}'.)\n\n" + text
+    return text
+
+
+def _format_pages(
+    paths: list[str],
+    pages: Dict[str, Dict[str, Any]],
+    corrected: Dict[str, str],
+    unknown: Dict[str, list[str]],
+) -> Dict[str, Any]:
+    result = {
+        "pages": {path: _page_text(pages[path]) for path in paths if path in pages},
+        "not_found": [path for path in paths if path not in pages] + list(unknown),
+    }
+    if corrected:
+        result["corrected"] = corrected
+    suggestions = {path: found for path, found in unknown.items() if found}
+    if suggestions:
+        result["suggestions"] = suggestions
+    return result
+
+
+def _format_section(
+    path: str,
+    pages: Dict[str, Dict[str, Any]],
+    section: Optional[int],
+    offset: int,
+    limit: int,
+) -> Dict[str, Any]:
+    page = _page(path, pages)
+    window = page_window(page["content"], section, offset, limit)
+    window["path"] = path
+    window["referenced_files_count"] = len(page["referenced_files"])
+    return window